@@ -1,5 +1,7 @@
 import React from 'react';
 import {
+  useDataProvider,
+  useRefresh,
   List,
   Datagrid,
   TextField,
@@ -10,15 +12,40 @@ import {
   required,
 } from 'react-admin';
 
-export const DNSList = () => (
-  <List>
-    <Datagrid rowClick="edit">
-      <TextField source="id" />
-      <TextField source="nome_aluno" label="Nome do Aluno" />
-      <TextField source="nome_dominio" label="Nome do Domínio" />
-    </Datagrid>
-  </List>
-);
+// Atualiza a listagem quando o backend avisa de uma alteração (stream SSE),
+// agrupando rajadas de eventos em uma única releitura da página
+const useAlteracoesAoVivo = (resource) => {
+  const dataProvider = useDataProvider();
+  const refresh = useRefresh();
+  React.useEffect(() => {
+    let agendado = null;
+    const cancelar = dataProvider.assinarEventos(resource, () => {
+      if (!agendado) {
+        agendado = setTimeout(() => {
+          agendado = null;
+          refresh();
+        }, 300);
+      }
+    });
+    return () => {
+      clearTimeout(agendado);
+      cancelar();
+    };
+  }, [dataProvider, refresh, resource]);
+};
+
+export const DNSList = () => {
+  useAlteracoesAoVivo('dns');
+  return (
+    <List>
+      <Datagrid rowClick="edit">
+        <TextField source="id" />
+        <TextField source="nome_aluno" label="Nome do Aluno" />
+        <TextField source="nome_dominio" label="Nome do Domínio" />
+      </Datagrid>
+    </List>
+  );
+};
 
 export const DNSCreate = () => (
   <Create>
@@ -13,14 +13,27 @@ const httpClient = (url, options = {}) => {
   return fetchUtils.fetchJson(url, options);
 };
 
+// Stream de alterações: teto da espera entre reconexões com falha e as
+// respostas que encerram a assinatura (ver assinarEventos)
+const ESPERA_MAXIMA_EVENTOS = 60000;
+const STATUS_SEM_EVENTOS = [401, 403, 404];
+
 export const DataProvider = {
-  // A versão customizada funciona perfeitamente com a sua API.
-  // Ela já resolve o problema de o backend retornar um objeto com a chave "registros".
+  // Paginação, ordenação e filtro são feitos no backend.
+  // O total vem do header Content-Range ("registros 0-24/319").
   getList: async (resource, params) => {
-    const { json } = await httpClient(`${apiUrl}/${resource}`);
+    const { page, perPage } = params.pagination;
+    const { field, order } = params.sort;
+    const query = new URLSearchParams({
+      sort: JSON.stringify([field, order]),
+      range: JSON.stringify([(page - 1) * perPage, page * perPage - 1]),
+      filter: JSON.stringify(params.filter || {}),
+    });
+    const { headers, json } = await httpClient(`${apiUrl}/${resource}?${query}`);
+    const contentRange = headers.get('Content-Range');
     return {
-      data: json.registros, // Ajustado para pegar a lista dentro do objeto
-      total: json.registros.length,
+      data: json,
+      total: contentRange ? parseInt(contentRange.split('/').pop(), 10) : json.length,
     };
   },
 
@@ -70,18 +83,103 @@ export const DataProvider = {
     }));
   },
 
-  getMany: (resource, params) => {
-    const url = `${apiUrl}/${resource}`;
-    return httpClient(url).then(({ json }) => ({
-      data: json.registros.filter(record => params.ids.includes(record.id)),
-    }));
+  // Lê só os ids pedidos (batch_get_item no backend), sem baixar a lista inteira
+  getMany: async (resource, params) => {
+    const query = new URLSearchParams({ ids: params.ids.join(',') });
+    const { json } = await httpClient(`${apiUrl}/${resource}?${query}`);
+    return {
+      data: json,
+    };
   },
 
-  getManyReference: (resource, params) => {
-    const url = `${apiUrl}/${resource}`;
-    return httpClient(url).then(({ json }) => ({
-      data: json.registros.filter(record => record[params.target] === params.id),
-      total: json.registros.filter(record => record[params.target] === params.id).length,
-    }));
+  // Mesmo formato do getList, com o alvo da referência como filtro no backend
+  getManyReference: async (resource, params) => {
+    const { page, perPage } = params.pagination;
+    const { field, order } = params.sort;
+    const query = new URLSearchParams({
+      sort: JSON.stringify([field, order]),
+      range: JSON.stringify([(page - 1) * perPage, page * perPage - 1]),
+      filter: JSON.stringify({ ...params.filter, [params.target]: params.id }),
+    });
+    const { headers, json } = await httpClient(`${apiUrl}/${resource}?${query}`);
+    const contentRange = headers.get('Content-Range');
+    return {
+      data: json,
+      total: contentRange ? parseInt(contentRange.split('/').pop(), 10) : json.length,
+    };
+  },
+
+  // Assina o stream SSE de alterações (GET /<resource>/eventos) em vez de refazer
+  // a listagem em intervalos. aoEvento recebe { tipo, id, registro } a cada delta
+  // e { tipo: 'reinicio' } quando o servidor não tem mais o que foi perdido
+  // (a tela deve listar de novo). O EventSource não envia o X-API-Key, então o
+  // stream é lido com fetch; ao cair, reconecta com o Last-Event-ID. Falhas
+  // seguidas dobram a espera (até ESPERA_MAXIMA_EVENTOS); 404 (backend sem o
+  // stream, como a Lambda), 401 e 403 encerram a assinatura, e a tela fica
+  // com o refresh manual. Devolve a função que encerra a assinatura.
+  assinarEventos: (resource, aoEvento) => {
+    let ultimoId = null;
+    let espera = 2000;
+    let falhas = 0;
+    let controle = null;
+    let encerrado = false;
+
+    const despachar = (bloco) => {
+      let tipo = 'message';
+      let dados = '';
+      bloco.split('\n').forEach((linha) => {
+        if (linha.startsWith(':')) return; // ping
+        const separador = linha.indexOf(':');
+        const campo = separador < 0 ? linha : linha.slice(0, separador);
+        const valor = separador < 0 ? '' : linha.slice(separador + 1).replace(/^ /, '');
+        if (campo === 'id') ultimoId = valor;
+        else if (campo === 'event') tipo = valor;
+        else if (campo === 'data') dados += valor;
+        else if (campo === 'retry' && /^\d+$/.test(valor)) espera = parseInt(valor, 10);
+      });
+      if (tipo === 'registro') aoEvento(JSON.parse(dados));
+      else if (tipo === 'reinicio') aoEvento({ tipo: 'reinicio' });
+    };
+
+    const conectar = async () => {
+      while (!encerrado) {
+        let retryAfter = 0;
+        controle = new AbortController();
+        const headers = new Headers({ Accept: 'text/event-stream', 'X-API-Key': apiKey });
+        if (ultimoId) headers.set('Last-Event-ID', ultimoId);
+        try {
+          const resposta = await fetch(`${apiUrl}/${resource}/eventos`, { headers, signal: controle.signal });
+          if (STATUS_SEM_EVENTOS.includes(resposta.status)) return;
+          if (resposta.ok && resposta.body) {
+            falhas = 0;
+            const leitor = resposta.body.pipeThrough(new TextDecoderStream()).getReader();
+            let pendente = '';
+            for (;;) {
+              const { value, done } = await leitor.read();
+              if (done) break;
+              const blocos = (pendente + value.replace(/\r\n?/g, '\n')).split('\n\n');
+              pendente = blocos.pop();
+              blocos.forEach(despachar);
+            }
+          } else {
+            falhas += 1;
+            if (resposta.status === 429) {
+              retryAfter = parseInt(resposta.headers.get('Retry-After') || '5', 10) * 1000;
+            }
+          }
+        } catch (erro) {
+          if (encerrado) return;
+          falhas += 1;
+        }
+        const atraso = falhas ? Math.min(espera * 2 ** (falhas - 1), ESPERA_MAXIMA_EVENTOS) : espera;
+        await new Promise((resolve) => setTimeout(resolve, Math.max(atraso, retryAfter)));
+      }
+    };
+
+    conectar();
+    return () => {
+      encerrado = true;
+      if (controle) controle.abort();
+    };
   },
 };
\ No newline at end of file
@@ -0,0 +1,37 @@
+# alteracoes_route53.py
+# Montagem e divisão de ChangeBatches do Route53, compartilhadas pelos
+# handlers, pela criação em lote e pelo reconciliador.
+#
+# O Route53 aceita até 1000 elementos ResourceRecord por ChangeBatch, e cada
+# UPSERT conta em dobro; com um IP por registro cabem 500 UPSERTs por chamada.
+LIMITE_ELEMENTOS_CHANGE_BATCH = 1000
+PESO_ACAO = {'CREATE': 1, 'DELETE': 1, 'UPSERT': 2}
+
+
+def alteracao_registro_a(acao, nome, enderecos_ip, ttl):
+    """Monta uma Change de registro A; enderecos_ip pode ser um IP ou uma lista."""
+    if isinstance(enderecos_ip, str):
+        enderecos_ip = [enderecos_ip]
+    return {
+        'Action': acao,
+        'ResourceRecordSet': {
+            'Name': nome,
+            'Type': 'A',
+            'TTL': ttl,
+            'ResourceRecords': [{'Value': ip} for ip in enderecos_ip]
+        }
+    }
+
+
+def dividir_change_batches(alteracoes):
+    """Agrupa as alterações no menor número de ChangeBatches dentro do limite."""
+    lote, peso_lote = [], 0
+    for alteracao in alteracoes:
+        peso = PESO_ACAO[alteracao['Action']] * len(alteracao['ResourceRecordSet']['ResourceRecords'])
+        if lote and peso_lote + peso > LIMITE_ELEMENTOS_CHANGE_BATCH:
+            yield lote
+            lote, peso_lote = [], 0
+        lote.append(alteracao)
+        peso_lote += peso
+    if lote:
+        yield lote
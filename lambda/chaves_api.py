@@ -0,0 +1,184 @@
+# chaves_api.py
+# Chaves de API por inquilino (aluno), com limite de requisições e de escritas.
+#
+# Com uma única SENHA_API para a turma, o script descontrolado de um aluno
+# consumia o limite de escritas do Route53 da conta inteira. Cada chave agora
+# pertence a um inquilino e fica na tabela CHAVES_TABLE apenas como SHA-256:
+# as chaves são aleatórias (256 bits), então um hash rápido basta, sem sal nem
+# KDF lenta. A verificação passa por um cache LRU com TTL no processo: o
+# DynamoDB só é lido na primeira requisição de cada chave por contêiner e
+# depois que a entrada expira, então uma revogação vale em até
+# CHAVES_CACHE_TTL segundos. Chaves desconhecidas também ficam em cache, por
+# menos tempo, para que uma chave errada repetida não vire uma leitura por
+# requisição.
+#
+# Cada inquilino tem dois baldes de tokens (o BaldeTokens do escritor_route53):
+# requisições por segundo e escritas por segundo, com limites por item da
+# tabela ou os padrões do ambiente. Sem token, a API responde 429 com
+# Retry-After. Os baldes são por processo, como o do escritor: vários
+# contêineres quentes somam seus limites.
+#
+# A SENHA_API continua aceita, como o inquilino 'compartilhado' (com os
+# limites padrão), enquanto a turma migra; deixe-a vazia para desligá-la.
+#
+# Item da tabela: hash_chave (chave), inquilino, ativa, requisicoes_por_segundo
+# e escritas_por_segundo (opcionais), criada_em. Criação e revogação:
+# scripts/chaves_api.py.
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from escritor_route53 import BaldeTokens
+from repositorio_registros import RepositorioRegistros
+
+PREFIXO = 'dns_'
+INQUILINO_COMPARTILHADO = 'compartilhado'
+METODOS_ESCRITA = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# O balde acumula até RAJADA_SEGUNDOS de taxa (e pelo menos um token)
+RAJADA_SEGUNDOS = 5.0
+
+
+def gerar_chave():
+    return PREFIXO + secrets.token_urlsafe(32)
+
+
+def hash_chave(chave):
+    return hashlib.sha256(chave.encode()).hexdigest()
+
+
+class Inquilino:
+    def __init__(self, nome, requisicoes_por_segundo, escritas_por_segundo, relogio=time.monotonic):
+        self.nome = nome
+        self.requisicoes = BaldeTokens(requisicoes_por_segundo, max(1.0, requisicoes_por_segundo * RAJADA_SEGUNDOS), relogio)
+        self.escritas = BaldeTokens(escritas_por_segundo, max(1.0, escritas_por_segundo * RAJADA_SEGUNDOS), relogio)
+
+    def ajustar(self, requisicoes_por_segundo, escritas_por_segundo):
+        # Limites alterados na tabela valem sem zerar os baldes
+        for balde, taxa in ((self.requisicoes, requisicoes_por_segundo), (self.escritas, escritas_por_segundo)):
+            with balde.trava:
+                balde.taxa = taxa
+                balde.capacidade = max(1.0, taxa * RAJADA_SEGUNDOS)
+                balde.tokens = min(balde.tokens, balde.capacidade)
+
+    def consumir(self, escrita=False):
+        """0 se a requisição pode seguir; senão, os segundos até haver token."""
+        espera = self.requisicoes.tentar_adquirir()
+        if espera or not escrita:
+            return espera
+        return self.escritas.tentar_adquirir()
+
+
+class VerificadorChaves:
+    def __init__(self, repositorio=None, senha_compartilhada='', ttl=60.0, ttl_negativo=5.0,
+                 max_itens=1024, requisicoes_por_segundo=20.0, escritas_por_segundo=2.0,
+                 relogio=time.monotonic):
+        self.repositorio = repositorio
+        self.senha_compartilhada = senha_compartilhada.encode() if senha_compartilhada else None
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.max_itens = max_itens
+        self.limites_padrao = (requisicoes_por_segundo, escritas_por_segundo)
+        self.relogio = relogio
+        # hash da chave -> (expira em, nome do inquilino ou None)
+        self.cache = OrderedDict()
+        # nome do inquilino -> Inquilino (os baldes sobrevivem à expiração do cache)
+        self.inquilinos = OrderedDict()
+        self.trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def verificar(self, chave):
+        """Inquilino dono da chave, ou None se ela não existir ou estiver revogada."""
+        if not chave:
+            return None
+        if self.senha_compartilhada is not None and hmac.compare_digest(chave.encode(), self.senha_compartilhada):
+            return self._inquilino(INQUILINO_COMPARTILHADO, self.limites_padrao)
+        if self.repositorio is None:
+            return None
+
+        chave_hash = hash_chave(chave)
+        agora = self.relogio()
+        with self.trava:
+            entrada = self.cache.get(chave_hash)
+            if entrada is not None and entrada[0] > agora:
+                self.cache.move_to_end(chave_hash)
+                self.acertos += 1
+                return self.inquilinos.get(entrada[1]) if entrada[1] else None
+            self.falhas += 1
+
+        item = self.repositorio.obter(chave_hash)
+        if item is None or item.get('ativa') is False or not item.get('inquilino'):
+            self._guardar(chave_hash, None, agora + self.ttl_negativo)
+            return None
+        limites = (
+            float(item.get('requisicoes_por_segundo') or self.limites_padrao[0]),
+            float(item.get('escritas_por_segundo') or self.limites_padrao[1])
+        )
+        inquilino = self._inquilino(item['inquilino'], limites)
+        self._guardar(chave_hash, inquilino.nome, agora + self.ttl)
+        return inquilino
+
+    def _guardar(self, chave_hash, nome, expira_em):
+        with self.trava:
+            self.cache[chave_hash] = (expira_em, nome)
+            self.cache.move_to_end(chave_hash)
+            while len(self.cache) > self.max_itens:
+                self.cache.popitem(last=False)
+
+    def _inquilino(self, nome, limites):
+        with self.trava:
+            inquilino = self.inquilinos.get(nome)
+            if inquilino is None:
+                inquilino = Inquilino(nome, *limites, relogio=self.relogio)
+                self.inquilinos[nome] = inquilino
+                while len(self.inquilinos) > self.max_itens:
+                    self.inquilinos.popitem(last=False)
+            elif (inquilino.requisicoes.taxa, inquilino.escritas.taxa) != limites:
+                inquilino.ajustar(*limites)
+            self.inquilinos.move_to_end(nome)
+            return inquilino
+
+    def estatisticas(self):
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'itens': len(self.cache), 'inquilinos': len(self.inquilinos)}
+
+
+def verificador_do_ambiente(senha_compartilhada):
+    """VerificadorChaves com a configuração das variáveis de ambiente."""
+    tabela = os.environ.get('CHAVES_TABLE')
+    return VerificadorChaves(
+        RepositorioRegistros(tabela, chave='hash_chave') if tabela else None,
+        senha_compartilhada=senha_compartilhada,
+        ttl=float(os.environ.get('CHAVES_CACHE_TTL', '60')),
+        requisicoes_por_segundo=float(os.environ.get('LIMITE_REQUISICOES', '20')),
+        escritas_por_segundo=float(os.environ.get('LIMITE_ESCRITAS', '2'))
+    )
+
+
+# --- Administração (scripts/chaves_api.py) ---
+
+def criar(repositorio, inquilino, requisicoes_por_segundo=None, escritas_por_segundo=None):
+    """Grava uma chave nova para o inquilino; devolve a chave, que só existe aqui."""
+    chave = gerar_chave()
+    item = {'hash_chave': hash_chave(chave), 'inquilino': inquilino, 'ativa': True, 'criada_em': datetime.now().isoformat()}
+    if requisicoes_por_segundo is not None:
+        item['requisicoes_por_segundo'] = requisicoes_por_segundo
+    if escritas_por_segundo is not None:
+        item['escritas_por_segundo'] = escritas_por_segundo
+    repositorio.gravar(item, condicao='attribute_not_exists(#k)', nomes={'#k': 'hash_chave'})
+    return chave
+
+
+def revogar(repositorio, inquilino):
+    """Desativa todas as chaves do inquilino; devolve quantas foram revogadas."""
+    revogadas = 0
+    for item in repositorio.varrer(campos=('hash_chave', 'inquilino', 'ativa'), filtros={'inquilino': inquilino}):
+        if item.get('ativa') is not False:
+            repositorio.atualizar(item['hash_chave'], {'ativa': False})
+            revogadas += 1
+    return revogadas
@@ -0,0 +1,49 @@
+# clientes_aws.py
+# Clientes AWS criados sob demanda e reaproveitados entre invocações.
+#
+# O boto3 só é importado na primeira chamada que realmente fala com a AWS, de
+# modo que requisições OPTIONS (preflight) e /info não pagam esse custo no
+# cold start. Todos os clientes compartilham a mesma sessão e configuração.
+import os
+from functools import lru_cache
+
+import metricas
+
+CONFIG_PADRAO = {
+    'connect_timeout': float(os.environ.get('AWS_CONNECT_TIMEOUT', '2')),
+    'read_timeout': float(os.environ.get('AWS_READ_TIMEOUT', '10')),
+    # Mantém as conexões TLS abertas entre invocações do mesmo contêiner
+    'tcp_keepalive': True,
+    'max_pool_connections': int(os.environ.get('AWS_MAX_CONEXOES', '16')),
+    # O modo adaptive acrescenta um limitador de taxa no cliente às retentativas
+    'retries': {
+        'mode': 'adaptive',
+        'max_attempts': int(os.environ.get('AWS_MAX_TENTATIVAS', '5'))
+    }
+}
+
+
+@lru_cache(maxsize=None)
+def sessao():
+    import boto3
+    return boto3.session.Session()
+
+
+@lru_cache(maxsize=None)
+def configuracao():
+    from botocore.config import Config
+    return Config(**CONFIG_PADRAO)
+
+
+@lru_cache(maxsize=None)
+def cliente(servico, max_tentativas=None):
+    """
+    Cliente compartilhado do serviço. Com max_tentativas, usa outra política de
+    retentativas (ex.: 1 quando quem chama já faz o próprio backoff).
+    """
+    config = configuracao()
+    if max_tentativas is not None:
+        from botocore.config import Config
+        config = config.merge(Config(retries={'mode': 'standard', 'max_attempts': max_tentativas}))
+    # Latência, retentativas e erros de cada chamada vão para as métricas EMF
+    return metricas.instrumentar_cliente(sessao().client(servico, config=config))
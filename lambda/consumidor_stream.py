@@ -0,0 +1,190 @@
+# consumidor_stream.py
+# Consumidor do DynamoDB Streams da tabela de registros (modo outbox, ver outbox.py).
+#
+# Recebe lotes de registros do stream, fica com o último estado de cada alias,
+# transforma os itens PENDENTE em UPSERT e os EXCLUINDO em DELETE, envia tudo em
+# ChangeBatches do maior tamanho permitido e então marca os itens como APLICADO
+# (ou os remove). As próprias atualizações do consumidor (APLICADO, ERRO) e as
+# remoções também passam pelo stream e são ignoradas.
+#
+# Falhas transitórias (limite do Route53) voltam como batchItemFailures, e o
+# Lambda reenvia o lote a partir delas; alterações rejeitadas pelo Route53
+# ficam com status ERRO para a reconciliação.
+#
+# Com EVENTOS_TABLE configurada, o que o consumidor conclui (APLICADO, ERRO e
+# exclusões) também vai para o diário do stream SSE (ver eventos_registros.py).
+import os
+from datetime import datetime
+
+from alteracoes_route53 import alteracao_registro_a, dividir_change_batches
+from escritor_route53 import EscritorRoute53, codigo_erro
+import eventos_registros
+from eventos_registros import ALTERADO, REMOVIDO
+from log_estruturado import LogEstruturado
+import metricas
+from outbox import APLICADO, ERRO, EXCLUINDO, PENDENTE
+from repositorio_registros import ALIAS_VERSAO, CondicaoFalhou, RepositorioRegistros, item_para_dict
+
+log = LogEstruturado('consumidor_stream')
+
+
+def ultimos_estados(registros):
+    """
+    Último registro do stream de cada alias (a ordem é garantida por chave).
+    Devolve {alias: (número de sequência, item ou None se removido)}.
+    """
+    ultimos = {}
+    for registro in registros:
+        dados = registro.get('dynamodb', {})
+        chave = item_para_dict(dados.get('Keys', {}))
+        alias = chave.get('alias')
+        if alias is None or alias == ALIAS_VERSAO:
+            continue
+        imagem = dados.get('NewImage') if registro.get('eventName') != 'REMOVE' else None
+        ultimos[alias] = (dados.get('SequenceNumber'), item_para_dict(imagem) if imagem else None)
+    return ultimos
+
+
+def _alteracao(item, dominio, ttl):
+    nome = f"{item['alias']}.{dominio}"
+    if item.get('status') == PENDENTE:
+        return alteracao_registro_a('UPSERT', nome, item['endereco_ip'], ttl)
+    # O DELETE precisa do valor que está no Route53: o último aplicado, se conhecido
+    return alteracao_registro_a('DELETE', nome, item.get('ip_aplicado') or item['endereco_ip'], ttl)
+
+
+def conjunto_no_route53(cliente, zona_id, nome):
+    resposta = cliente.list_resource_record_sets(
+        HostedZoneId=zona_id, StartRecordName=nome, StartRecordType='A', MaxItems='1'
+    )
+    for conjunto in resposta.get('ResourceRecordSets', []):
+        if conjunto['Name'].rstrip('.').lower() == nome.rstrip('.').lower() and conjunto['Type'] == 'A':
+            return conjunto
+    return None
+
+
+class ConsumidorStream:
+    def __init__(self, repositorio, escritor, dominio, ttl, versao_cache=False, diario=None):
+        self.repositorio = repositorio
+        self.escritor = escritor
+        self.dominio = dominio
+        self.ttl = ttl
+        self.versao_cache = versao_cache
+        self.diario = diario
+        # Deltas do lote em andamento, publicados no diário ao fim de processar
+        self._deltas = []
+
+    def processar(self, registros):
+        """Processa um lote do stream; devolve a resposta parcial do Lambda."""
+        a_aplicar = [
+            (sequencia, item)
+            for sequencia, item in ultimos_estados(registros).values()
+            if item and item.get('status') in (PENDENTE, EXCLUINDO)
+        ]
+        alteracoes = [_alteracao(item, self.dominio, self.ttl) for _, item in a_aplicar]
+        por_nome = {a['ResourceRecordSet']['Name']: pendente for a, pendente in zip(alteracoes, a_aplicar)}
+        falhas = []
+        self._deltas = []
+
+        for lote in dividir_change_batches(alteracoes):
+            pendentes = [por_nome[a['ResourceRecordSet']['Name']] for a in lote]
+            try:
+                resposta = self.escritor.aplicar(lote)
+            except Exception as e:
+                if codigo_erro(e) == 'InvalidChangeBatch':
+                    # Uma alteração inválida derruba o lote inteiro; aplica uma a uma
+                    for (sequencia, item), alteracao in zip(pendentes, lote):
+                        if not self._aplicar_uma(item, alteracao):
+                            falhas.append(sequencia)
+                else:
+                    log.aviso("Falha transitória ao aplicar alterações", excecao=e, alteracoes=len(lote))
+                    falhas.extend(sequencia for sequencia, _ in pendentes)
+                continue
+            for _, item in pendentes:
+                self._concluir(item, resposta)
+
+        if len(falhas) < len(a_aplicar) and self.versao_cache:
+            self.repositorio.incrementar(ALIAS_VERSAO, 'versao')
+        if self.diario is not None:
+            self.diario.publicar(self._deltas)
+        log.info("Lote do stream processado", registros=len(registros), alteracoes=len(a_aplicar), falhas=len(falhas))
+        # O Lambda reprocessa a partir do menor número de sequência com falha
+        return {'batchItemFailures': [{'itemIdentifier': sequencia} for sequencia in falhas]}
+
+    def _aplicar_uma(self, item, alteracao):
+        """Aplica uma alteração isolada; False se o erro for transitório (reprocessar)."""
+        try:
+            resposta = self.escritor.aplicar([alteracao])
+        except Exception as e:
+            return self._tratar_rejeicao(item, e)
+        self._concluir(item, resposta)
+        return True
+
+    def _concluir(self, item, resposta):
+        condicao = {'condicao': '#op = :op', 'nomes': {'#op': 'id_operacao'}, 'valores': {':op': item['id_operacao']}}
+        try:
+            if item['status'] == EXCLUINDO:
+                self.repositorio.excluir(item['alias'], **condicao)
+                self._deltas.append((REMOVIDO, item['alias'], None))
+            else:
+                atualizado = self.repositorio.atualizar(item['alias'], {
+                    'status': APLICADO,
+                    'ip_aplicado': item['endereco_ip'],
+                    'id_alteracao': resposta['ChangeInfo']['Id'],
+                    'data_aplicacao': datetime.now().isoformat()
+                }, **condicao)
+                self._deltas.append((ALTERADO, item['alias'], atualizado))
+        except CondicaoFalhou:
+            # Houve uma escrita mais nova; ela chegará pelo stream
+            pass
+
+    def _tratar_rejeicao(self, item, erro):
+        if codigo_erro(erro) != 'InvalidChangeBatch':
+            return False
+        if item['status'] == EXCLUINDO:
+            # O valor no Route53 não é o esperado (ou o registro não existe): usa o real
+            conjunto = conjunto_no_route53(self.escritor.cliente, self.escritor.zona_id, f"{item['alias']}.{self.dominio}")
+            if conjunto is None:
+                self._concluir(item, None)
+                return True
+            try:
+                self._concluir(item, self.escritor.aplicar([{'Action': 'DELETE', 'ResourceRecordSet': conjunto}]))
+                return True
+            except Exception as e:
+                if codigo_erro(e) != 'InvalidChangeBatch':
+                    return False
+                erro = e
+        log.erro("Route53 rejeitou a alteração", excecao=erro, alias=item['alias'])
+        try:
+            atualizado = self.repositorio.atualizar(
+                item['alias'], {'status': ERRO, 'erro': str(erro)},
+                condicao='#op = :op', nomes={'#op': 'id_operacao'}, valores={':op': item['id_operacao']}
+            )
+            self._deltas.append((ALTERADO, item['alias'], atualizado))
+        except CondicaoFalhou:
+            pass
+        return True
+
+
+_consumidor = None
+
+
+def _consumidor_padrao():
+    global _consumidor
+    if _consumidor is None:
+        _consumidor = ConsumidorStream(
+            RepositorioRegistros(os.environ['DYNAMODB_TABLE']),
+            EscritorRoute53(os.environ['ZONA_ID'], taxa=float(os.environ.get('ROUTE53_TAXA', '5'))),
+            os.environ['NAMESERVERS'].split(',')[0],
+            int(os.environ['TTL_DNS']),
+            versao_cache=os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim'),
+            diario=eventos_registros.diario_do_ambiente()
+        )
+    return _consumidor
+
+
+@metricas.medir_handler('consumidor_stream', rota=lambda evento: 'stream')
+def lambda_handler(evento, contexto):
+    """Entrada do event source mapping do DynamoDB Streams (ReportBatchItemFailures)."""
+    with log.requisicao(getattr(contexto, 'aws_request_id', None)):
+        return _consumidor_padrao().processar(evento.get('Records', []))
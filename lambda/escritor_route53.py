@@ -0,0 +1,244 @@
+# escritor_route53.py
+# Escritor compartilhado do Route53: limita a taxa, agrupa e reenvia alterações.
+#
+# A API do Route53 aceita 5 requisições por segundo por conta; nos picos do
+# início das aulas as chamadas diretas a change_resource_record_sets recebiam
+# Throttling ou PriorRequestNotComplete e viravam HTTP 500. O escritor:
+#
+# - limita as chamadas com um balde de tokens (5/s por padrão);
+# - reenvia erros de limite com backoff exponencial com jitter ("full jitter");
+# - junta os envios pendentes em um só ChangeBatch e, se dois UPSERTs do mesmo
+#   nome estão pendentes, descarta o mais antigo (vale a última escrita);
+# - devolve um Future por envio, resolvido com a resposta do Route53.
+#
+# Não há thread de fundo (o contêiner do Lambda congela entre invocações): quem
+# encontra o escritor ocioso vira o "líder", espera a janela de agrupamento e
+# despacha tudo o que estiver pendente; os demais só aguardam o próprio Future.
+# O balde é por processo; entre contêineres, o backoff absorve o excesso.
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import clientes_aws
+import metricas
+from alteracoes_route53 import LIMITE_ELEMENTOS_CHANGE_BATCH, PESO_ACAO
+
+# Erros de limite/indisponibilidade que valem uma nova tentativa -> status HTTP
+ERROS_RETENTAVEIS = {
+    'Throttling': 429,
+    'ThrottlingException': 429,
+    'TooManyRequestsException': 429,
+    'PriorRequestNotComplete': 503,
+    'ServiceUnavailable': 503,
+    'InternalError': 503,
+}
+
+
+def codigo_erro(erro):
+    """Código de um ClientError do botocore (sem importar o botocore)."""
+    return (getattr(erro, 'response', None) or {}).get('Error', {}).get('Code')
+
+
+class ErroLimiteRoute53(Exception):
+    """O Route53 continuou recusando a alteração depois de todas as tentativas."""
+
+    def __init__(self, codigo, mensagem, espera_sugerida=1):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.status = ERROS_RETENTAVEIS.get(codigo, 503)
+        self.espera_sugerida = espera_sugerida
+
+
+class BaldeTokens:
+    """Balde de tokens thread-safe: até `capacidade` chamadas de uma vez, `taxa` por segundo."""
+
+    def __init__(self, taxa, capacidade=None, relogio=time.monotonic, dormir=time.sleep):
+        self.taxa = taxa
+        self.capacidade = capacidade if capacidade is not None else taxa
+        self.relogio = relogio
+        self.dormir = dormir
+        self.tokens = self.capacidade
+        self.atualizado_em = relogio()
+        self.trava = threading.Lock()
+
+    def tentar_adquirir(self, custo=1):
+        """Consome `custo` tokens se houver; senão devolve quantos segundos faltam."""
+        with self.trava:
+            agora = self.relogio()
+            self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+            self.atualizado_em = agora
+            if self.tokens >= custo:
+                self.tokens -= custo
+                return 0
+            return (custo - self.tokens) / self.taxa
+
+    def adquirir(self, custo=1):
+        while True:
+            espera = self.tentar_adquirir(custo)
+            if not espera:
+                return
+            self.dormir(espera)
+
+
+def _chave(alteracao):
+    conjunto = alteracao['ResourceRecordSet']
+    return (conjunto['Name'].rstrip('.').lower(), conjunto['Type'], conjunto.get('SetIdentifier'))
+
+
+class _Envio:
+    def __init__(self, alteracoes):
+        self.alteracoes = list(alteracoes)
+        self.futuro = Future()
+        # Envios cujas alterações foram todas substituídas por este
+        self.seguidores = []
+
+    def peso(self):
+        return sum(PESO_ACAO[a['Action']] * len(a['ResourceRecordSet']['ResourceRecords'])
+                   for a in self.alteracoes)
+
+    def concluir(self, resposta):
+        for envio in [self] + self.seguidores:
+            envio.futuro.set_result(resposta)
+
+    def falhar(self, erro):
+        for envio in [self] + self.seguidores:
+            envio.futuro.set_exception(erro)
+
+
+class EscritorRoute53:
+    def __init__(self, zona_id, cliente=None, taxa=5, janela=0.0, max_tentativas=6,
+                 espera_base=0.1, espera_maxima=5.0, relogio=time.monotonic,
+                 dormir=time.sleep, aleatorio=random.random, balde=None):
+        self.zona_id = zona_id
+        self._cliente = cliente
+        self.janela = janela
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.dormir = dormir
+        self.aleatorio = aleatorio
+        # Capacidade 1: chamadas espaçadas de 1/taxa, sem rajada inicial acima do limite
+        self.balde = balde or BaldeTokens(taxa, capacidade=1, relogio=relogio, dormir=dormir)
+        self.trava = threading.Lock()
+        self.pendentes = []
+        self.por_chave = {}
+        self.despachando = False
+        self.contadores = {'envios': 0, 'chamadas': 0, 'retentativas': 0, 'coalescidas': 0}
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            # O backoff é feito aqui; o botocore não deve repetir por conta própria
+            self._cliente = clientes_aws.cliente('route53', max_tentativas=1)
+        return self._cliente
+
+    def estatisticas(self):
+        return dict(self.contadores)
+
+    def aplicar(self, alteracoes, timeout=None):
+        """Envia as alterações e espera a resposta do Route53 (ChangeInfo)."""
+        return self.enviar(alteracoes).result(timeout)
+
+    def enviar(self, alteracoes):
+        """
+        Enfileira alterações que devem ser aplicadas juntas (um único ChangeBatch,
+        até 1000 elementos) e devolve um Future com a resposta do Route53.
+        """
+        envio = _Envio(alteracoes)
+        with self.trava:
+            self.contadores['envios'] += 1
+            self._coalescer(envio)
+            self.pendentes.append(envio)
+            lider = not self.despachando
+            self.despachando = True
+        if lider:
+            self._despachar_pendentes()
+        return envio.futuro
+
+    def _coalescer(self, envio):
+        # Chamado com a trava: um UPSERT novo substitui o UPSERT pendente do mesmo nome
+        for alteracao in envio.alteracoes:
+            chave = _chave(alteracao)
+            anterior = self.por_chave.get(chave)
+            if anterior is not None and anterior is not envio and alteracao['Action'] == 'UPSERT':
+                substituida = next((a for a in anterior.alteracoes
+                                    if _chave(a) == chave and a['Action'] == 'UPSERT'), None)
+                if substituida is not None:
+                    anterior.alteracoes.remove(substituida)
+                    self.contadores['coalescidas'] += 1
+                    if not anterior.alteracoes:
+                        self.pendentes.remove(anterior)
+                        envio.seguidores.append(anterior)
+                        envio.seguidores.extend(anterior.seguidores)
+                        anterior.seguidores = []
+            self.por_chave[chave] = envio
+
+    def _despachar_pendentes(self):
+        if self.janela:
+            self.dormir(self.janela)
+        while True:
+            with self.trava:
+                envios, self.pendentes, self.por_chave = self.pendentes, [], {}
+                if not envios:
+                    self.despachando = False
+                    return
+            try:
+                for grupo in self._agrupar(envios):
+                    self._enviar_grupo(grupo)
+            except Exception as e:
+                # Ex.: alteração malformada; não deixa nenhum Future sem resposta
+                for envio in envios:
+                    if not envio.futuro.done():
+                        envio.falhar(e)
+
+    def _agrupar(self, envios):
+        # Envios inteiros por ChangeBatch, sem repetir um nome no mesmo lote
+        grupo, peso_grupo, chaves_grupo = [], 0, set()
+        for envio in envios:
+            peso = envio.peso()
+            chaves = {_chave(a) for a in envio.alteracoes}
+            if grupo and (peso_grupo + peso > LIMITE_ELEMENTOS_CHANGE_BATCH or chaves & chaves_grupo):
+                yield grupo
+                grupo, peso_grupo, chaves_grupo = [], 0, set()
+            grupo.append(envio)
+            peso_grupo += peso
+            chaves_grupo |= chaves
+        if grupo:
+            yield grupo
+
+    def _enviar_grupo(self, grupo):
+        try:
+            resposta = self._chamar([a for envio in grupo for a in envio.alteracoes])
+        except Exception as e:
+            if len(grupo) > 1 and codigo_erro(e) == 'InvalidChangeBatch':
+                # Uma alteração inválida derruba o lote inteiro; isola cada envio
+                for envio in grupo:
+                    self._enviar_grupo([envio])
+                return
+            for envio in grupo:
+                envio.falhar(e)
+            return
+        for envio in grupo:
+            envio.concluir(resposta)
+
+    def _chamar(self, alteracoes):
+        for tentativa in range(self.max_tentativas):
+            inicio = time.perf_counter()
+            self.balde.adquirir()
+            metricas.registrar('Route53EsperaTaxa', (time.perf_counter() - inicio) * 1000)
+            self.contadores['chamadas'] += 1
+            try:
+                return self.cliente.change_resource_record_sets(
+                    HostedZoneId=self.zona_id,
+                    ChangeBatch={'Changes': alteracoes}
+                )
+            except Exception as e:
+                codigo = codigo_erro(e)
+                if codigo not in ERROS_RETENTAVEIS:
+                    raise
+                if tentativa == self.max_tentativas - 1:
+                    raise ErroLimiteRoute53(codigo, f"Route53 indisponível após {self.max_tentativas} tentativas: {e}") from e
+                self.contadores['retentativas'] += 1
+                metricas.registrar('Route53Retentativas', 1, 'Count')
+                self.dormir(self.aleatorio() * min(self.espera_maxima, self.espera_base * 2 ** tentativa))
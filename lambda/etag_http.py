@@ -0,0 +1,30 @@
+# etag_http.py
+# ETag e If-None-Match, compartilhados pelo gerenciador_dns (Lambda) e pela API
+# FastAPI.
+#
+# ETag forte: hash do corpo serializado, igual em todos os contêineres. Nas
+# listas, o Content-Range entra no hash: a mesma página com outro total (um
+# alias criado em outra página) não pode responder 304. As páginas da
+# listagem trazem o ETag calculado uma vez por foto (ver foto_registros.py),
+# então um If-None-Match que confere não lê o DynamoDB nem serializa nada.
+import hashlib
+
+
+def etag(corpo, content_range=''):
+    return '"' + hashlib.sha256(f"{content_range}\n{corpo}".encode()).hexdigest()[:32] + '"'
+
+
+def header(headers, nome):
+    """Valor do header sem diferenciar maiúsculas (o API Gateway repassa como o cliente enviou)."""
+    nome = nome.lower()
+    return next((valor for chave, valor in (headers or {}).items() if chave.lower() == nome), None)
+
+
+def confere(if_none_match, etag_atual):
+    """True se o If-None-Match recebido casa com o ETag atual (a resposta é 304)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match usa comparação fraca: W/"x" equivale a "x"
+    return any(valor.strip().removeprefix('W/') == etag_atual for valor in if_none_match.split(','))
@@ -0,0 +1,129 @@
+# eventos_registros.py
+# Diário das alterações nos registros, lido pelo stream SSE da API FastAPI
+# (GET /registros/eventos).
+#
+# O painel assina o stream em vez de refazer a listagem em intervalos: cada
+# evento é só o delta de um alias (criado, alterado ou removido, com os
+# CAMPOS_LISTAGEM do item). Os eventos ficam na tabela EVENTOS_TABLE (chave
+# canal + seq), com números de sequência contíguos reservados num contador
+# atômico, e vencem pelo TTL depois de EVENTOS_RETENCAO segundos. O
+# Last-Event-ID é o próprio seq, então qualquer contêiner retoma a conexão, e
+# cada conexão SSE só faz uma Query "seq > último" por intervalo.
+#
+# Quem grava publica o que gravou: as rotas da API FastAPI e do gerenciador_dns,
+# o consumidor_stream (APLICADO, ERRO e exclusões concluídas, no modo outbox) e
+# o varredor_expirados (aliases vencidos). Nenhum leitor é acrescentado ao
+# DynamoDB Streams da tabela de registros, que já tem os dois recomendados.
+#
+# Só a API FastAPI em contêiner (uvicorn) serve o stream: uma resposta do
+# Lambda atrás do API Gateway (gerenciador_dns ou Mangum) não fica aberta, e a
+# rota responde 404 ali. O painel encerra a assinatura ao receber o 404.
+#
+# Dois processos publicando ao mesmo tempo podem gravar um seq maior antes de
+# um menor. O leitor só entrega eventos contíguos; uma lacuna que dura mais
+# que espera_lacuna (o processo caiu entre reservar e gravar, ou o TTL já
+# apagou o trecho pedido) vira um reinício, e o cliente refaz a listagem.
+import os
+import time
+
+from log_estruturado import LogEstruturado
+from repositorio_registros import ALIAS_VERSAO, CAMPOS_LISTAGEM, RepositorioRegistros, item_para_dict
+
+log = LogEstruturado('eventos_registros')
+
+CRIADO = 'criado'
+ALTERADO = 'alterado'
+REMOVIDO = 'removido'
+REINICIO = 'reinicio'
+
+CANAL = 'registros'
+# Item do contador: mesmo canal, seq 0 (os eventos começam em 1)
+SEQ_CONTADOR = 0
+
+
+def registro_publico(item):
+    """Só os campos que a listagem expõe, com o id do react-admin."""
+    registro = {campo: item[campo] for campo in CAMPOS_LISTAGEM if campo in item}
+    registro['id'] = item['alias']
+    return registro
+
+
+def _dados(tipo, alias, item):
+    dados = {'tipo': tipo, 'id': alias}
+    if item is not None:
+        dados['registro'] = registro_publico({**item, 'alias': alias})
+    return dados
+
+
+class DiarioEventos:
+    def __init__(self, nome_tabela, retencao=3600, espera_lacuna=5.0, cliente=None, relogio=time.time):
+        # Só o gravar_lote do repositório é usado; a chave composta fica aqui
+        self.repositorio = RepositorioRegistros(nome_tabela, chave='canal', cliente=cliente)
+        self.nome_tabela = nome_tabela
+        self.retencao = retencao
+        self.espera_lacuna = espera_lacuna
+        self.relogio = relogio
+
+    def _chave(self, seq):
+        return {'canal': {'S': CANAL}, 'seq': {'N': str(seq)}}
+
+    def publicar(self, deltas):
+        """
+        Grava [(tipo, alias, item ou None)] no diário. Uma falha só vai para o
+        log: a escrita do registro já aconteceu e não deve falhar por isso.
+        """
+        eventos = [_dados(tipo, alias, item) for tipo, alias, item in deltas if alias != ALIAS_VERSAO]
+        if not eventos:
+            return
+        try:
+            resposta = self.repositorio.cliente.update_item(
+                TableName=self.nome_tabela, Key=self._chave(SEQ_CONTADOR),
+                UpdateExpression='ADD #u :n', ExpressionAttributeNames={'#u': 'ultimo'},
+                ExpressionAttributeValues={':n': {'N': str(len(eventos))}}, ReturnValues='UPDATED_NEW'
+            )
+            primeiro = int(resposta['Attributes']['ultimo']['N']) - len(eventos) + 1
+            agora = self.relogio()
+            self.repositorio.gravar_lote([
+                {'canal': CANAL, 'seq': primeiro + i, 'dados': dados, 'criado_em': agora, 'expira_em': int(agora + self.retencao)}
+                for i, dados in enumerate(eventos)
+            ])
+        except Exception as e:
+            log.aviso("Falha ao publicar eventos de registros", excecao=e, eventos=len(eventos))
+
+    def ultimo(self):
+        """Último seq reservado (0 se nada foi publicado)."""
+        resposta = self.repositorio.cliente.get_item(
+            TableName=self.nome_tabela, Key=self._chave(SEQ_CONTADOR), ConsistentRead=True
+        )
+        return int(resposta.get('Item', {}).get('ultimo', {}).get('N', '0'))
+
+    def proximos(self, ultimo_seq, limite=100):
+        """
+        Eventos contíguos depois de ultimo_seq, como [(seq, dados)], e se o
+        cliente precisa refazer a listagem (lacuna que não vai mais se fechar).
+        """
+        resposta = self.repositorio.cliente.query(
+            TableName=self.nome_tabela,
+            KeyConditionExpression='#c = :c AND #s > :s',
+            ExpressionAttributeNames={'#c': 'canal', '#s': 'seq'},
+            ExpressionAttributeValues={':c': {'S': CANAL}, ':s': {'N': str(ultimo_seq)}},
+            Limit=limite
+        )
+        eventos = []
+        for item in map(item_para_dict, resposta.get('Items', [])):
+            if item['seq'] != ultimo_seq + 1:
+                # O seq que falta ainda pode chegar (reservado por outro processo)
+                if self.relogio() - item['criado_em'] < self.espera_lacuna:
+                    break
+                return eventos, True
+            eventos.append((item['seq'], item['dados']))
+            ultimo_seq = item['seq']
+        return eventos, False
+
+
+def diario_do_ambiente():
+    """DiarioEventos da tabela EVENTOS_TABLE, ou None se ela não estiver configurada."""
+    tabela = os.environ.get('EVENTOS_TABLE')
+    if not tabela:
+        return None
+    return DiarioEventos(tabela, retencao=int(os.environ.get('EVENTOS_RETENCAO', '3600')))
@@ -0,0 +1,55 @@
+# expiracao.py
+# Expiração automática de aliases (atributo expira_em, opcional).
+#
+# expira_em é o instante em que o alias deixa de valer, em segundos desde a
+# época (Unix), o formato exigido pelo TTL do DynamoDB (ver
+# terraform/modules/lambda_api). O DynamoDB apaga o item vencido algum tempo
+# depois, sem prazo garantido; até lá, a API trata o item como inexistente.
+# O varredor_expirados remove do Route53 os registros dos itens apagados pelo
+# TTL (pelo stream) e os vencidos que o TTL ainda não apagou (por scan).
+#
+# A API aceita o epoch (número) ou uma data ISO-8601 ("2025-03-01T18:00:00Z";
+# sem fuso, vale UTC). Um UPSERT sem expira_em torna o alias permanente.
+import math
+import time
+from datetime import datetime, timezone
+
+from repositorio_registros import CAMPO_EXPIRACAO
+
+CAMPO = CAMPO_EXPIRACAO
+
+
+def ler_expira_em(valor, agora=None):
+    """
+    Converte o expira_em recebido na API em epoch (int), ou None se ausente.
+    Levanta ValueError se o valor for inválido ou já tiver passado.
+    """
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, bool):
+        raise ValueError("expira_em deve ser um epoch em segundos ou uma data ISO-8601")
+    if isinstance(valor, str):
+        try:
+            valor = float(valor)
+        except ValueError:
+            try:
+                data = datetime.fromisoformat(valor.strip().replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError("expira_em deve ser um epoch em segundos ou uma data ISO-8601") from None
+            if data.tzinfo is None:
+                data = data.replace(tzinfo=timezone.utc)
+            valor = data.timestamp()
+    if not isinstance(valor, (int, float)) or not math.isfinite(valor):
+        raise ValueError("expira_em deve ser um epoch em segundos ou uma data ISO-8601")
+    expira_em = int(valor)
+    if expira_em <= (agora if agora is not None else time.time()):
+        raise ValueError("expira_em já passou")
+    return expira_em
+
+
+def expirado(item, agora=None):
+    """True se o item tem expira_em e ele já venceu."""
+    expira_em = (item or {}).get(CAMPO)
+    if not isinstance(expira_em, (int, float)) or isinstance(expira_em, bool):
+        return False
+    return expira_em <= (agora if agora is not None else time.time())
@@ -0,0 +1,219 @@
+# foto_registros.py
+# Foto da tabela de registros em memória, usada pelas listagens do
+# gerenciador_dns (Lambda) e da API FastAPI.
+#
+# A listagem paginada do React-Admin (range/sort/filter) é servida da foto: o
+# scan completo só acontece quando ela expira (CACHE_TTL) ou é invalidada por
+# uma escrita. Cada página (filtro, ordenação, intervalo) é serializada uma vez
+# por foto, junto com o Content-Range e o ETag, então a repetição da mesma
+# consulta responde sem ler o DynamoDB nem serializar nada.
+#
+# Com versao_dynamodb, um carimbo no item ALIAS_VERSAO da própria tabela
+# descarta a foto quando outro contêiner (ou o consumidor_stream, o
+# varredor_expirados e o reconciliador) grava na tabela.
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import etag_http
+from log_estruturado import LogEstruturado
+from repositorio_registros import ALIAS_VERSAO, CAMPOS_LISTAGEM
+
+log = LogEstruturado('foto_registros')
+
+# Páginas já serializadas (corpo, Content-Range, ETag) guardadas junto da foto
+MAX_PAGINAS_POR_FOTO = 64
+
+
+def _json_compacto(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+
+
+class CacheTTL:
+    """Cache TTL + LRU; o lock permite o uso pelas threads do FastAPI."""
+
+    def __init__(self, ttl, max_itens):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self.itens.get(chave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.itens.move_to_end(chave)
+                self.acertos += 1
+                return True, entrada[1]
+            if entrada is not None:
+                del self.itens[chave]
+            self.falhas += 1
+            return False, None
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self.itens[chave] = (time.monotonic() + self.ttl, valor)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+
+    def contem(self, chave):
+        # Consulta sem mexer na ordem LRU nem nas estatísticas
+        entrada = self.itens.get(chave)
+        return entrada is not None and entrada[0] > time.monotonic()
+
+    def invalidar(self, chave=None):
+        with self._lock:
+            if chave is None:
+                self.itens.clear()
+            else:
+                self.itens.pop(chave, None)
+
+    def estatisticas(self):
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'itens': len(self.itens)}
+
+
+# --- Filtro, ordenação e paginação sobre a foto ---
+
+def filtrar_em_memoria(registros, filtros):
+    # Mesma semântica de repositorio_registros.expressao_filtro
+    for campo, valor in filtros.items():
+        if valor in (None, '', []):
+            continue
+        if campo == 'q':
+            termo = str(valor)
+            registros = [r for r in registros if termo in r.get('alias', '') or termo in r.get('endereco_ip', '')]
+        else:
+            atributo = 'alias' if campo == 'id' else campo
+            aceitos = {str(v) for v in valor} if isinstance(valor, list) else {str(valor)}
+            registros = [r for r in registros if r.get(atributo) is not None and str(r[atributo]) in aceitos]
+    return registros
+
+
+def ordenar(registros, campo, ordem):
+    if campo:
+        registros.sort(key=lambda r: str(r.get(campo, '')), reverse=(ordem == 'DESC'))
+    return registros
+
+
+def content_range(inicio, qtd_pagina, total):
+    if qtd_pagina == 0:
+        return f"registros */{total}"
+    return f"registros {inicio}-{inicio + qtd_pagina - 1}/{total}"
+
+
+def montar_pagina(registros, intervalo, serializar=_json_compacto):
+    """(corpo, Content-Range, ETag) do trecho pedido de uma lista já filtrada e ordenada."""
+    total = len(registros)
+    inicio, fim = intervalo if intervalo else (0, max(total - 1, 0))
+    # Cópias: os itens da foto são compartilhados entre as páginas
+    itens = [{**registro, 'id': registro['alias']} for registro in registros[inicio:fim + 1]]
+    log.debug("Registros encontrados: %d, retornando %d", total, len(itens))
+    corpo = serializar(itens)
+    faixa = content_range(inicio, len(itens), total)
+    return corpo, faixa, etag_http.etag(corpo, faixa)
+
+
+class FotoRegistros:
+    def __init__(self, repositorio, ttl, max_itens, versao_dynamodb=False, intervalo_versao=5.0,
+                 segmentos=1, serializar=_json_compacto):
+        self.repositorio = repositorio
+        # alias -> item (ou None, ausência também fica em cache)
+        self.registros = CacheTTL(ttl, max_itens)
+        # Foto completa da tabela (alias -> item) e as páginas já montadas
+        self.lista = CacheTTL(ttl, 1)
+        self.versao_dynamodb = versao_dynamodb
+        self.intervalo_versao = intervalo_versao
+        self.segmentos = segmentos
+        self.serializar = serializar
+        self.versao = None
+        self.verificado_em = 0.0
+        # Um só scan por vez quando a foto expira; as outras threads esperam por ele
+        self._lock_scan = threading.Lock()
+        self._lock_paginas = threading.Lock()
+
+    def verificar_versao(self):
+        """Descarta o cache local quando outro contêiner gravou na tabela."""
+        if not self.versao_dynamodb:
+            return
+        agora = time.monotonic()
+        if agora - self.verificado_em < self.intervalo_versao:
+            return
+        versao = (self.repositorio.obter(ALIAS_VERSAO, campos=('versao',)) or {}).get('versao', 0)
+        if versao != self.versao:
+            self.registros.invalidar()
+            self.lista.invalidar()
+            self.versao = versao
+        self.verificado_em = agora
+
+    def invalidar(self, *aliases):
+        for alias in aliases:
+            self.registros.invalidar(alias)
+        self.lista.invalidar()
+        if self.versao_dynamodb:
+            try:
+                self.versao = self.repositorio.incrementar(ALIAS_VERSAO, 'versao')
+                self.verificado_em = time.monotonic()
+            except Exception as e:
+                # A escrita já foi feita; os outros contêineres expiram pelo TTL
+                log.aviso("Erro ao atualizar a versão do cache", excecao=e)
+
+    def em_cache(self):
+        self.verificar_versao()
+        return self.lista.contem('todos')
+
+    def atual(self):
+        """A foto em cache, ou None (sem ler o DynamoDB)."""
+        self.verificar_versao()
+        achou, foto = self.lista.obter('todos')
+        return foto if achou else None
+
+    def foto(self):
+        foto = self.atual()
+        if foto is not None:
+            return foto
+        with self._lock_scan:
+            # Outra thread pode ter lido a tabela enquanto esta esperava
+            achou, foto = self.lista.obter('todos')
+            if achou:
+                return foto
+            with log.cronometrar('dynamodb_scan'):
+                foto = {
+                    'registros': {
+                        r['alias']: r
+                        for r in self.repositorio.varrer(campos=CAMPOS_LISTAGEM, segmentos=self.segmentos, vigentes=True)
+                        if r['alias'] != ALIAS_VERSAO
+                    },
+                    'paginas': OrderedDict()
+                }
+            log.debug("Foto da tabela lida do DynamoDB", registros=len(foto['registros']))
+            self.lista.guardar('todos', foto)
+            return foto
+
+    def pagina(self, filtros, campo, ordem, intervalo):
+        """
+        (corpo, Content-Range, ETag) da página pedida, montada uma vez por foto:
+        a repetição da consulta (polling do React-Admin) não serializa nada.
+        """
+        foto = self.foto()
+        chave = (json.dumps(filtros, sort_keys=True), campo, ordem, intervalo)
+        with self._lock_paginas:
+            pagina = foto['paginas'].get(chave)
+        if pagina is None:
+            registros = ordenar(filtrar_em_memoria(list(foto['registros'].values()), filtros), campo, ordem)
+            pagina = montar_pagina(registros, intervalo, self.serializar)
+            with self._lock_paginas:
+                foto['paginas'][chave] = pagina
+                if len(foto['paginas']) > MAX_PAGINAS_POR_FOTO:
+                    foto['paginas'].popitem(last=False)
+        return pagina
+
+    def estatisticas(self):
+        return {
+            'registros': self.registros.estatisticas(),
+            'lista': self.lista.estatisticas(),
+            'versao': self.versao if self.versao_dynamodb else None
+        }
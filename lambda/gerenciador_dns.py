@@ -1,196 +1,482 @@
 import json
-import boto3
 import os
-import hashlib
-import hmac
-import base64
+import re
+import math
+import ipaddress
 from datetime import datetime
 
-try:
-    # Configuração dos clientes AWS
-    print("Inicializando clientes AWS...")
-    dynamodb = boto3.resource('dynamodb')
-    route53 = boto3.client('route53')
-    table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+from alteracoes_route53 import dividir_change_batches
+import chaves_api
+from escritor_route53 import ErroLimiteRoute53, EscritorRoute53
+import etag_http
+import eventos_registros
+from eventos_registros import ALTERADO, CRIADO, REMOVIDO
+import expiracao
+from foto_registros import FotoRegistros, content_range as _content_range, montar_pagina, ordenar
+import outbox
+from log_estruturado import LogEstruturado
+import metricas
+from repositorio_registros import ALIAS_VERSAO, CAMPOS_LISTAGEM, CondicaoFalhou, RepositorioRegistros
+
+log = LogEstruturado('gerenciador_dns')
 
-    # Configurações
+try:
+    # Os clientes AWS são criados sob demanda (clientes_aws); aqui só lemos a configuração
+    DYNAMODB_TABLE = os.environ['DYNAMODB_TABLE']
+    # Senha compartilhada, aceita junto com as chaves por inquilino (ver chaves_api.py)
     SENHA_API = os.environ['SENHA_API']
     TTL_DNS = int(os.environ['TTL_DNS'])
     NAMESERVERS = os.environ['NAMESERVERS'].split(',')
     ZONA_ID = os.environ['ZONA_ID']
+
+    # Cache em memória, reaproveitado enquanto o contêiner do Lambda estiver quente
+    CACHE_TTL = float(os.environ.get('CACHE_TTL', '30'))
+    CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', '1024'))
+    # Opcional: carimbo de versão no DynamoDB para invalidar o cache de outros contêineres
+    CACHE_VERSAO_DYNAMODB = os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim')
+    CACHE_VERSAO_INTERVALO = float(os.environ.get('CACHE_VERSAO_INTERVALO', '5'))
+    # Segmentos do scan paralelo da listagem; aumente para tabelas grandes
+    SEGMENTOS_SCAN = int(os.environ.get('SEGMENTOS_SCAN', '1'))
+    # Limite de chamadas ao Route53 por segundo e janela para agrupar alterações
+    ROUTE53_TAXA = float(os.environ.get('ROUTE53_TAXA', '5'))
+    ROUTE53_JANELA_MS = float(os.environ.get('ROUTE53_JANELA_MS', '0'))
+    # 'direto': DynamoDB e Route53 na requisição; 'outbox': só DynamoDB, e o
+    # consumidor_stream aplica no Route53 (ver outbox.py)
+    MODO_ESCRITA = os.environ.get('MODO_ESCRITA', 'direto')
 except Exception as e:
-    print(f"Erro ao inicializar configurações ou clientes AWS: {e}")
+    log.erro("Erro ao inicializar configurações", excecao=e)
     raise
 
+repositorio = RepositorioRegistros(DYNAMODB_TABLE)
+
+# Todas as alterações no Route53 passam pelo escritor (limite de taxa e retentativas)
+escritor = EscritorRoute53(ZONA_ID, taxa=ROUTE53_TAXA, janela=ROUTE53_JANELA_MS / 1000)
+
+# Chaves de API por inquilino, com limite de requisições e de escritas
+verificador = chaves_api.verificador_do_ambiente(SENHA_API)
+
+# Diário lido pelo stream SSE da API FastAPI (eventos_registros.py); None sem EVENTOS_TABLE
+diario = eventos_registros.diario_do_ambiente()
+
 # --- Cabeçalhos CORS comuns para inclusão nas respostas ---
 # Permitir todas as origens para desenvolvimento. Em produção, substitua '*' pelo seu domínio.
+# Compartilhado entre as respostas: para acrescentar cabeçalhos, use uma cópia.
 COMMON_HEADERS = {
     "Access-Control-Allow-Origin": "*",
     "Access-Control-Allow-Methods": "GET,POST,DELETE,PUT,OPTIONS",
-    "Access-Control-Allow-Headers": "Content-Type,X-API-Key,Authorization,Range",
-    "Access-Control-Expose-Headers": "Content-Range",
+    "Access-Control-Allow-Headers": "Content-Type,X-API-Key,Authorization,Range,If-None-Match",
+    "Access-Control-Expose-Headers": "Content-Range,X-Proximo-Cursor,ETag,Retry-After",
     "Access-Control-Max-Age": "600",
     "Content-Type": "application/json"
 }
 
-
-def verificar_senha(senha_fornecida):
-    print(f"Verificando senha fornecida: {senha_fornecida}")
-    # Temporariamente desabilitado para testes
-    # return True
-    return hmac.compare_digest(senha_fornecida, SENHA_API)
-
+# Serialização das respostas: orjson quando estiver no pacote (bem mais rápido
+# nas listagens grandes), senão o json da biblioteca padrão com a mesma saída
+# compacta, para que o ETag de um mesmo corpo não mude entre contêineres
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json(valor):
+    if orjson is not None:
+        return orjson.dumps(valor).decode()
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+
+
+# --- Cache de leitura (ver foto_registros.py) ---
+# Registros por alias e a foto completa da tabela, usada pela listagem
+fotos = FotoRegistros(
+    repositorio, CACHE_TTL, CACHE_MAX_ITENS, versao_dynamodb=CACHE_VERSAO_DYNAMODB,
+    intervalo_versao=CACHE_VERSAO_INTERVALO, segmentos=SEGMENTOS_SCAN, serializar=_json
+)
+cache_registros = fotos.registros
+
+# --- Respostas de erro e 304 (ETag e If-None-Match em etag_http.py) ---
+def _resposta_nao_modificada(etag):
+    return {
+        'statusCode': 304,
+        'headers': {**COMMON_HEADERS, 'ETag': etag},
+        'body': ''
+    }
+
+def _resposta_limite_route53(erro):
+    # 429/503 com Retry-After em vez de 500: o cliente pode simplesmente repetir
+    return {
+        'statusCode': erro.status,
+        'headers': {**COMMON_HEADERS, 'Retry-After': str(erro.espera_sugerida)},
+        'body': _json({'erro': f'Route53 ocupado, tente novamente: {str(erro)}'})
+    }
+
+def _resposta_limite_inquilino(espera):
+    metricas.registrar('RequisicoesLimitadas', 1, 'Count')
+    return {
+        'statusCode': 429,
+        'headers': {**COMMON_HEADERS, 'Retry-After': str(math.ceil(espera))},
+        'body': _json({'erro': 'Limite de requisições da chave excedido, tente novamente'})
+    }
+
+@metricas.medir_handler('gerenciador_dns')
 def lambda_handler(event, context):
-    print(f"lambda_handler chamado com event: {event}")
+    with log.requisicao(
+        getattr(context, 'aws_request_id', None),
+        metodo=event.get('httpMethod', ''),
+        caminho=event.get('path', '')
+    ) as resultado:
+        # O evento só é serializado (e com a x-api-key mascarada) se o DEBUG estiver ligado
+        log.debug("Evento recebido", evento=event)
+        resposta = _rotear(event)
+        resultado['status'] = resposta['statusCode']
+        return resposta
+
+# Respostas sem nada dinâmico: montadas e serializadas uma vez por contêiner
+_RESPOSTA_OPTIONS = {'statusCode': 200, 'headers': COMMON_HEADERS, 'body': ''}
+_RESPOSTA_NAO_AUTORIZADO = {'statusCode': 401, 'headers': COMMON_HEADERS, 'body': _json({'erro': 'Senha inválida'})}
+_RESPOSTA_ROTA_NAO_ENCONTRADA = {'statusCode': 404, 'headers': COMMON_HEADERS, 'body': _json({'erro': 'Rota não encontrada'})}
+
+def _compilar_rotas(rotas):
+    """
+    [(método, '/registros/{subdominio}', handler)] -> {método: [(regex, handler)]}.
+    Cada {nome} casa um segmento inteiro do caminho e é passado ao handler;
+    o caminho é comparado por inteiro, então /registros-old não cai em /registros.
+    """
+    tabela = {}
+    for metodo, modelo, handler in rotas:
+        partes = []
+        for segmento in modelo.strip('/').split('/'):
+            if segmento.startswith('{') and segmento.endswith('}'):
+                partes.append(f'(?P<{segmento[1:-1]}>[^/]+)')
+            else:
+                partes.append(re.escape(segmento))
+        tabela.setdefault(metodo, []).append((re.compile('/' + '/'.join(partes) + '/?'), handler))
+    return tabela
+
+def _caminho_sem_estagio(event):
+    # Chamado pela URL do execute-api, o caminho chega com o estágio (/prod/registros)
+    path = event.get('path') or '/'
+    estagio = '/' + ((event.get('requestContext') or {}).get('stage') or 'prod')
+    if path == estagio or path.startswith(estagio + '/'):
+        return path[len(estagio):] or '/'
+    return path
+
+def _rotear(event):
     try:
         http_method = event.get('httpMethod', '')
-        path = event.get('path', '')
-        print(f"HTTP Method: {http_method}, Path: {path}")
 
-        # --- NOVO: Tratamento explícito para requisições OPTIONS (CORS preflight) ---
+        # Preflight CORS: responde antes da verificação de senha
         if http_method == 'OPTIONS':
-            print("Requisição OPTIONS recebida. Retornando 200 OK para preflight.")
-            return {
-                'statusCode': 200,
-                'headers': {**COMMON_HEADERS}, # Usa os cabeçalhos comuns
-                'body': ''
-            }
-        # --- FIM do tratamento OPTIONS ---
+            return dict(_RESPOSTA_OPTIONS)
 
-        headers = event.get('headers', {})
-        senha = headers.get('x-api-key', '')
-        print(f"Header X-API-Key: {senha}")
+        headers = event.get('headers') or {}
+        inquilino = verificador.verificar(headers.get('x-api-key', ''))
+        if inquilino is None:
+            log.aviso("Senha inválida")
+            return dict(_RESPOSTA_NAO_AUTORIZADO)
 
-        if not verificar_senha(senha):
-            print("Senha inválida")
-            return {
-                'statusCode': 401,
-                'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-                'body': json.dumps({'erro': 'Senha inválida'}, ensure_ascii=False)
-            }
+        espera = inquilino.consumir(escrita=http_method in chaves_api.METODOS_ESCRITA)
+        if espera:
+            log.aviso("Limite da chave excedido", inquilino=inquilino.nome, metodo=http_method)
+            return _resposta_limite_inquilino(espera)
 
-        if http_method == 'GET' and path == '/prod/registros':
-            print("Chamando listar_registros()")
-            return listar_registros()
-        
-        elif http_method == 'GET' and '/registros/' in path and path != '/prod/registros':
-            subdominio = path.split('/')[-1]
-            print(f"Chamando obter_registro() para subdominio: {subdominio}")
-            return obter_registro(subdominio)
-
-        elif http_method == 'POST' and '/registros' in path:
-            print("Chamando criar_registro()")
-            return criar_registro(json.loads(event.get('body', '{}')))
-        
-        elif http_method == 'DELETE' and '/registros/' in path:
-            subdominio = path.split('/')[-1]
-            print(f"Chamando deletar_registro() para subdominio: {subdominio}")
-            return deletar_registro(subdominio)
-        
-        elif http_method == 'GET' and '/info' in path:
-            print("Chamando obter_info()")
-            return obter_info()
-        else:
-            print("Rota não encontrada")
-            return {
-                'statusCode': 404,
-                'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-                'body': json.dumps({'erro': 'Rota não encontrada'}, ensure_ascii=False)
-            }
+        path = _caminho_sem_estagio(event)
+        for padrao, handler in _ROTAS.get(http_method, ()):
+            casou = padrao.fullmatch(path)
+            if casou:
+                return handler(event, **casou.groupdict())
+
+        log.debug("Rota não encontrada")
+        return dict(_RESPOSTA_ROTA_NAO_ENCONTRADA)
 
     except Exception as e:
-        print(f"Erro no lambda_handler: {e}")
+        log.erro("Erro no lambda_handler", excecao=e)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': str(e)}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': str(e)})
         }
 
-def listar_registros():
-    print("Iniciando listar_registros()")
+# --- Paginação, ordenação e filtro no formato do React-Admin (ra-data-simple-rest) ---
+# GET /registros?sort=["alias","ASC"]&range=[0,24]&filter={"q":"aluno"}
+# ou, para leitura de uma única página do DynamoDB:
+# GET /registros?limite=25&cursor=<valor do header X-Proximo-Cursor>
+# ou, para registros específicos (getMany), lidos com batch_get_item:
+# GET /registros?ids=aluno1,aluno2
+# ou, para os registros que apontam para um IP (índice endereco_ip-index):
+# GET /registros?endereco_ip=10.0.0.1
+LIMITE_PADRAO = 25
+LIMITE_MAXIMO = 1000
+
+class ParametroInvalido(ValueError):
+    pass
+
+def _ler_param_json(params, nome, padrao):
+    valor = params.get(nome)
+    if not valor:
+        return padrao
     try:
-        response = table.scan()
-        print(f"Resposta do DynamoDB scan: {response}")
-        registros = response.get('Items', [])
-        
-        for registro in registros:
-            registro['id'] = registro['alias']
-
-        qtd = len(registros)
-        content_range = f"registros 0-{qtd-1}/{qtd}" if qtd > 0 else "registros 0-0/0"
-
-        # Combina os cabeçalhos CORS comuns com os específicos para listar_registros
-        response_headers = {
-            **COMMON_HEADERS,
-            'Access-Control-Allow-Origin': '*',
-            'Content-Range': content_range,
-            'Access-Control-Expose-Headers': 'Content-Range' # Crucial para o React-Admin ler o Content-Range
-        }
-
-        print(f"Registros encontrados: {qtd}")
+        return json.loads(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' não é um JSON válido")
+
+def _ler_intervalo(params, headers):
+    intervalo = _ler_param_json(params, 'range', None)
+    if intervalo is None:
+        # Header "Range: registros=0-24" enviado pelo simpleRestProvider
+        header_range = etag_http.header(headers, 'range') or ''
+        if '=' in header_range:
+            try:
+                inicio, fim = header_range.split('=', 1)[1].split('-', 1)
+                intervalo = [int(inicio), int(fim)]
+            except ValueError:
+                raise ParametroInvalido("Header 'Range' inválido")
+    if intervalo is None:
+        return None
+    try:
+        inicio, fim = int(intervalo[0]), int(intervalo[1])
+    except (TypeError, ValueError, IndexError):
+        raise ParametroInvalido("Parâmetro 'range' deve ser [inicio, fim]")
+    if inicio < 0 or fim < inicio:
+        raise ParametroInvalido("Parâmetro 'range' fora dos limites")
+    return inicio, fim
+
+def _ler_ordenacao(params):
+    ordenacao = _ler_param_json(params, 'sort', None)
+    if not ordenacao:
+        return None, 'ASC'
+    try:
+        campo, ordem = ordenacao[0], str(ordenacao[1]).upper()
+    except (TypeError, IndexError):
+        raise ParametroInvalido("Parâmetro 'sort' deve ser [campo, ordem]")
+    # O React-Admin ordena por 'id', que é o próprio alias
+    return ('alias' if campo == 'id' else campo), ordem
+
+def _corpo_lista(registros):
+    for registro in registros:
+        registro['id'] = registro['alias']
+    return _json(registros)
+
+def _resposta_lista(corpo, content_range, etag, if_none_match, headers_extras=None):
+    if etag_http.confere(if_none_match, etag):
+        return _resposta_nao_modificada(etag)
+
+    # Combina os cabeçalhos CORS comuns com os específicos para listar_registros
+    response_headers = {
+        **COMMON_HEADERS,
+        'Content-Range': content_range,
+        'ETag': etag,
+        **(headers_extras or {})
+    }
+    return {
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': corpo
+    }
+
+def _ler_ids(params, filtros):
+    # getMany do React-Admin: ?ids=a,b,c ou filter={"id": ["a", "b", "c"]}
+    if params.get('ids'):
+        ids = [alias.strip() for alias in params['ids'].split(',')]
+    elif list(filtros) == ['id'] and isinstance(filtros['id'], list):
+        ids = [str(alias) for alias in filtros['id']]
+    else:
+        return None
+    ids = [alias for alias in dict.fromkeys(ids) if alias and alias != ALIAS_VERSAO]
+    if len(ids) > LIMITE_MAXIMO:
+        raise ParametroInvalido(f"Informe no máximo {LIMITE_MAXIMO} ids")
+    return ids
+
+def _listar_por_ids(ids, if_none_match):
+    # Lê só os registros pedidos: primeiro dos caches, o resto com batch_get_item
+    foto = fotos.atual()
+    registros, faltando = {}, []
+    for alias in ids:
+        achou, registro = cache_registros.obter(alias)
+        if not achou and foto is not None:
+            achou, registro = True, foto['registros'].get(alias)
+            cache_registros.guardar(alias, registro)
+        if achou:
+            registros[alias] = registro
+        else:
+            faltando.append(alias)
+    if faltando:
+        with log.cronometrar('dynamodb'):
+            lidos = repositorio.obter_varios(faltando)
+        for alias in faltando:
+            registros[alias] = lidos.get(alias)
+            cache_registros.guardar(alias, registros[alias])
+    log.debug("Leitura por ids: %d pedidos, %d lidos do DynamoDB", len(ids), len(faltando))
+
+    # Na ordem pedida; ids inexistentes (ou vencidos) são omitidos
+    itens = [
+        {**registros[alias], 'id': alias}
+        for alias in ids
+        if registros[alias] is not None and not expiracao.expirado(registros[alias])
+    ]
+    corpo = _json(itens)
+    content_range = _content_range(0, len(itens), len(itens))
+    return _resposta_lista(corpo, content_range, etag_http.etag(corpo, content_range), if_none_match)
+
+def listar_registros(params=None, headers=None):
+    log.debug("Iniciando listar_registros()", parametros=params)
+    params = params or {}
+    headers = headers or {}
+    if_none_match = etag_http.header(headers, 'if-none-match')
+    try:
+        filtros = _ler_param_json(params, 'filter', {})
+        if not isinstance(filtros, dict):
+            raise ParametroInvalido("Parâmetro 'filter' deve ser um objeto")
+
+        if params.get('endereco_ip'):
+            filtros = {**filtros, 'endereco_ip': params['endereco_ip']}
+
+        ids = _ler_ids(params, filtros)
+        if ids is not None:
+            return _listar_por_ids(ids, if_none_match)
+
+        if 'cursor' in params or 'limite' in params:
+            # Modo cursor: lê somente a página pedida. Como o Limit do DynamoDB é
+            # aplicado antes do filtro, uma página filtrada pode vir com menos itens.
+            try:
+                limite = max(1, min(int(params.get('limite') or LIMITE_PADRAO), LIMITE_MAXIMO))
+            except ValueError:
+                raise ParametroInvalido("Parâmetro 'limite' deve ser um inteiro")
+            try:
+                itens, proximo_cursor = repositorio.pagina(
+                    limite, params.get('cursor'), campos=CAMPOS_LISTAGEM, filtros=filtros, vigentes=True
+                )
+            except ValueError:
+                raise ParametroInvalido("Parâmetro 'cursor' inválido")
+            registros = [r for r in itens if r['alias'] != ALIAS_VERSAO]
+            headers_extras = {}
+            if proximo_cursor:
+                headers_extras['X-Proximo-Cursor'] = proximo_cursor
+            log.debug("Página com %d registros (modo cursor)", len(registros))
+            corpo = _corpo_lista(registros)
+            content_range = _content_range(0, len(registros), '*')
+            return _resposta_lista(corpo, content_range, etag_http.etag(corpo, content_range), if_none_match, headers_extras)
+
+        campo, ordem = _ler_ordenacao(params)
+        intervalo = _ler_intervalo(params, headers)
+
+        ip_consulta = filtros.get('endereco_ip')
+        if isinstance(ip_consulta, str) and ip_consulta and not fotos.em_cache():
+            # Sem a foto em memória, o índice por IP evita ler a tabela inteira
+            restantes = {k: v for k, v in filtros.items() if k != 'endereco_ip'}
+            with log.cronometrar('dynamodb'):
+                registros = list(repositorio.consultar_por_ip(ip_consulta, campos=CAMPOS_LISTAGEM, filtros=restantes, vigentes=True))
+            corpo, content_range, etag = montar_pagina(ordenar(registros, campo, ordem), intervalo, _json)
+            return _resposta_lista(corpo, content_range, etag, if_none_match)
+
+        # A listagem paginada é servida da foto da tabela em cache; o DynamoDB
+        # só é lido quando a foto expira ou é invalidada por uma escrita, e a
+        # repetição da mesma consulta responde 304 sem serializar nada
+        corpo, content_range, etag = fotos.pagina(filtros, campo, ordem, intervalo)
+        return _resposta_lista(corpo, content_range, etag, if_none_match)
+    except ParametroInvalido as e:
+        log.aviso("Parâmetros inválidos em listar_registros", excecao=e)
         return {
-            'statusCode': 200,
-            'headers': response_headers,
-            'body': json.dumps(registros, ensure_ascii=False)
+            'statusCode': 400,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': str(e)})
         }
     except Exception as e:
-        print(f"Erro em listar_registros: {e}")
+        log.erro("Erro em listar_registros", excecao=e)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': f'Erro ao listar registros: {str(e)}'}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao listar registros: {str(e)}'})
         }
 
-def obter_registro(subdominio):
-    print(f"Iniciando obter_registro() para subdominio: {subdominio}")
+def obter_registro(subdominio, headers=None):
+    log.debug("Iniciando obter_registro()", alias=subdominio)
     try:
-        response = table.get_item(
-            Key={'alias': subdominio}
-        )
-        print(f"Resposta do DynamoDB get_item: {response}")
-
-        if 'Item' not in response:
-            print("Registro não encontrado no DynamoDB")
+        fotos.verificar_versao()
+        achou, registro = cache_registros.obter(subdominio)
+        if not achou:
+            foto = fotos.atual()
+            if foto is not None:
+                registro = foto['registros'].get(subdominio)
+            else:
+                with log.cronometrar('dynamodb'):
+                    registro = repositorio.obter(subdominio)
+            # Ausências também ficam em cache; uma criação neste contêiner as invalida
+            cache_registros.guardar(subdominio, registro)
+
+        # Um item vencido continua na tabela até o TTL do DynamoDB removê-lo
+        if registro is None or expiracao.expirado(registro):
+            log.debug("Registro não encontrado no DynamoDB", alias=subdominio)
             return {
                 'statusCode': 404,
-                'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-                'body': json.dumps({'erro': 'Registro não encontrado'}, ensure_ascii=False)
+                'headers': COMMON_HEADERS,
+                'body': _json({'erro': 'Registro não encontrado'})
             }
 
-        registro = response['Item']
-        registro['id'] = registro['alias']
+        corpo = _json({**registro, 'id': registro['alias']})
+        etag = etag_http.etag(corpo)
+        if etag_http.confere(etag_http.header(headers, 'if-none-match'), etag):
+            return _resposta_nao_modificada(etag)
         
         return {
             'statusCode': 200,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps(registro, ensure_ascii=False)
+            'headers': {**COMMON_HEADERS, 'ETag': etag},
+            'body': corpo
         }
     except Exception as e:
-        print(f"Erro em obter_registro: {e}")
+        log.erro("Erro em obter_registro", excecao=e, alias=subdominio)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': f'Erro ao obter registro: {str(e)}'}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao obter registro: {str(e)}'})
         }
 
 
 def criar_registro(dados):
-    print(f"Iniciando criar_registro() com dados: {dados}")
+    log.debug("Iniciando criar_registro()", dados=dados)
     try:
         subdominio = dados.get('alias')
         endereco_ip = dados.get('endereco_ip')
 
         if not subdominio or not endereco_ip:
-            print("Subdomínio ou endereço IP não fornecido")
+            log.debug("Subdomínio ou endereço IP não fornecido")
             return {
                 'statusCode': 400,
-                'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-                'body': json.dumps({'erro': 'Subdomínio e endereço IP são obrigatórios'}, ensure_ascii=False)
+                'headers': COMMON_HEADERS,
+                'body': _json({'erro': 'Subdomínio e endereço IP são obrigatórios'})
             }
 
+        try:
+            expira_em = expiracao.ler_expira_em(dados.get(expiracao.CAMPO))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': COMMON_HEADERS,
+                'body': _json({'erro': str(e)})
+            }
+
+        if MODO_ESCRITA == 'outbox':
+            return _criar_registro_outbox(subdominio, endereco_ip, expira_em)
+
+        item_para_salvar = {
+            'alias': subdominio,
+            'endereco_ip': endereco_ip,
+            'data_criacao': datetime.now().isoformat()
+        }
+        if expira_em is not None:
+            item_para_salvar[expiracao.CAMPO] = expira_em
+        # Grava primeiro, só se o IP (ou a expiração) mudou. O mesmo IP só dispensa
+        # o UPSERT se o Route53 já o recebeu (APLICADO/PROPAGADO); senão o UPSERT,
+        # idempotente, vai de novo e corrige uma divergência no Route53
+        with log.cronometrar('dynamodb'):
+            gravou, anterior = repositorio.gravar_se_alterado(item_para_salvar, campos=('endereco_ip', expiracao.CAMPO))
+        if not gravou and anterior.get('status') in outbox.CONFIRMADOS:
+            log.info("Registro já aponta para este IP; nada a alterar", alias=subdominio, endereco_ip=endereco_ip)
+            return _resposta_inalterado(anterior)
+        if gravou:
+            log.debug("Registro salvo no DynamoDB", alias=subdominio)
+
         nome_registro = f'{subdominio}.{NAMESERVERS[0]}'
 
-        print(f"Criando registro no Route53: {nome_registro} -> {endereco_ip}")
+        log.debug("Criando registro no Route53: %s -> %s", nome_registro, endereco_ip)
 
         change_batch = {
             'Changes': [
@@ -208,55 +494,413 @@ def criar_registro(dados):
             ]
         }
 
-        route53.change_resource_record_sets(
-            HostedZoneId=ZONA_ID,
-            ChangeBatch=change_batch
-        )
-        print("Registro criado no Route53")
+        try:
+            with log.cronometrar('route53'):
+                resposta = escritor.aplicar(change_batch['Changes'])
+        except Exception:
+            if gravou:
+                _desfazer_gravacao(item_para_salvar, anterior)
+            raise
+        marcado = _marcar_aplicado(subdominio, endereco_ip, resposta['ChangeInfo']['Id'])
+        fotos.invalidar(subdominio)
+        if not gravou:
+            log.info("UPSERT reenviado para registro sem confirmação do Route53", alias=subdominio, endereco_ip=endereco_ip)
+            if marcado is not None:
+                _publicar([(ALTERADO, subdominio, marcado)])
+            return _resposta_inalterado(marcado or anterior)
+        log.info("Registro criado", alias=subdominio, endereco_ip=endereco_ip)
+
+        if marcado is not None:
+            item_para_salvar.update(status=marcado['status'], id_alteracao=marcado['id_alteracao'])
+        _publicar([(CRIADO if anterior is None else ALTERADO, subdominio, item_para_salvar)])
+        item_para_salvar['id'] = subdominio 
+        return {
+            'statusCode': 201,
+            'headers': COMMON_HEADERS,
+            'body': _json(item_para_salvar)
+        }
+    except ErroLimiteRoute53 as e:
+        log.aviso("Route53 recusou a alteração em criar_registro", excecao=e, status=e.status)
+        return _resposta_limite_route53(e)
+    except Exception as e:
+        log.erro("Erro em criar_registro", excecao=e)
+        return {
+            'statusCode': 500,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao criar registro: {str(e)}'})
+        }
 
-        item_para_salvar = {
-            'alias': subdominio,
-            'endereco_ip': endereco_ip,
-            'data_criacao': datetime.now().isoformat()
+def _resposta_inalterado(item):
+    return {
+        'statusCode': 200,
+        'headers': COMMON_HEADERS,
+        'body': _json({**item, 'id': item['alias'], 'alterado': False})
+    }
+
+def _publicar(deltas):
+    # [(tipo, alias, item ou None)]; uma falha no diário só vai para o log
+    if diario is not None and deltas:
+        diario.publicar(deltas)
+
+def _marcar_aplicado(alias, endereco_ip, id_alteracao):
+    # Sem a marca, o próximo envio do mesmo IP repete o UPSERT; nada se perde
+    try:
+        with log.cronometrar('dynamodb'):
+            return outbox.marcar_aplicado(repositorio, alias, endereco_ip, id_alteracao)
+    except CondicaoFalhou:
+        log.aviso("Registro foi alterado por outra escrita; não marcado como APLICADO", alias=alias)
+    except Exception as e:
+        log.aviso("Erro ao marcar o registro como APLICADO", excecao=e, alias=alias)
+    return None
+
+def _desfazer_gravacao(item, anterior):
+    # O Route53 falhou depois da gravação: devolve a tabela ao estado anterior,
+    # desde que ninguém tenha gravado o mesmo alias nesse meio tempo
+    try:
+        repositorio.desfazer_gravacao(item, anterior)
+        log.aviso("Gravação desfeita no DynamoDB", alias=item['alias'])
+    except CondicaoFalhou:
+        log.aviso("Registro foi alterado por outra escrita; gravação mantida", alias=item['alias'])
+    except Exception as e:
+        # A reconciliação corrige a divergência que sobrar
+        log.erro("Erro ao desfazer a gravação", excecao=e, alias=item['alias'])
+
+def _criar_registro_outbox(subdominio, endereco_ip, expira_em=None):
+    if not _ip_valido(endereco_ip):
+        return {
+            'statusCode': 400,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Endereço IP inválido: {endereco_ip}'})
+        }
+    try:
+        item, alterado, anterior = outbox.registrar_criacao(repositorio, subdominio, endereco_ip, expira_em)
+    except CondicaoFalhou:
+        return {
+            'statusCode': 409,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': 'Exclusão do registro em andamento'})
+        }
+    if not alterado:
+        log.info("Registro já aponta para este IP; nada a alterar", alias=subdominio, endereco_ip=endereco_ip)
+        return _resposta_inalterado(item)
+    log.info("Registro salvo no DynamoDB como PENDENTE", alias=subdominio, endereco_ip=endereco_ip)
+    fotos.invalidar(subdominio)
+    _publicar([(CRIADO if anterior is None else ALTERADO, subdominio, item)])
+    item['id'] = subdominio
+    return {
+        'statusCode': 202,
+        'headers': COMMON_HEADERS,
+        'body': _json(item)
+    }
+
+# --- Criação em lote: POST /registros/lote ---
+# Os UPSERTs são agrupados em ChangeBatches de até 1000 elementos (ver alteracoes_route53)
+def _ip_valido(endereco_ip):
+    try:
+        ipaddress.IPv4Address(endereco_ip)
+        return True
+    except ValueError:
+        return False
+
+def criar_registros_lote(dados):
+    log.debug("Iniciando criar_registros_lote()")
+    itens = dados.get('registros') if isinstance(dados, dict) else dados
+    if not isinstance(itens, list) or not itens:
+        return {
+            'statusCode': 400,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': "Informe uma lista não vazia em 'registros'"})
         }
-        table.put_item(Item=item_para_salvar)
-        print("Registro salvo no DynamoDB")
 
-        item_para_salvar['id'] = subdominio 
+    resultados = [None] * len(itens)
+    # alias -> índice do item; se o alias se repete no lote, vale o último
+    por_alias = {}
+    # índice -> expira_em (epoch), só para os itens que informaram
+    expiracoes = {}
+    for indice, item in enumerate(itens):
+        subdominio = item.get('alias') if isinstance(item, dict) else None
+        endereco_ip = item.get('endereco_ip') if isinstance(item, dict) else None
+        try:
+            expira_em = expiracao.ler_expira_em(item.get(expiracao.CAMPO)) if isinstance(item, dict) else None
+        except ValueError as e:
+            resultados[indice] = {'id': subdominio, 'status': 400, 'erro': str(e)}
+            continue
+        if not subdominio or not endereco_ip:
+            resultados[indice] = {'id': subdominio, 'status': 400, 'erro': 'Subdomínio e endereço IP são obrigatórios'}
+        elif not _ip_valido(endereco_ip):
+            resultados[indice] = {'id': subdominio, 'status': 400, 'erro': f'Endereço IP inválido: {endereco_ip}'}
+        else:
+            if expira_em is not None:
+                expiracoes[indice] = expira_em
+            if subdominio in por_alias:
+                resultados[por_alias[subdominio]] = {'id': subdominio, 'status': 409, 'erro': 'Alias repetido no lote; prevalece a última ocorrência'}
+            por_alias[subdominio] = indice
+
+    if MODO_ESCRITA == 'outbox':
+        return _resposta_lote(_criar_lote_outbox(itens, por_alias, expiracoes, resultados))
+
+    alteracoes = [
+        {
+            'Action': 'UPSERT',
+            'ResourceRecordSet': {
+                'Name': f'{subdominio}.{NAMESERVERS[0]}',
+                'Type': 'A',
+                'TTL': TTL_DNS,
+                'ResourceRecords': [{'Value': itens[indice]['endereco_ip']}]
+            }
+        }
+        for subdominio, indice in por_alias.items()
+    ]
+    nome_para_alias = {f'{subdominio}.{NAMESERVERS[0]}': subdominio for subdominio in por_alias}
+
+    for lote in dividir_change_batches(alteracoes):
+        aliases = [nome_para_alias[a['ResourceRecordSet']['Name']] for a in lote]
+        log.debug("Enviando ChangeBatch com %d alterações ao Route53", len(lote))
+        try:
+            with log.cronometrar('route53'):
+                resposta = escritor.aplicar(lote)
+            id_alteracao = resposta['ChangeInfo']['Id']
+        except Exception as e:
+            # O ChangeBatch é atômico: ou todas as alterações entram, ou nenhuma
+            log.erro("Erro ao enviar ChangeBatch", excecao=e, alteracoes=len(lote))
+            for subdominio in aliases:
+                resultados[por_alias[subdominio]] = {'id': subdominio, 'status': getattr(e, 'status', 500), 'erro': f'Erro ao criar registro: {str(e)}'}
+            continue
+
+        data_criacao = datetime.now().isoformat()
+        gravados = [
+            {
+                'alias': subdominio,
+                'endereco_ip': itens[por_alias[subdominio]]['endereco_ip'],
+                'data_criacao': data_criacao,
+                # Gravado depois do Route53 aceitar o ChangeBatch
+                'status': outbox.APLICADO,
+                'id_alteracao': id_alteracao,
+                **({expiracao.CAMPO: expiracoes[por_alias[subdominio]]} if por_alias[subdominio] in expiracoes else {})
+            }
+            for subdominio in aliases
+        ]
+        try:
+            with log.cronometrar('dynamodb'):
+                repositorio.gravar_lote(gravados)
+        except Exception as e:
+            log.erro("Erro ao gravar lote no DynamoDB", excecao=e, itens=len(aliases))
+            for subdominio in aliases:
+                resultados[por_alias[subdominio]] = {'id': subdominio, 'status': 500, 'erro': f'Registro criado no Route53, mas não salvo no DynamoDB: {str(e)}'}
+            continue
+        finally:
+            fotos.invalidar(*aliases)
+
+        # O batch_write_item não diz quais aliases já existiam
+        _publicar([(ALTERADO, item['alias'], item) for item in gravados])
+        for subdominio in aliases:
+            resultados[por_alias[subdominio]] = {
+                'id': subdominio,
+                'status': 201,
+                'endereco_ip': itens[por_alias[subdominio]]['endereco_ip'],
+                'id_alteracao': id_alteracao
+            }
+
+    return _resposta_lote(resultados)
+
+def _criar_lote_outbox(itens, por_alias, expiracoes, resultados):
+    try:
+        with log.cronometrar('dynamodb'):
+            gravados = outbox.registrar_lote(repositorio, [
+                (subdominio, itens[indice]['endereco_ip'], expiracoes.get(indice))
+                for subdominio, indice in por_alias.items()
+            ])
+    finally:
+        fotos.invalidar(*por_alias)
+    deltas = []
+    for subdominio, gravado in zip(por_alias, gravados):
+        indice = por_alias[subdominio]
+        if isinstance(gravado, CondicaoFalhou):
+            resultados[indice] = {'id': subdominio, 'status': 409, 'erro': 'Exclusão do registro em andamento'}
+        elif isinstance(gravado, Exception):
+            log.erro("Erro ao gravar registro do lote no DynamoDB", excecao=gravado, alias=subdominio)
+            resultados[indice] = {'id': subdominio, 'status': 500, 'erro': f'Erro ao salvar registro: {str(gravado)}'}
+        else:
+            item, alterado, anterior = gravado
+            if alterado:
+                deltas.append((CRIADO if anterior is None else ALTERADO, subdominio, item))
+            resultados[indice] = {
+                'id': subdominio,
+                'status': 202 if alterado else 200,
+                'endereco_ip': item['endereco_ip'],
+                'status_registro': item.get('status'),
+                'alterado': alterado
+            }
+    _publicar(deltas)
+    return resultados
+
+def _resposta_lote(resultados):
+    criados = sum(1 for r in resultados if r['status'] in (201, 202))
+    # 200: o registro já apontava para o mesmo IP (modo outbox)
+    inalterados = sum(1 for r in resultados if r['status'] == 200)
+    log.info("Lote processado", criados=criados, inalterados=inalterados, com_erro=len(resultados) - criados - inalterados)
+    return {
+        'statusCode': 200,
+        'headers': COMMON_HEADERS,
+        'body': _json({
+            'criados': criados,
+            'inalterados': inalterados,
+            'falhas': len(resultados) - criados - inalterados,
+            'resultados': resultados
+        })
+    }
+
+# --- Reapontamento em massa ---
+# POST /registros/reapontar {"ip_origem": "10.0.0.1", "ip_destino": "10.0.0.2"}
+# Ex.: a instância EC2 de um aluno foi recriada e o IP passou para outro.
+# Os aliases vêm do índice por IP; cada um muda no DynamoDB só se ainda apontar
+# para ip_origem, e os UPSERTs vão ao Route53 em ChangeBatches agrupados.
+def reapontar_registros(dados):
+    log.debug("Iniciando reapontar_registros()", dados=dados)
+    dados = dados if isinstance(dados, dict) else {}
+    ip_origem, ip_destino = dados.get('ip_origem'), dados.get('ip_destino')
+    if not ip_origem or not ip_destino or not _ip_valido(ip_origem) or not _ip_valido(ip_destino):
         return {
-            'statusCode': 201,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps(item_para_salvar, ensure_ascii=False)
+            'statusCode': 400,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': "Informe endereços IP válidos em 'ip_origem' e 'ip_destino'"})
+        }
+    if ip_origem == ip_destino:
+        return {
+            'statusCode': 400,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': "'ip_origem' e 'ip_destino' são iguais"})
         }
+    try:
+        with log.cronometrar('dynamodb'):
+            aliases = [r['alias'] for r in repositorio.consultar_por_ip(ip_origem, campos=('alias',), vigentes=True)]
+        if MODO_ESCRITA == 'outbox':
+            resultados = _reapontar_outbox(aliases, ip_origem, ip_destino)
+        else:
+            resultados = _reapontar_direto(aliases, ip_origem, ip_destino)
     except Exception as e:
-        print(f"Erro em criar_registro: {e}")
+        log.erro("Erro em reapontar_registros", excecao=e, ip_origem=ip_origem)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': f'Erro ao criar registro: {str(e)}'}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao reapontar registros: {str(e)}'})
         }
 
+    reapontados = sum(1 for r in resultados if r['status'] in (200, 202))
+    log.info("Reapontamento processado", ip_origem=ip_origem, ip_destino=ip_destino,
+             reapontados=reapontados, com_erro=len(resultados) - reapontados)
+    return {
+        'statusCode': 200,
+        'headers': COMMON_HEADERS,
+        'body': _json({
+            'ip_origem': ip_origem,
+            'ip_destino': ip_destino,
+            'reapontados': reapontados,
+            'falhas': len(resultados) - reapontados,
+            'resultados': resultados
+        })
+    }
+
+def _trocar_ip(alias, de, para):
+    # Sem status até o Route53 aceitar o UPSERT: um APLICADO antigo não pode
+    # dispensar o UPSERT de um novo envio do mesmo IP
+    return repositorio.atualizar(
+        alias, {'endereco_ip': para, 'status': None},
+        condicao='#ip = :de', nomes={'#ip': 'endereco_ip'}, valores={':de': de}
+    )
+
+def _reapontar_direto(aliases, ip_origem, ip_destino):
+    resultados = {}
+    # alias -> item já com ip_destino, publicado depois do Route53
+    trocados = {}
+    try:
+        with log.cronometrar('dynamodb'):
+            for alias in aliases:
+                try:
+                    trocados[alias] = _trocar_ip(alias, ip_origem, ip_destino)
+                except CondicaoFalhou:
+                    # Outra escrita mudou o IP depois da consulta ao índice
+                    resultados[alias] = {'id': alias, 'status': 409, 'erro': 'O registro não aponta mais para ip_origem'}
+                except Exception as e:
+                    resultados[alias] = {'id': alias, 'status': 500, 'erro': f'Erro ao reapontar registro: {str(e)}'}
+
+        alteracoes = [
+            {
+                'Action': 'UPSERT',
+                'ResourceRecordSet': {
+                    'Name': f'{alias}.{NAMESERVERS[0]}',
+                    'Type': 'A',
+                    'TTL': TTL_DNS,
+                    'ResourceRecords': [{'Value': ip_destino}]
+                }
+            }
+            for alias in trocados
+        ]
+        nome_para_alias = {f'{alias}.{NAMESERVERS[0]}': alias for alias in trocados}
+        for lote in dividir_change_batches(alteracoes):
+            aliases_lote = [nome_para_alias[a['ResourceRecordSet']['Name']] for a in lote]
+            try:
+                with log.cronometrar('route53'):
+                    resposta = escritor.aplicar(lote)
+            except Exception as e:
+                log.erro("Erro ao enviar ChangeBatch", excecao=e, alteracoes=len(lote))
+                for alias in aliases_lote:
+                    try:
+                        _trocar_ip(alias, ip_destino, ip_origem)
+                    except Exception:
+                        # Outra escrita venceu, ou a reconciliação corrige a divergência
+                        pass
+                    resultados[alias] = {'id': alias, 'status': getattr(e, 'status', 500), 'erro': f'Erro ao reapontar registro: {str(e)}'}
+                continue
+            for alias in aliases_lote:
+                trocados[alias] = _marcar_aplicado(alias, ip_destino, resposta['ChangeInfo']['Id']) or trocados[alias]
+                resultados[alias] = {'id': alias, 'status': 200, 'endereco_ip': ip_destino, 'id_alteracao': resposta['ChangeInfo']['Id']}
+            _publicar([(ALTERADO, alias, trocados[alias]) for alias in aliases_lote])
+    finally:
+        fotos.invalidar(*aliases)
+    return [resultados[alias] for alias in aliases]
+
+def _reapontar_outbox(aliases, ip_origem, ip_destino):
+    resultados = []
+    deltas = []
+    try:
+        with log.cronometrar('dynamodb'):
+            for alias in aliases:
+                try:
+                    item = outbox.registrar_reapontamento(repositorio, alias, ip_origem, ip_destino)
+                    resultados.append({'id': alias, 'status': 202, 'endereco_ip': ip_destino, 'status_registro': item['status']})
+                    deltas.append((ALTERADO, alias, item))
+                except CondicaoFalhou:
+                    resultados.append({'id': alias, 'status': 409, 'erro': 'O registro não aponta mais para ip_origem ou está sendo excluído'})
+                except Exception as e:
+                    resultados.append({'id': alias, 'status': 500, 'erro': f'Erro ao reapontar registro: {str(e)}'})
+    finally:
+        fotos.invalidar(*aliases)
+        _publicar(deltas)
+    return resultados
+
 def deletar_registro(subdominio):
-    print(f"Iniciando deletar_registro() para subdominio: {subdominio}")
+    log.debug("Iniciando deletar_registro()", alias=subdominio)
     try:
-        response = table.get_item(
-            Key={'alias': subdominio}
-        )
-        print(f"Resposta do DynamoDB get_item: {response}")
+        if MODO_ESCRITA == 'outbox':
+            return _deletar_registro_outbox(subdominio)
+
+        with log.cronometrar('dynamodb'):
+            registro = repositorio.obter(subdominio)
 
-        if 'Item' not in response:
-            print("Registro não encontrado no DynamoDB")
+        if registro is None:
+            log.debug("Registro não encontrado no DynamoDB", alias=subdominio)
             return {
                 'statusCode': 404,
-                'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-                'body': json.dumps({'erro': 'Registro não encontrado'}, ensure_ascii=False)
+                'headers': COMMON_HEADERS,
+                'body': _json({'erro': 'Registro não encontrado'})
             }
 
-        endereco_ip = response['Item']['endereco_ip']
+        endereco_ip = registro['endereco_ip']
 
         nome_registro = f'{subdominio}.{NAMESERVERS[0]}'
 
-        print(f"Deletando registro no Route53: {nome_registro} -> {endereco_ip}")
+        log.debug("Deletando registro no Route53: %s -> %s", nome_registro, endereco_ip)
 
         change_batch = {
             'Changes': [
@@ -274,46 +918,84 @@ def deletar_registro(subdominio):
             ]
         }
 
-        route53.change_resource_record_sets(
-            HostedZoneId=ZONA_ID,
-            ChangeBatch=change_batch
-        )
-        print("Registro deletado do Route53")
+        with log.cronometrar('route53'):
+            escritor.aplicar(change_batch['Changes'])
+        log.debug("Registro deletado do Route53", alias=subdominio)
 
-        table.delete_item(
-            Key={'alias': subdominio}
-        )
-        print("Registro deletado do DynamoDB")
+        with log.cronometrar('dynamodb'):
+            repositorio.excluir(subdominio)
+        log.info("Registro deletado", alias=subdominio, endereco_ip=endereco_ip)
+        fotos.invalidar(subdominio)
+        _publicar([(REMOVIDO, subdominio, None)])
 
         return {
             'statusCode': 200,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'id': subdominio}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'id': subdominio})
         }
+    except ErroLimiteRoute53 as e:
+        log.aviso("Route53 recusou a alteração em deletar_registro", excecao=e, status=e.status)
+        return _resposta_limite_route53(e)
     except Exception as e:
-        print(f"Erro em deletar_registro: {e}")
+        log.erro("Erro em deletar_registro", excecao=e, alias=subdominio)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': f'Erro ao deletar registro: {str(e)}'}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao deletar registro: {str(e)}'})
+        }
+
+def _deletar_registro_outbox(subdominio):
+    try:
+        item = outbox.registrar_exclusao(repositorio, subdominio)
+    except CondicaoFalhou:
+        return {
+            'statusCode': 404,
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': 'Registro não encontrado'})
         }
+    log.info("Registro marcado como EXCLUINDO no DynamoDB", alias=subdominio)
+    fotos.invalidar(subdominio)
+    _publicar([(ALTERADO, subdominio, item)])
+    return {
+        'statusCode': 202,
+        'headers': COMMON_HEADERS,
+        'body': _json({'id': subdominio, 'status': outbox.EXCLUINDO})
+    }
+
+_INFO_FIXO = {
+    'nameservers': NAMESERVERS,
+    'zona_id': ZONA_ID,
+    'ttl': TTL_DNS,
+    'modo_escrita': MODO_ESCRITA
+}
 
 def obter_info():
-    print("Iniciando obter_info()")
     try:
+        cache = {**fotos.estatisticas(), 'chaves': verificador.estatisticas()}
         return {
             'statusCode': 200,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({
-                'nameservers': NAMESERVERS,
-                'zona_id': ZONA_ID,
-                'ttl': TTL_DNS
-            }, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({**_INFO_FIXO, 'cache': cache, 'route53': escritor.estatisticas()})
         }
     except Exception as e:
-        print(f"Erro em  obter_info: {e}")
+        log.erro("Erro em obter_info", excecao=e)
         return {
             'statusCode': 500,
-            'headers': {**COMMON_HEADERS}, # Adiciona cabeçalhos CORS
-            'body': json.dumps({'erro': f'Erro ao obter informações: {str(e)}'}, ensure_ascii=False)
+            'headers': COMMON_HEADERS,
+            'body': _json({'erro': f'Erro ao obter informações: {str(e)}'})
         }
+
+
+# --- Tabela de rotas (caminhos sem o estágio) ---
+# A ordem importa dentro de um método: /registros/lote antes de /registros/{subdominio}
+_ROTAS = _compilar_rotas([
+    ('GET', '/registros', lambda event: listar_registros(
+        event.get('queryStringParameters') or {}, event.get('headers') or {})),
+    ('GET', '/registros/{subdominio}', lambda event, subdominio: obter_registro(
+        subdominio, event.get('headers') or {})),
+    ('POST', '/registros/lote', lambda event: criar_registros_lote(json.loads(event.get('body') or '{}'))),
+    ('POST', '/registros/reapontar', lambda event: reapontar_registros(json.loads(event.get('body') or '{}'))),
+    ('POST', '/registros', lambda event: criar_registro(json.loads(event.get('body') or '{}'))),
+    ('DELETE', '/registros/{subdominio}', lambda event, subdominio: deletar_registro(subdominio)),
+    ('GET', '/info', lambda event: obter_info()),
+])
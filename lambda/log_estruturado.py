@@ -0,0 +1,159 @@
+# log_estruturado.py
+# Log estruturado: uma linha JSON por evento, no formato que o CloudWatch Logs
+# Insights consulta diretamente (fields nivel, mensagem, duracao_ms...).
+#
+# - LOG_NIVEL: DEBUG, INFO (padrão), AVISO ou ERRO.
+# - LOG_AMOSTRA_DEBUG: fração das requisições (0 a 1) que registram DEBUG mesmo
+#   com um nível acima; a decisão é tomada uma vez por requisição.
+#
+# Nada é formatado quando o nível está desligado: a mensagem aceita argumentos
+# no estilo %s ou uma função sem argumentos, e os campos extras só são
+# convertidos para JSON na hora de emitir. Cabeçalhos e campos com segredos
+# (x-api-key, authorization, senha) são sempre mascarados.
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+NIVEIS = {'DEBUG': 10, 'INFO': 20, 'AVISO': 30, 'ERRO': 40}
+# Aceita também os nomes usuais em inglês na variável de ambiente
+_SINONIMOS = {'WARNING': 'AVISO', 'WARN': 'AVISO', 'ERROR': 'ERRO'}
+
+CAMPOS_SENSIVEIS = frozenset({'x-api-key', 'x_api_key', 'authorization', 'senha', 'senha_api'})
+MASCARA = '***'
+
+
+def nivel_numerico(nome):
+    nome = str(nome).upper()
+    nome = _SINONIMOS.get(nome, nome)
+    if nome not in NIVEIS:
+        raise ValueError(f"Nível de log inválido: {nome}")
+    return NIVEIS[nome]
+
+
+def mascarar(valor):
+    """Cópia de dicionários e listas com os campos sensíveis mascarados."""
+    if isinstance(valor, dict):
+        return {
+            chave: MASCARA if str(chave).lower() in CAMPOS_SENSIVEIS else mascarar(item)
+            for chave, item in valor.items()
+        }
+    if isinstance(valor, (list, tuple)):
+        return [mascarar(item) for item in valor]
+    return valor
+
+
+# Estado da requisição em andamento; ContextVar também funciona nos endpoints
+# síncronos do FastAPI, que rodam no threadpool com uma cópia do contexto
+_requisicao = ContextVar('requisicao_log', default=None)
+
+
+class LogEstruturado:
+    def __init__(self, servico, nivel=None, amostra_debug=None, saida=None,
+                 relogio=time.perf_counter, aleatorio=random.random):
+        self.servico = servico
+        self.nivel = nivel_numerico(nivel or os.environ.get('LOG_NIVEL', 'INFO'))
+        self.amostra_debug = float(
+            amostra_debug if amostra_debug is not None else os.environ.get('LOG_AMOSTRA_DEBUG', '0')
+        )
+        self.saida = saida
+        self.relogio = relogio
+        self.aleatorio = aleatorio
+
+    def habilitado(self, nivel):
+        minimo = self.nivel
+        requisicao = _requisicao.get()
+        if requisicao is not None and requisicao['debug']:
+            minimo = NIVEIS['DEBUG']
+        return NIVEIS[nivel] >= minimo
+
+    def debug(self, mensagem, *args, **campos):
+        self._emitir('DEBUG', mensagem, args, campos)
+
+    def info(self, mensagem, *args, **campos):
+        self._emitir('INFO', mensagem, args, campos)
+
+    def aviso(self, mensagem, *args, **campos):
+        self._emitir('AVISO', mensagem, args, campos)
+
+    def erro(self, mensagem, *args, **campos):
+        self._emitir('ERRO', mensagem, args, campos)
+
+    def _emitir(self, nivel, mensagem, args, campos):
+        if not self.habilitado(nivel):
+            return
+        if callable(mensagem):
+            mensagem = mensagem()
+        elif args:
+            mensagem = mensagem % args
+        registro = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': nivel,
+            'servico': self.servico,
+            'mensagem': mensagem
+        }
+        requisicao = _requisicao.get()
+        if requisicao is not None:
+            registro.update(requisicao['campos'])
+        excecao = campos.pop('excecao', None)
+        if excecao is not None:
+            registro['erro'] = str(excecao)
+            registro['tipo_erro'] = type(excecao).__name__
+        registro.update(mascarar(campos))
+        linha = json.dumps(registro, ensure_ascii=False, default=str)
+        # sys.stdout é lido na hora: o runtime do Lambda (e os testes) podem trocá-lo
+        saida = self.saida or sys.stdout
+        saida.write(linha + '\n')
+        saida.flush()
+
+    def campos_requisicao(self, **campos):
+        """Acrescenta campos a todos os logs da requisição em andamento."""
+        requisicao = _requisicao.get()
+        if requisicao is not None:
+            requisicao['campos'].update(mascarar(campos))
+
+    @contextmanager
+    def requisicao(self, id_requisicao=None, **campos):
+        """
+        Delimita uma requisição: todos os logs dentro dela levam id_requisicao e
+        os campos dados, e ao final é emitido um log INFO com a duracao_ms e os
+        tempos medidos com cronometrar(). Devolve um dicionário em que o
+        handler pode registrar o status da resposta.
+        """
+        estado = {
+            'debug': self.amostra_debug > 0 and self.aleatorio() < self.amostra_debug,
+            'campos': {'id_requisicao': id_requisicao or uuid.uuid4().hex, **mascarar(campos)},
+            'tempos': {}
+        }
+        resultado = {}
+        token = _requisicao.set(estado)
+        inicio = self.relogio()
+        try:
+            yield resultado
+        except Exception as e:
+            resultado.setdefault('status', 500)
+            resultado.setdefault('excecao', e)
+            raise
+        finally:
+            duracao = round((self.relogio() - inicio) * 1000, 2)
+            tempos = {nome: round(ms, 2) for nome, ms in estado['tempos'].items()}
+            nivel = 'ERRO' if resultado.get('status', 200) >= 500 else 'INFO'
+            self._emitir(nivel, 'Requisição concluída', (), {**resultado, 'duracao_ms': duracao, 'tempos_ms': tempos})
+            _requisicao.reset(token)
+
+    @contextmanager
+    def cronometrar(self, nome):
+        """Soma o tempo do bloco em tempos_ms[nome] da requisição em andamento."""
+        inicio = self.relogio()
+        try:
+            yield
+        finally:
+            requisicao = _requisicao.get()
+            if requisicao is not None:
+                tempos = requisicao['tempos']
+                tempos[nome] = tempos.get(nome, 0) + (self.relogio() - inicio) * 1000
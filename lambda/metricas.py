@@ -0,0 +1,239 @@
+# metricas.py
+# Métricas de latência por rota e por dependência no CloudWatch Embedded Metric
+# Format (EMF): cada requisição escreve uma linha JSON no stdout, que o
+# CloudWatch Logs transforma em métricas sem nenhuma chamada extra de rede.
+#
+# Por requisição (dimensões Servico e Rota, e só Servico):
+# - Latencia, TamanhoRequisicao, TamanhoResposta e ColdStart (1 no primeiro
+#   uso do contêiner);
+# - <Dependencia>Latencia, <Dependencia>Chamadas, <Dependencia>Retentativas e
+#   <Dependencia>Erros para cada serviço AWS chamado (Route53, DynamoDB...),
+#   medidos por hooks do botocore em todos os clientes de clientes_aws;
+# - Route53EsperaTaxa: tempo parado no balde de tokens do escritor_route53.
+#
+# METRICAS_MODO: 'emf' (padrão), 'local' (agrega em histogramas na memória,
+# para testes e benchmarks; ver resumo_local()) ou 'desligado'.
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+NAMESPACE = os.environ.get('METRICAS_NAMESPACE', 'GerenciadorDNS')
+MODO = os.environ.get('METRICAS_MODO', 'emf')
+
+# O EMF aceita até 100 valores por métrica em uma mesma linha
+MAX_VALORES_EMF = 100
+
+_NOMES_DEPENDENCIAS = {'route53': 'Route53', 'dynamodb': 'DynamoDB', 'dynamodbstreams': 'DynamoDBStreams'}
+
+_cold_start = True
+
+
+class Histogramas:
+    """Valores por (métrica, dimensões), com percentis calculados sob demanda."""
+
+    def __init__(self):
+        self.valores = {}
+
+    def registrar(self, nome, valor, dimensoes=()):
+        self.valores.setdefault((nome, tuple(dimensoes)), []).append(valor)
+
+    def limpar(self):
+        self.valores.clear()
+
+    @staticmethod
+    def percentil(ordenados, p):
+        # Nearest-rank: o menor valor com pelo menos p% das amostras abaixo dele
+        indice = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+        return ordenados[int(indice)]
+
+    def resumo(self):
+        """{(métrica, dimensões): {'n', 'media', 'p50', 'p95', 'p99', 'max'}}"""
+        resultado = {}
+        for chave, valores in self.valores.items():
+            ordenados = sorted(valores)
+            resultado[chave] = {
+                'n': len(ordenados),
+                'media': sum(ordenados) / len(ordenados),
+                'p50': self.percentil(ordenados, 50),
+                'p95': self.percentil(ordenados, 95),
+                'p99': self.percentil(ordenados, 99),
+                'max': ordenados[-1]
+            }
+        return resultado
+
+
+local = Histogramas()
+
+
+def resumo_local():
+    return local.resumo()
+
+
+class Unidade:
+    """Métricas de uma requisição (ou invocação), emitidas juntas no final."""
+
+    def __init__(self, servico, rota):
+        self.servico = servico
+        self.rota = rota
+        self.valores = {}
+        self.unidades = {}
+        self.propriedades = {}
+
+    def adicionar(self, nome, valor, unidade='Milliseconds'):
+        self.unidades[nome] = unidade
+        if unidade == 'Count' and nome in self.valores:
+            # Contadores são somados; latências ficam uma amostra por chamada
+            self.valores[nome][0] += valor
+        else:
+            self.valores.setdefault(nome, []).append(valor)
+
+    def emitir(self, modo=None, saida=None):
+        modo = modo or MODO
+        if modo == 'local':
+            for nome, valores in self.valores.items():
+                for valor in valores:
+                    local.registrar(nome, valor, (('Servico', self.servico), ('Rota', self.rota)))
+            return
+        if modo != 'emf' or not self.valores:
+            return
+        linha = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Servico', 'Rota'], ['Servico']],
+                    'Metrics': [{'Name': nome, 'Unit': self.unidades[nome]} for nome in self.valores]
+                }]
+            },
+            'Servico': self.servico,
+            'Rota': self.rota,
+            **self.propriedades
+        }
+        for nome, valores in self.valores.items():
+            linha[nome] = valores[0] if len(valores) == 1 else valores[:MAX_VALORES_EMF]
+        saida = saida or sys.stdout
+        saida.write(json.dumps(linha, default=str) + '\n')
+        saida.flush()
+
+
+_unidade = ContextVar('unidade_metricas', default=None)
+# Chamadas feitas em threads do próprio processo (scan paralelo, escritor) não
+# herdam o ContextVar; como o Lambda atende uma invocação por vez, elas vão para
+# a última unidade aberta
+_ultima_unidade = None
+
+
+def unidade_atual():
+    return _unidade.get() or _ultima_unidade
+
+
+def registrar(nome, valor, unidade='Milliseconds'):
+    """Soma um valor à requisição em andamento (ignorado fora de uma)."""
+    atual = unidade_atual()
+    if atual is not None:
+        atual.adicionar(nome, valor, unidade)
+
+
+@contextmanager
+def medir(servico, rota, tamanho_requisicao=None):
+    """
+    Mede uma requisição: Latencia e ColdStart são registrados no final e tudo é
+    emitido em uma linha EMF. Devolve a Unidade, onde o chamador pode registrar
+    o TamanhoResposta e propriedades (ex.: status).
+    """
+    global _cold_start, _ultima_unidade
+    unidade = Unidade(servico, rota)
+    unidade.adicionar('ColdStart', 1 if _cold_start else 0, 'Count')
+    _cold_start = False
+    if tamanho_requisicao is not None:
+        unidade.adicionar('TamanhoRequisicao', tamanho_requisicao, 'Bytes')
+    token = _unidade.set(unidade)
+    _ultima_unidade = unidade
+    inicio = time.perf_counter()
+    try:
+        yield unidade
+    finally:
+        unidade.adicionar('Latencia', (time.perf_counter() - inicio) * 1000)
+        _unidade.reset(token)
+        if _ultima_unidade is unidade:
+            _ultima_unidade = None
+        unidade.emitir()
+
+
+def rota_api_gateway(evento):
+    """'MÉTODO /caminho' sem o estágio e com ids trocados por {id} (dimensão de baixa cardinalidade)."""
+    caminho = evento.get('resource') or evento.get('path') or ''
+    partes = [p for p in caminho.split('/') if p]
+    if partes and partes[0] == 'prod':
+        partes = partes[1:]
+    if len(partes) >= 2 and partes[0] == 'registros' and partes[1] not in ('lote', 'reapontar'):
+        partes[1:] = ['{id}']
+    return f"{evento.get('httpMethod', '')} /{'/'.join(partes)}"
+
+
+def medir_handler(servico, rota=rota_api_gateway):
+    """Decorador para o lambda_handler; rota recebe o evento e devolve o nome da rota."""
+    def decorador(handler):
+        @wraps(handler)
+        def envoltorio(evento, contexto):
+            evento_dict = evento if isinstance(evento, dict) else {}
+            corpo = evento_dict.get('body')
+            with medir(servico, rota(evento_dict), len(corpo.encode()) if isinstance(corpo, str) else None) as unidade:
+                resposta = handler(evento, contexto)
+                if isinstance(resposta, dict):
+                    if isinstance(resposta.get('body'), str):
+                        unidade.adicionar('TamanhoResposta', len(resposta['body'].encode()), 'Bytes')
+                    if 'statusCode' in resposta:
+                        unidade.propriedades['status'] = resposta['statusCode']
+                return resposta
+        return envoltorio
+    return decorador
+
+
+# --- Hooks do botocore ---
+def _dependencia(model):
+    nome = model.service_model.service_name
+    return _NOMES_DEPENDENCIAS.get(nome, nome.capitalize())
+
+
+def _antes_da_chamada(model, context, **kwargs):
+    context['metricas'] = (_dependencia(model), time.perf_counter())
+
+
+def _fim_da_chamada(context, resposta=None, erro=False):
+    dependencia, inicio = context.pop('metricas', (None, None))
+    atual = unidade_atual()
+    if dependencia is None or atual is None:
+        return
+    atual.adicionar(f'{dependencia}Latencia', (time.perf_counter() - inicio) * 1000)
+    atual.adicionar(f'{dependencia}Chamadas', 1, 'Count')
+    # Retentativas feitas pelo próprio botocore dentro desta chamada
+    tentativas = (resposta or {}).get('ResponseMetadata', {}).get('RetryAttempts')
+    if tentativas:
+        atual.adicionar(f'{dependencia}Retentativas', tentativas, 'Count')
+    if erro:
+        atual.adicionar(f'{dependencia}Erros', 1, 'Count')
+
+
+def _depois_da_chamada(http_response, parsed, context, **kwargs):
+    _fim_da_chamada(context, parsed, erro=http_response.status_code >= 300)
+
+
+def _erro_na_chamada(exception, context, **kwargs):
+    # Falha sem resposta HTTP (timeout, conexão recusada)
+    _fim_da_chamada(context, erro=True)
+
+
+def instrumentar_cliente(cliente):
+    """Registra os hooks de latência, retentativas e erros em um cliente boto3."""
+    if MODO == 'desligado':
+        return cliente
+    eventos = cliente.meta.events
+    eventos.register('before-call.*.*', _antes_da_chamada, unique_id='metricas-antes')
+    eventos.register('after-call.*.*', _depois_da_chamada, unique_id='metricas-depois')
+    eventos.register('after-call-error.*.*', _erro_na_chamada, unique_id='metricas-erro')
+    return cliente
@@ -0,0 +1,134 @@
+# outbox.py
+# Modo de escrita "outbox" (MODO_ESCRITA=outbox).
+#
+# No modo direto, a API grava no DynamoDB e espera o Route53 responder, e a
+# latência da API acompanha a do Route53. No modo outbox, a API só grava a
+# intenção na tabela (status PENDENTE ou EXCLUINDO) e responde 202; o
+# consumidor do DynamoDB Streams (consumidor_stream.py) aplica as alterações no
+# Route53 em lote e marca o item como APLICADO (ou o remove, na exclusão).
+#
+# Cada escrita recebe um id_operacao novo: o consumidor só altera o item se o
+# id ainda for o mesmo, então uma escrita mais nova nunca é sobrescrita.
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from repositorio_registros import CAMPO_EXPIRACAO, CondicaoFalhou
+
+PENDENTE = 'PENDENTE'
+APLICADO = 'APLICADO'
+# Alteração concluída no Route53 (get_change INSYNC), promovida pelo reconciliador
+PROPAGADO = 'PROPAGADO'
+# O Route53 já recebeu a alteração: reenviar o mesmo IP dispensa outro UPSERT
+CONFIRMADOS = (APLICADO, PROPAGADO)
+EXCLUINDO = 'EXCLUINDO'
+ERRO = 'ERRO'
+
+
+def _novo_item(alias, endereco_ip, data_criacao, expira_em=None):
+    item = {
+        'alias': alias,
+        'endereco_ip': endereco_ip,
+        'data_criacao': data_criacao,
+        'status': PENDENTE,
+        'id_operacao': uuid.uuid4().hex
+    }
+    if expira_em is not None:
+        item[CAMPO_EXPIRACAO] = expira_em
+    return item
+
+
+def registrar_criacao(repositorio, alias, endereco_ip, expira_em=None):
+    """
+    Grava o registro como PENDENTE, se o IP (ou o expira_em) mudou. Devolve
+    (item, alterado, anterior): anterior é o item substituído, ou None se o
+    alias é novo. Sem mudança, nada é gravado e o item atual volta com
+    alterado=False (um item em ERRO é gravado de novo, para nova tentativa).
+    Levanta CondicaoFalhou se houver uma exclusão em andamento para o mesmo alias.
+    """
+    item = _novo_item(alias, endereco_ip, datetime.now().isoformat(), expira_em)
+    valores = {':excluindo': EXCLUINDO, ':ip': endereco_ip, ':erro': ERRO}
+    if expira_em is None:
+        expiracao_mudou = 'attribute_exists(#exp)'
+    else:
+        expiracao_mudou = 'attribute_not_exists(#exp) OR #exp <> :exp'
+        valores[':exp'] = expira_em
+    try:
+        anterior = repositorio.gravar(
+            item,
+            condicao='(attribute_not_exists(#status) OR #status <> :excluindo) '
+                     f'AND (attribute_not_exists(#ip) OR #ip <> :ip OR #status = :erro OR {expiracao_mudou})',
+            nomes={'#status': 'status', '#ip': 'endereco_ip', '#exp': CAMPO_EXPIRACAO},
+            valores=valores,
+            devolver_anterior=True
+        )
+    except CondicaoFalhou as e:
+        # e.item é o item atual, devolvido pelo DynamoDB junto com a falha da condição
+        atual = e.item
+        if atual is None or atual.get('status') == EXCLUINDO:
+            raise
+        return atual, False, atual
+    return item, True, anterior
+
+
+def registrar_lote(repositorio, registros, paralelismo=8):
+    """
+    Grava vários registros com a mesma escrita condicional de registrar_criacao
+    (batch_write_item não aceita condições, e sobrescreveria um item EXCLUINDO),
+    com até `paralelismo` escritas simultâneas.
+    registros: tuplas (alias, endereco_ip) ou (alias, endereco_ip, expira_em).
+
+    Devolve um resultado por registro, na ordem recebida: a tupla de
+    registrar_criacao, ou a exceção levantada (CondicaoFalhou se houver uma
+    exclusão em andamento para o alias).
+    """
+    def _registrar(registro):
+        try:
+            return registrar_criacao(repositorio, *registro)
+        except Exception as e:
+            return e
+
+    if not registros:
+        return []
+    with ThreadPoolExecutor(max_workers=min(paralelismo, len(registros))) as executor:
+        return list(executor.map(_registrar, registros))
+
+
+def registrar_reapontamento(repositorio, alias, ip_origem, ip_destino):
+    """
+    Troca o IP do registro de ip_origem para ip_destino como PENDENTE. Levanta
+    CondicaoFalhou se o IP já não for ip_origem ou se houver uma exclusão em
+    andamento.
+    """
+    return repositorio.atualizar(
+        alias,
+        {'endereco_ip': ip_destino, 'status': PENDENTE, 'id_operacao': uuid.uuid4().hex},
+        condicao='#ip = :origem AND (attribute_not_exists(#status) OR #status <> :excluindo)',
+        nomes={'#ip': 'endereco_ip', '#status': 'status'},
+        valores={':origem': ip_origem, ':excluindo': EXCLUINDO}
+    )
+
+
+def registrar_exclusao(repositorio, alias):
+    """Marca o registro como EXCLUINDO. Levanta CondicaoFalhou se ele não existir."""
+    return repositorio.atualizar(
+        alias,
+        {'status': EXCLUINDO, 'id_operacao': uuid.uuid4().hex},
+        condicao='attribute_exists(#chave)',
+        nomes={'#chave': repositorio.chave}
+    )
+
+
+def marcar_aplicado(repositorio, alias, endereco_ip, id_alteracao):
+    """
+    Modo direto: marca como APLICADO o registro cujo UPSERT o Route53 aceitou,
+    se ele ainda apontar para endereco_ip. Levanta CondicaoFalhou se outra
+    escrita trocou o IP nesse meio tempo.
+    """
+    return repositorio.atualizar(
+        alias,
+        {'status': APLICADO, 'id_alteracao': id_alteracao},
+        condicao='#ip = :ip',
+        nomes={'#ip': 'endereco_ip'},
+        valores={':ip': endereco_ip}
+    )
@@ -0,0 +1,289 @@
+# reconciliador.py
+# Detecta e corrige divergências entre o Route53 e a tabela de registros.
+#
+# As rotas de escrita gravam no DynamoDB e depois no Route53, sem atomicidade
+# entre os dois; uma falha no meio (ou ao desfazer a gravação) deixa os dois
+# lados diferentes.
+# O reconciliador lê os registros A da zona e a tabela inteira, compara os dois
+# conjuntos por alias e aplica as correções em ChangeBatches do maior tamanho
+# permitido e em lotes de batch_write_item.
+#
+# A tabela é a fonte da verdade para o IP: registros ausentes ou divergentes no
+# Route53 recebem um UPSERT com o IP da tabela. Para registros que só existem no
+# Route53 (órfãos) a política é configurável: 'ignorar' (padrão, só reporta),
+# 'importar' (grava na tabela) ou 'remover' (apaga do Route53).
+#
+# Na mesma execução agendada, os registros APLICADO cujas alterações o Route53
+# já concluiu (get_change INSYNC) passam a PROPAGADO; os ainda PENDING ficam
+# para a próxima execução.
+#
+# Entrada agendada: reconciliador.lambda_handler. CLI: scripts/reconciliar_dns.py
+import os
+import re
+import time
+from datetime import datetime
+
+import clientes_aws
+from alteracoes_route53 import alteracao_registro_a, dividir_change_batches
+from escritor_route53 import BaldeTokens, EscritorRoute53
+import expiracao
+from log_estruturado import LogEstruturado
+import metricas
+from outbox import APLICADO, EXCLUINDO, PENDENTE, PROPAGADO
+from repositorio_registros import ALIAS_VERSAO, CondicaoFalhou, RepositorioRegistros
+
+log = LogEstruturado('reconciliador')
+
+POLITICAS_ORFAOS = ('ignorar', 'importar', 'remover')
+
+# O Route53 devolve caracteres especiais dos nomes como \ddd (octal), ex.: \052 = '*'
+_ESCAPE_OCTAL = re.compile(r'\\(\d{3})')
+
+
+def _nome_para_alias(nome, dominio):
+    nome = _ESCAPE_OCTAL.sub(lambda m: chr(int(m.group(1), 8)), nome).rstrip('.').lower()
+    sufixo = '.' + dominio.rstrip('.').lower()
+    if not nome.endswith(sufixo):
+        return None
+    return nome[:-len(sufixo)]
+
+
+def listar_route53(cliente, zona_id, dominio):
+    """
+    Lê todos os registros A (sem alias de AWS) abaixo do domínio.
+
+    Devolve {alias: {'enderecos_ip': [...], 'ttl': ..., 'nome': ...}}.
+    """
+    registros = {}
+    paginador = cliente.get_paginator('list_resource_record_sets')
+    for pagina in paginador.paginate(HostedZoneId=zona_id, PaginationConfig={'PageSize': 300}):
+        for conjunto in pagina['ResourceRecordSets']:
+            # Registros com AliasTarget, pesos ou roteamento não são gerenciados pela API
+            if conjunto['Type'] != 'A' or 'AliasTarget' in conjunto or 'SetIdentifier' in conjunto:
+                continue
+            alias = _nome_para_alias(conjunto['Name'], dominio)
+            if not alias:
+                continue
+            registros[alias] = {
+                'nome': conjunto['Name'],
+                'ttl': conjunto.get('TTL'),
+                'enderecos_ip': [r['Value'] for r in conjunto.get('ResourceRecords', [])]
+            }
+    return registros
+
+
+def listar_dynamodb(repositorio, segmentos=1):
+    """Devolve {alias em minúsculas: item} para todos os registros da tabela."""
+    return {
+        item['alias'].lower(): item
+        for item in repositorio.varrer(campos=('alias', 'endereco_ip', 'status', 'id_alteracao', expiracao.CAMPO),
+                                       segmentos=segmentos)
+        if item['alias'] != ALIAS_VERSAO
+    }
+
+
+def comparar(route53, dynamodb):
+    """
+    Diferença entre os dois lados, em uma passada por cada dicionário.
+
+    - ausentes: na tabela, mas não no Route53
+    - orfaos: no Route53, mas não na tabela
+    - divergentes: nos dois, com IPs diferentes
+    """
+    ausentes, divergentes = [], []
+    agora = time.time()
+    for alias, item in dynamodb.items():
+        # Alterações ainda na fila do consumidor_stream (modo outbox) não são divergências,
+        # e registros vencidos ficam para o varredor_expirados (nem recriados, nem órfãos)
+        if item.get('status') in (PENDENTE, EXCLUINDO) or expiracao.expirado(item, agora):
+            continue
+        registro = route53.get(alias)
+        if registro is None:
+            ausentes.append({'alias': item['alias'], 'endereco_ip': item.get('endereco_ip')})
+        elif registro['enderecos_ip'] != [item.get('endereco_ip')]:
+            divergentes.append({
+                'alias': item['alias'],
+                'endereco_ip': item.get('endereco_ip'),
+                'enderecos_route53': registro['enderecos_ip']
+            })
+    orfaos = [
+        {'alias': alias, 'enderecos_ip': registro['enderecos_ip'], 'ttl': registro['ttl'], 'nome': registro['nome']}
+        for alias, registro in route53.items()
+        if alias not in dynamodb
+    ]
+    return {'ausentes': ausentes, 'orfaos': orfaos, 'divergentes': divergentes}
+
+
+def _ainda_vale(repositorio, diferenca, tipo):
+    # Confirma com uma leitura consistente logo antes de corrigir: uma escrita em
+    # andamento (DynamoDB já gravado, Route53 ainda não) não deve ser revertida.
+    item = repositorio.obter(diferenca['alias'], campos=('alias', 'endereco_ip', 'status', expiracao.CAMPO), consistente=True)
+    if tipo == 'orfao':
+        return item is None
+    if item is None or item.get('status') in (PENDENTE, EXCLUINDO) or expiracao.expirado(item):
+        return False
+    if tipo == 'divergente' and [item.get('endereco_ip')] == diferenca['enderecos_route53']:
+        return False
+    diferenca['endereco_ip'] = item.get('endereco_ip')
+    return True
+
+
+def _aplicar_route53(cliente, zona_id, alteracoes, resultado):
+    # O escritor respeita o limite de chamadas do Route53 e repete em caso de Throttling
+    escritor = EscritorRoute53(zona_id, cliente=cliente)
+    for lote in dividir_change_batches(alteracoes):
+        try:
+            escritor.aplicar(lote)
+            resultado['corrigidos'] += len(lote)
+        except Exception as e:
+            # O ChangeBatch é atômico: nenhuma alteração do lote foi aplicada
+            log.erro("Erro ao aplicar ChangeBatch", excecao=e, alteracoes=len(lote))
+            resultado['falhas'].extend(
+                {'nome': a['ResourceRecordSet']['Name'], 'acao': a['Action'], 'erro': str(e)} for a in lote
+            )
+
+
+def reparar(diferencas, cliente_route53, repositorio, zona_id, dominio, ttl,
+            orfaos='ignorar', simular=False, versao_cache=False):
+    """Aplica as correções de comparar(); com simular=True só conta o que faria."""
+    if orfaos not in POLITICAS_ORFAOS:
+        raise ValueError(f"Política de órfãos inválida: {orfaos}")
+    resultado = {'corrigidos': 0, 'falhas': []}
+
+    upserts = [
+        d for tipo, lista in (('ausente', diferencas['ausentes']), ('divergente', diferencas['divergentes']))
+        for d in lista
+        if simular or _ainda_vale(repositorio, d, tipo)
+    ]
+    orfaos_validos = [] if orfaos == 'ignorar' else [
+        d for d in diferencas['orfaos'] if simular or _ainda_vale(repositorio, d, 'orfao')
+    ]
+
+    if simular:
+        resultado['corrigiria'] = len(upserts) + len(orfaos_validos)
+        return resultado
+
+    alteracoes = [
+        alteracao_registro_a('UPSERT', f"{d['alias']}.{dominio}", d['endereco_ip'], ttl)
+        for d in upserts if d.get('endereco_ip')
+    ]
+    if orfaos == 'remover':
+        # O DELETE precisa do conjunto exato que está no Route53 (nome, TTL e valores)
+        alteracoes.extend(
+            alteracao_registro_a('DELETE', d['nome'], d['enderecos_ip'], d['ttl']) for d in orfaos_validos
+        )
+    _aplicar_route53(cliente_route53, zona_id, alteracoes, resultado)
+
+    if orfaos == 'importar' and orfaos_validos:
+        data_criacao = datetime.now().isoformat()
+        try:
+            repositorio.gravar_lote([
+                {'alias': d['alias'], 'endereco_ip': d['enderecos_ip'][0], 'data_criacao': data_criacao}
+                for d in orfaos_validos
+            ])
+            resultado['corrigidos'] += len(orfaos_validos)
+            if versao_cache:
+                repositorio.incrementar(ALIAS_VERSAO, 'versao')
+        except Exception as e:
+            log.erro("Erro ao importar órfãos para o DynamoDB", excecao=e, orfaos=len(orfaos_validos))
+            resultado['falhas'].extend({'alias': d['alias'], 'acao': 'IMPORTAR', 'erro': str(e)} for d in orfaos_validos)
+    return resultado
+
+
+def promover_propagados(cliente_route53, repositorio, dynamodb, versao_cache=False, taxa=5):
+    """
+    Promove para PROPAGADO os registros APLICADO cuja alteração o Route53 já
+    concluiu. Cada id_alteracao é consultado uma vez (get_change), respeitando
+    o limite de chamadas da conta; a promoção é condicional ao id_alteracao, então
+    uma escrita mais nova nunca é marcada como propagada.
+    """
+    por_alteracao = {}
+    for item in dynamodb.values():
+        if item.get('status') == APLICADO and item.get('id_alteracao'):
+            por_alteracao.setdefault(item['id_alteracao'], []).append(item)
+
+    resultado = {'promovidos': 0, 'aguardando_propagacao': 0}
+    balde = BaldeTokens(taxa)
+    data_propagacao = datetime.now().isoformat()
+    for id_alteracao, itens in por_alteracao.items():
+        balde.adquirir()
+        try:
+            status = cliente_route53.get_change(Id=id_alteracao)['ChangeInfo']['Status']
+        except Exception as e:
+            log.aviso("Erro ao consultar a alteração no Route53", excecao=e, id_alteracao=id_alteracao)
+            status = None
+        if status != 'INSYNC':
+            resultado['aguardando_propagacao'] += len(itens)
+            continue
+        for item in itens:
+            try:
+                repositorio.atualizar(
+                    item['alias'],
+                    {'status': PROPAGADO, 'data_propagacao': data_propagacao},
+                    condicao='#status = :aplicado AND #alteracao = :alteracao',
+                    nomes={'#status': 'status', '#alteracao': 'id_alteracao'},
+                    valores={':aplicado': APLICADO, ':alteracao': id_alteracao}
+                )
+                resultado['promovidos'] += 1
+            except CondicaoFalhou:
+                # Outra escrita trocou o registro depois da leitura
+                continue
+    if versao_cache and resultado['promovidos']:
+        repositorio.incrementar(ALIAS_VERSAO, 'versao')
+    return resultado
+
+
+def reconciliar(cliente_route53, repositorio, zona_id, dominio, ttl,
+                orfaos='ignorar', simular=False, segmentos=1, versao_cache=False):
+    route53 = listar_route53(cliente_route53, zona_id, dominio)
+    dynamodb = listar_dynamodb(repositorio, segmentos)
+    diferencas = comparar(route53, dynamodb)
+    resumo = {
+        'route53': len(route53),
+        'dynamodb': len(dynamodb),
+        **{tipo: len(lista) for tipo, lista in diferencas.items()},
+        'simulado': simular
+    }
+    log.info("Diferenças encontradas", **resumo)
+    resumo.update(reparar(diferencas, cliente_route53, repositorio, zona_id, dominio, ttl,
+                          orfaos=orfaos, simular=simular, versao_cache=versao_cache))
+    if not simular:
+        resumo.update(promover_propagados(cliente_route53, repositorio, dynamodb, versao_cache=versao_cache))
+    resumo['diferencas'] = diferencas
+    return resumo
+
+
+@metricas.medir_handler('reconciliador', rota=lambda evento: 'reconciliacao')
+def lambda_handler(evento, contexto):
+    """
+    Entrada agendada (EventBridge). O evento pode trazer 'orfaos' e 'simular';
+    com 'somente_propagacao' (agendamento mais curto) só promove os registros
+    APLICADO, sem comparar com o Route53.
+    """
+    evento = evento if isinstance(evento, dict) else {}
+    with log.requisicao(getattr(contexto, 'aws_request_id', None)) as resultado:
+        if evento.get('somente_propagacao'):
+            repositorio = RepositorioRegistros(os.environ['DYNAMODB_TABLE'])
+            resumo = promover_propagados(
+                clientes_aws.cliente('route53'),
+                repositorio,
+                listar_dynamodb(repositorio, int(os.environ.get('SEGMENTOS_SCAN', '1'))),
+                versao_cache=os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim')
+            )
+            resultado.update(resumo)
+            return resumo
+        resumo = reconciliar(
+            clientes_aws.cliente('route53'),
+            RepositorioRegistros(os.environ['DYNAMODB_TABLE']),
+            os.environ['ZONA_ID'],
+            os.environ['NAMESERVERS'].split(',')[0],
+            int(os.environ['TTL_DNS']),
+            orfaos=evento.get('orfaos', os.environ.get('RECONCILIAR_ORFAOS', 'ignorar')),
+            simular=bool(evento.get('simular', False)),
+            segmentos=int(os.environ.get('SEGMENTOS_SCAN', '1')),
+            versao_cache=os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim')
+        )
+        resumo.pop('diferencas')
+        # O log de conclusão da requisição leva o resumo
+        resultado.update(resumo)
+        return resumo
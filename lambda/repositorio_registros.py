@@ -0,0 +1,506 @@
+# repositorio_registros.py
+# Acesso à tabela de registros DNS pelo cliente de baixo nível do DynamoDB.
+#
+# O recurso do boto3 (boto3.resource) converte cada atributo com o
+# TypeDeserializer e devolve números como Decimal, que o json.dumps não sabe
+# serializar. Aqui os itens são convertidos direto do formato da API
+# ({'S': ...}, {'N': ...}) para dicts prontos para JSON, e a listagem lê apenas
+# os atributos necessários (ProjectionExpression).
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import clientes_aws
+
+# Atributos públicos de um registro, devolvidos na listagem
+CAMPOS_LISTAGEM = ('alias', 'endereco_ip', 'data_criacao', 'status', 'expira_em')
+
+# Atributo de TTL da tabela (epoch em segundos; ver expiracao.py). O DynamoDB
+# remove o item algum tempo depois de vencido, então as leituras com
+# vigentes=True descartam os vencidos que ainda estão na tabela (e o item
+# ALIAS_VERSAO, que não é um registro).
+CAMPO_EXPIRACAO = 'expira_em'
+
+# Item com o carimbo de versão do cache de leitura do gerenciador_dns. Um alias
+# de DNS não pode conter '#', então ele nunca colide com um registro real.
+ALIAS_VERSAO = '#versao'
+
+# Índice global por endereco_ip (terraform/modules/lambda_api), com os mesmos
+# atributos da listagem; o item ALIAS_VERSAO não tem IP e fica fora dele
+INDICE_IP = 'endereco_ip-index'
+
+# batch_write_item aceita até 25 itens por chamada, e batch_get_item até 100 chaves
+LIMITE_BATCH_WRITE = 25
+LIMITE_BATCH_GET = 100
+
+
+def _valor(atributo):
+    (tipo, valor), = atributo.items()
+    if tipo == 'S' or tipo == 'BOOL':
+        return valor
+    if tipo == 'N':
+        return _numero(valor)
+    if tipo == 'NULL':
+        return None
+    if tipo == 'M':
+        return {chave: _valor(v) for chave, v in valor.items()}
+    if tipo == 'L':
+        return [_valor(v) for v in valor]
+    if tipo == 'SS':
+        return list(valor)
+    if tipo == 'NS':
+        return [_numero(v) for v in valor]
+    if tipo == 'B':
+        return base64.b64encode(valor).decode()
+    if tipo == 'BS':
+        return [base64.b64encode(v).decode() for v in valor]
+    raise ValueError(f"Tipo de atributo DynamoDB desconhecido: {tipo}")
+
+
+def _numero(valor):
+    try:
+        return int(valor)
+    except ValueError:
+        return float(valor)
+
+
+def item_para_dict(item):
+    """Converte um item no formato da API do DynamoDB em um dict serializável."""
+    return {chave: _valor(atributo) for chave, atributo in item.items()}
+
+
+def _atributo(valor):
+    if isinstance(valor, bool):
+        return {'BOOL': valor}
+    if isinstance(valor, str):
+        return {'S': valor}
+    if isinstance(valor, (int, float)):
+        return {'N': str(valor)}
+    if valor is None:
+        return {'NULL': True}
+    if isinstance(valor, dict):
+        return {'M': {chave: _atributo(v) for chave, v in valor.items()}}
+    if isinstance(valor, (list, tuple)):
+        return {'L': [_atributo(v) for v in valor]}
+    raise TypeError(f"Tipo não suportado para o DynamoDB: {type(valor).__name__}")
+
+
+def dict_para_item(dados):
+    """Converte um dict Python no formato de item da API do DynamoDB."""
+    return {chave: _atributo(valor) for chave, valor in dados.items()}
+
+
+def _projecao(campos):
+    # Placeholders evitam conflito com palavras reservadas do DynamoDB
+    nomes = {f'#p{i}': campo for i, campo in enumerate(campos)}
+    return ', '.join(nomes), nomes
+
+
+def expressao_filtro(filtros):
+    """
+    Monta uma FilterExpression a partir do filtro do React-Admin.
+
+    'q' busca no alias e no IP; 'id' equivale ao alias; listas viram IN.
+    Devolve (expressão, nomes, valores), ou None se não houver filtro.
+    """
+    partes, nomes, valores = [], {}, {}
+    for campo, valor in filtros.items():
+        if valor in (None, '', []):
+            continue
+        indice = len(partes)
+        if campo == 'q':
+            nomes.update({'#fa': 'alias', '#fi': 'endereco_ip'})
+            valores[f':f{indice}'] = {'S': str(valor)}
+            partes.append(f'(contains(#fa, :f{indice}) OR contains(#fi, :f{indice}))')
+            continue
+        nomes[f'#f{indice}'] = 'alias' if campo == 'id' else campo
+        if isinstance(valor, list):
+            marcadores = []
+            for j, v in enumerate(valor):
+                valores[f':f{indice}_{j}'] = {'S': str(v)}
+                marcadores.append(f':f{indice}_{j}')
+            partes.append(f"#f{indice} IN ({', '.join(marcadores)})")
+        else:
+            valores[f':f{indice}'] = {'S': str(valor)}
+            partes.append(f'#f{indice} = :f{indice}')
+    if not partes:
+        return None
+    return ' AND '.join(partes), nomes, valores
+
+
+class CondicaoFalhou(Exception):
+    """
+    A ConditionExpression de uma escrita não foi satisfeita. `item` traz o item
+    atual (ReturnValuesOnConditionCheckFailure), ou None se ele não existir.
+    """
+
+    def __init__(self, mensagem, item=None):
+        super().__init__(mensagem)
+        self.item = item
+
+
+def _condicional(chamada, **kwargs):
+    try:
+        return chamada(**kwargs)
+    except Exception as e:
+        resposta = getattr(e, 'response', None) or {}
+        if resposta.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            item = resposta.get('Item')
+            raise CondicaoFalhou(str(e), item_para_dict(item) if item else None) from e
+        raise
+
+
+def _kwargs_condicao(kwargs, condicao, nomes, valores):
+    if condicao:
+        kwargs['ConditionExpression'] = condicao
+        # Em caso de falha, o DynamoDB devolve o item atual sem custo de leitura extra
+        kwargs['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+    if nomes:
+        kwargs.setdefault('ExpressionAttributeNames', {}).update(nomes)
+    if valores:
+        kwargs.setdefault('ExpressionAttributeValues', {}).update(dict_para_item(valores))
+    return kwargs
+
+
+def codificar_cursor(chave):
+    return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+class RepositorioRegistros:
+    def __init__(self, nome_tabela, chave='alias', cliente=None):
+        self.nome_tabela = nome_tabela
+        self.chave = chave
+        self._cliente = cliente
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            self._cliente = clientes_aws.cliente('dynamodb')
+        return self._cliente
+
+    def _chave(self, valor):
+        return {self.chave: {'S': valor}}
+
+    # --- Leitura ---
+
+    def obter(self, valor_chave, campos=None, consistente=False):
+        kwargs = {'TableName': self.nome_tabela, 'Key': self._chave(valor_chave)}
+        if campos:
+            kwargs['ProjectionExpression'], kwargs['ExpressionAttributeNames'] = _projecao(campos)
+        if consistente:
+            kwargs['ConsistentRead'] = True
+        resposta = self.cliente.get_item(**kwargs)
+        item = resposta.get('Item')
+        return item_para_dict(item) if item is not None else None
+
+    def obter_varios(self, valores_chave, campos=None, consistente=False, tentativas=8):
+        """
+        Lê vários itens pela chave com batch_get_item, em blocos de até 100.
+        Devolve {valor_chave: item} só com os que existem; chaves repetidas
+        são lidas uma vez (o DynamoDB recusa duplicatas no mesmo pedido).
+        """
+        valores_chave = list(dict.fromkeys(valores_chave))
+        modelo = {}
+        if campos:
+            # A chave entra na projeção para indexar o resultado
+            campos = tuple(dict.fromkeys((self.chave, *campos)))
+            modelo['ProjectionExpression'], modelo['ExpressionAttributeNames'] = _projecao(campos)
+        if consistente:
+            modelo['ConsistentRead'] = True
+        encontrados = {}
+        for inicio in range(0, len(valores_chave), LIMITE_BATCH_GET):
+            chaves = [self._chave(valor) for valor in valores_chave[inicio:inicio + LIMITE_BATCH_GET]]
+            pendentes = {self.nome_tabela: {**modelo, 'Keys': chaves}}
+            # Reenvia as UnprocessedKeys com backoff exponencial
+            for tentativa in range(tentativas):
+                resposta = self.cliente.batch_get_item(RequestItems=pendentes)
+                for item in resposta.get('Responses', {}).get(self.nome_tabela, []):
+                    item = item_para_dict(item)
+                    encontrados[item[self.chave]] = item
+                pendentes = resposta.get('UnprocessedKeys') or {}
+                if not pendentes:
+                    break
+                time.sleep(min(0.05 * 2 ** tentativa, 2))
+            else:
+                raise RuntimeError(f"{len(pendentes[self.nome_tabela]['Keys'])} chaves não processadas pelo DynamoDB")
+        return encontrados
+
+    def _kwargs_scan(self, campos, filtros, vigentes=False):
+        kwargs = {'TableName': self.nome_tabela}
+        nomes, valores = {}, {}
+        if campos:
+            kwargs['ProjectionExpression'], nomes_projecao = _projecao(campos)
+            nomes.update(nomes_projecao)
+        filtro = expressao_filtro(filtros) if filtros else None
+        if filtro:
+            kwargs['FilterExpression'], nomes_filtro, valores = filtro
+            nomes.update(nomes_filtro)
+        if vigentes:
+            vigente = '(attribute_not_exists(#xp) OR #xp > :xa) AND #vk <> :vk'
+            # O filtro só tem ANDs no nível de cima (os ORs vêm entre parênteses), e o
+            # DynamoDB recusa parênteses redundantes
+            kwargs['FilterExpression'] = f"{kwargs['FilterExpression']} AND {vigente}" if filtro else vigente
+            nomes['#xp'] = CAMPO_EXPIRACAO
+            valores[':xa'] = {'N': str(int(time.time()))}
+            nomes['#vk'] = self.chave
+            valores[':vk'] = {'S': ALIAS_VERSAO}
+        if nomes:
+            kwargs['ExpressionAttributeNames'] = nomes
+        if valores:
+            kwargs['ExpressionAttributeValues'] = valores
+        return kwargs
+
+    def _paginas_segmento(self, kwargs, segmento=None, total_segmentos=None):
+        kwargs = dict(kwargs)
+        if total_segmentos and total_segmentos > 1:
+            kwargs['Segment'] = segmento
+            kwargs['TotalSegments'] = total_segmentos
+        while True:
+            resposta = self.cliente.scan(**kwargs)
+            yield [item_para_dict(item) for item in resposta.get('Items', [])]
+            chave = resposta.get('LastEvaluatedKey')
+            if not chave:
+                break
+            kwargs['ExclusiveStartKey'] = chave
+
+    def varrer_paginas(self, campos=None, filtros=None, segmentos=1, vigentes=False):
+        """
+        Percorre a tabela inteira, seguindo o LastEvaluatedKey, e produz uma
+        lista de itens por página lida.
+
+        Com segmentos > 1 faz um scan paralelo (Segment/TotalSegments), um
+        segmento por thread. As páginas passam por uma fila limitada, então a
+        memória usada não depende do tamanho da tabela: se o consumidor for
+        lento, as threads esperam. Com vigentes=True, os itens vencidos
+        (CAMPO_EXPIRACAO) ficam de fora.
+        """
+        kwargs = self._kwargs_scan(campos, filtros, vigentes)
+        if segmentos <= 1:
+            yield from self._paginas_segmento(kwargs)
+            return
+
+        paginas = queue.Queue(maxsize=segmentos * 2)
+        FIM = object()
+        cancelado = threading.Event()
+
+        def _entregar(valor):
+            # Desiste se o consumidor já abandonou a iteração
+            while not cancelado.is_set():
+                try:
+                    paginas.put(valor, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _trabalhar(segmento):
+            try:
+                for pagina in self._paginas_segmento(kwargs, segmento, segmentos):
+                    if not _entregar(pagina):
+                        return
+                _entregar(FIM)
+            except Exception as e:
+                _entregar(e)
+
+        threads = [threading.Thread(target=_trabalhar, args=(s,), daemon=True) for s in range(segmentos)]
+        for thread in threads:
+            thread.start()
+        try:
+            restantes = segmentos
+            while restantes:
+                pagina = paginas.get()
+                if pagina is FIM:
+                    restantes -= 1
+                elif isinstance(pagina, Exception):
+                    raise pagina
+                else:
+                    yield pagina
+        finally:
+            cancelado.set()
+
+    def varrer(self, campos=None, filtros=None, segmentos=1, vigentes=False):
+        """Itera sobre os itens da tabela (ver varrer_paginas)."""
+        for pagina in self.varrer_paginas(campos, filtros, segmentos, vigentes):
+            yield from pagina
+
+    def contar(self, filtros=None, segmentos=1, vigentes=False):
+        """
+        Conta os itens (com o filtro aplicado) sem transferi-los: Select=COUNT
+        só devolve o total de cada página. Consome a mesma capacidade de leitura
+        de um scan completo.
+        """
+        kwargs = self._kwargs_scan(None, filtros, vigentes)
+        kwargs['Select'] = 'COUNT'
+
+        def _contar_segmento(segmento):
+            kwargs_segmento = dict(kwargs)
+            if segmentos > 1:
+                kwargs_segmento['Segment'] = segmento
+                kwargs_segmento['TotalSegments'] = segmentos
+            total = 0
+            while True:
+                resposta = self.cliente.scan(**kwargs_segmento)
+                total += resposta.get('Count', 0)
+                chave = resposta.get('LastEvaluatedKey')
+                if not chave:
+                    return total
+                kwargs_segmento['ExclusiveStartKey'] = chave
+
+        if segmentos <= 1:
+            return _contar_segmento(0)
+        with ThreadPoolExecutor(max_workers=segmentos) as executor:
+            return sum(executor.map(_contar_segmento, range(segmentos)))
+
+    def pagina(self, limite, cursor=None, campos=None, filtros=None, vigentes=False):
+        """
+        Lê uma única página do scan. Como o Limit é aplicado antes do filtro,
+        uma página filtrada pode vir com menos itens que o limite.
+
+        Devolve (itens, próximo cursor ou None).
+        """
+        kwargs = self._kwargs_scan(campos, filtros, vigentes)
+        kwargs['Limit'] = limite
+        if cursor:
+            kwargs['ExclusiveStartKey'] = decodificar_cursor(cursor)
+        resposta = self.cliente.scan(**kwargs)
+        itens = [item_para_dict(item) for item in resposta.get('Items', [])]
+        proximo = resposta.get('LastEvaluatedKey')
+        return itens, (codificar_cursor(proximo) if proximo else None)
+
+    def consultar_por_ip(self, endereco_ip, campos=None, filtros=None, vigentes=False):
+        """
+        Itens que apontam para o IP, pelo índice INDICE_IP (Query, sem scan).
+        O índice é atualizado de forma assíncrona, então uma escrita muito
+        recente pode ainda não aparecer; só atributos da listagem estão nele.
+        """
+        kwargs = self._kwargs_scan(campos, filtros, vigentes)
+        kwargs['IndexName'] = INDICE_IP
+        kwargs['KeyConditionExpression'] = '#ki = :ki'
+        kwargs.setdefault('ExpressionAttributeNames', {})['#ki'] = 'endereco_ip'
+        kwargs.setdefault('ExpressionAttributeValues', {})[':ki'] = {'S': endereco_ip}
+        while True:
+            resposta = self.cliente.query(**kwargs)
+            yield from (item_para_dict(item) for item in resposta.get('Items', []))
+            chave = resposta.get('LastEvaluatedKey')
+            if not chave:
+                break
+            kwargs['ExclusiveStartKey'] = chave
+
+    def varrer_expirados(self, agora=None, campos=None):
+        """
+        Páginas de itens com CAMPO_EXPIRACAO <= agora que o TTL do DynamoDB ainda
+        não removeu (a remoção pelo TTL não tem prazo garantido).
+        """
+        kwargs = self._kwargs_scan(campos, None)
+        kwargs['FilterExpression'] = '#xp <= :xa'
+        kwargs.setdefault('ExpressionAttributeNames', {})['#xp'] = CAMPO_EXPIRACAO
+        kwargs.setdefault('ExpressionAttributeValues', {})[':xa'] = {'N': str(int(agora if agora is not None else time.time()))}
+        yield from self._paginas_segmento(kwargs)
+
+    # --- Escrita ---
+
+    # As escritas aceitam uma ConditionExpression opcional (nomes e valores em
+    # Python); se ela falhar, levantam CondicaoFalhou.
+
+    def gravar(self, dados, condicao=None, nomes=None, valores=None, devolver_anterior=False):
+        kwargs = {'TableName': self.nome_tabela, 'Item': dict_para_item(dados)}
+        if devolver_anterior:
+            kwargs['ReturnValues'] = 'ALL_OLD'
+        resposta = _condicional(self.cliente.put_item, **_kwargs_condicao(kwargs, condicao, nomes, valores))
+        if devolver_anterior:
+            anterior = resposta.get('Attributes')
+            return item_para_dict(anterior) if anterior else None
+
+    def gravar_se_alterado(self, dados, campos=('endereco_ip',), condicao=None, nomes=None, valores=None):
+        """
+        Grava o item só se ele ainda não existir ou se algum dos `campos` mudou,
+        em uma única chamada (ConditionExpression + ReturnValues).
+
+        Devolve (gravou, item): o item anterior (ou None) se gravou; o item atual,
+        sem nova leitura, se nada mudou. Um campo ausente de `dados` conta como
+        alterado se existir no item atual. Uma `condicao` extra é combinada com
+        AND; se só ela falhar, CondicaoFalhou é levantada normalmente.
+        """
+        nomes = {'#gk': self.chave, **{f'#g{i}': campo for i, campo in enumerate(campos)}, **(nomes or {})}
+        valores = {**{f':g{i}': dados[campo] for i, campo in enumerate(campos) if dados.get(campo) is not None}, **(valores or {})}
+        alterado = ' OR '.join(['attribute_not_exists(#gk)'] + [
+            f'attribute_not_exists(#g{i}) OR #g{i} <> :g{i}' if dados.get(campo) is not None else f'attribute_exists(#g{i})'
+            for i, campo in enumerate(campos)
+        ])
+        expressao = f'({alterado}) AND ({condicao})' if condicao else alterado
+        try:
+            return True, self.gravar(dados, expressao, nomes, valores, devolver_anterior=True)
+        except CondicaoFalhou as e:
+            atual = e.item
+            if atual is None or any(atual.get(campo) != dados.get(campo) for campo in campos):
+                # Os campos mudaram; quem barrou a escrita foi a condição extra
+                raise
+            return False, atual
+
+    def desfazer_gravacao(self, dados, anterior, campos=('endereco_ip', 'data_criacao')):
+        """
+        Volta ao item `anterior` (ou remove o item, se None) depois de gravar
+        `dados`, desde que os `campos` ainda sejam os gravados. Levanta
+        CondicaoFalhou se outra escrita tiver alterado o item nesse meio tempo.
+        """
+        nomes = {f'#d{i}': campo for i, campo in enumerate(campos)}
+        valores = {f':d{i}': dados.get(campo) for i, campo in enumerate(campos)}
+        condicao = ' AND '.join(f'#d{i} = :d{i}' for i in range(len(campos)))
+        if anterior is None:
+            self.excluir(dados[self.chave], condicao, nomes, valores)
+        else:
+            self.gravar(anterior, condicao, nomes, valores)
+
+    def atualizar(self, valor_chave, campos, condicao=None, nomes=None, valores=None):
+        """SET dos campos informados; devolve o item atualizado."""
+        kwargs = {
+            'TableName': self.nome_tabela,
+            'Key': self._chave(valor_chave),
+            'UpdateExpression': 'SET ' + ', '.join(f'#s{i} = :s{i}' for i in range(len(campos))),
+            'ExpressionAttributeNames': {f'#s{i}': campo for i, campo in enumerate(campos)},
+            'ExpressionAttributeValues': dict_para_item({f':s{i}': valor for i, valor in enumerate(campos.values())}),
+            'ReturnValues': 'ALL_NEW'
+        }
+        resposta = _condicional(self.cliente.update_item, **_kwargs_condicao(kwargs, condicao, nomes, valores))
+        return item_para_dict(resposta['Attributes'])
+
+    def excluir(self, valor_chave, condicao=None, nomes=None, valores=None):
+        kwargs = {'TableName': self.nome_tabela, 'Key': self._chave(valor_chave)}
+        _condicional(self.cliente.delete_item, **_kwargs_condicao(kwargs, condicao, nomes, valores))
+
+    def incrementar(self, valor_chave, atributo, quantidade=1):
+        resposta = self.cliente.update_item(
+            TableName=self.nome_tabela,
+            Key=self._chave(valor_chave),
+            UpdateExpression='ADD #a :q',
+            ExpressionAttributeNames={'#a': atributo},
+            ExpressionAttributeValues={':q': {'N': str(quantidade)}},
+            ReturnValues='UPDATED_NEW'
+        )
+        return _valor(resposta['Attributes'][atributo])
+
+    def _escrever_lote(self, requisicoes, tentativas=8):
+        # Reenvia os UnprocessedItems com backoff exponencial
+        for inicio in range(0, len(requisicoes), LIMITE_BATCH_WRITE):
+            pendentes = {self.nome_tabela: requisicoes[inicio:inicio + LIMITE_BATCH_WRITE]}
+            for tentativa in range(tentativas):
+                resposta = self.cliente.batch_write_item(RequestItems=pendentes)
+                pendentes = resposta.get('UnprocessedItems') or {}
+                if not pendentes:
+                    break
+                time.sleep(min(0.05 * 2 ** tentativa, 2))
+            else:
+                raise RuntimeError(f"{len(pendentes[self.nome_tabela])} itens não processados pelo DynamoDB")
+
+    def gravar_lote(self, itens):
+        self._escrever_lote([{'PutRequest': {'Item': dict_para_item(item)}} for item in itens])
+
+    def excluir_lote(self, valores_chave):
+        self._escrever_lote([{'DeleteRequest': {'Key': self._chave(valor)}} for valor in valores_chave])
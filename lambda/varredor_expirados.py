@@ -0,0 +1,204 @@
+# varredor_expirados.py
+# Remove do Route53 os registros dos aliases vencidos (expira_em, ver expiracao.py).
+#
+# Duas entradas no mesmo lambda_handler:
+# - stream: remoções feitas pelo TTL do DynamoDB (userIdentity do serviço
+#   dynamodb.amazonaws.com) chegam pelo DynamoDB Streams com a OldImage; os
+#   DELETEs vão ao Route53 em ChangeBatches do maior tamanho permitido;
+# - agendada (EventBridge): o TTL não tem prazo para apagar um item vencido,
+#   então um scan acha os vencidos que ainda estão na tabela, remove os
+#   registros do Route53 e só então apaga os itens (se o expira_em ainda for o
+#   mesmo: um alias renovado nesse meio tempo fica para a reconciliação).
+#
+# O DELETE precisa do conjunto exato que está no Route53; se ele não bater (TTL
+# alterado, registro já removido), o conjunto real é lido e removido se ainda
+# tiver o IP do item. Falhas transitórias no stream voltam como
+# batchItemFailures, e o Lambda reenvia o lote a partir delas.
+#
+# Com EVENTOS_TABLE configurada, os aliases removidos vão para o diário do
+# stream SSE (ver eventos_registros.py).
+import os
+import time
+
+from alteracoes_route53 import alteracao_registro_a, dividir_change_batches
+from consumidor_stream import conjunto_no_route53
+from escritor_route53 import EscritorRoute53, codigo_erro
+import eventos_registros
+from eventos_registros import REMOVIDO
+import expiracao
+from log_estruturado import LogEstruturado
+import metricas
+from outbox import EXCLUINDO, PENDENTE
+from repositorio_registros import ALIAS_VERSAO, CondicaoFalhou, RepositorioRegistros, item_para_dict
+
+log = LogEstruturado('varredor_expirados')
+
+CAMPOS_VARREDURA = ('alias', 'endereco_ip', 'ip_aplicado', 'status', expiracao.CAMPO)
+
+# Recusas definitivas do Route53 (repetir não adianta); o resto é transitório
+ERROS_REJEICAO = ('InvalidChangeBatch', 'InvalidInput')
+
+
+def remocao_pelo_ttl(registro):
+    """True se o registro do stream é uma remoção feita pelo TTL do DynamoDB."""
+    identidade = registro.get('userIdentity') or {}
+    return (
+        registro.get('eventName') == 'REMOVE'
+        and identidade.get('type') == 'Service'
+        and identidade.get('principalId') == 'dynamodb.amazonaws.com'
+    )
+
+
+def _ip_no_route53(item):
+    # O último IP aplicado (modo outbox), se conhecido; um PENDENTE nunca
+    # aplicado não tem registro no Route53
+    if item.get('ip_aplicado'):
+        return item['ip_aplicado']
+    if item.get('status') == PENDENTE:
+        return None
+    return item.get('endereco_ip')
+
+
+class VarredorExpirados:
+    def __init__(self, repositorio, escritor, dominio, ttl, versao_cache=False, diario=None):
+        self.repositorio = repositorio
+        self.escritor = escritor
+        self.dominio = dominio
+        self.ttl = ttl
+        self.versao_cache = versao_cache
+        self.diario = diario
+
+    def _publicar_removidos(self, aliases):
+        if self.diario is not None:
+            self.diario.publicar([(REMOVIDO, alias, None) for alias in aliases])
+
+    def processar_stream(self, registros):
+        """Remoções do TTL vindas do stream; devolve a resposta parcial do Lambda."""
+        removidos = {}
+        for registro in registros:
+            if not remocao_pelo_ttl(registro):
+                continue
+            dados = registro.get('dynamodb', {})
+            item = item_para_dict(dados.get('OldImage') or {})
+            if item.get('alias') and item['alias'] != ALIAS_VERSAO:
+                removidos[item['alias']] = (dados.get('SequenceNumber'), item)
+        if not removidos:
+            return {'batchItemFailures': []}
+
+        # Um alias criado de novo depois da remoção não pode perder o registro
+        recriados = self.repositorio.obter_varios(list(removidos), campos=('alias',), consistente=True)
+        pendentes = [pendente for alias, pendente in removidos.items() if alias not in recriados]
+        falhas = self._remover(pendentes)
+        # Os com falha são publicados quando o Lambda reenviar o lote
+        self._publicar_removidos(item['alias'] for sequencia, item in pendentes if sequencia not in falhas)
+        log.info("Remoções do TTL processadas", registros=len(registros), removidos=len(pendentes), falhas=len(falhas))
+        return {'batchItemFailures': [{'itemIdentifier': sequencia} for sequencia in falhas]}
+
+    def varrer(self, agora=None):
+        """Remove os vencidos que o TTL ainda não apagou; devolve um resumo."""
+        agora = int(agora if agora is not None else time.time())
+        resumo = {'expirados': 0, 'removidos': 0, 'falhas': 0}
+        for pagina in self.repositorio.varrer_expirados(agora, campos=CAMPOS_VARREDURA):
+            # Exclusões em andamento ficam com o consumidor_stream
+            itens = [item for item in pagina if item['alias'] != ALIAS_VERSAO and item.get('status') != EXCLUINDO]
+            resumo['expirados'] += len(itens)
+            falhas = set(self._remover([(item['alias'], item) for item in itens]))
+            excluidos = []
+            for item in itens:
+                if item['alias'] in falhas:
+                    continue
+                try:
+                    self.repositorio.excluir(
+                        item['alias'], condicao='#exp = :exp',
+                        nomes={'#exp': expiracao.CAMPO}, valores={':exp': item[expiracao.CAMPO]}
+                    )
+                    excluidos.append(item['alias'])
+                except CondicaoFalhou:
+                    log.aviso("Alias renovado durante a varredura; item mantido", alias=item['alias'])
+            resumo['removidos'] += len(excluidos)
+            resumo['falhas'] += len(falhas)
+            if excluidos and self.versao_cache:
+                self.repositorio.incrementar(ALIAS_VERSAO, 'versao')
+            self._publicar_removidos(excluidos)
+        log.info("Varredura de expirados concluída", **resumo)
+        return resumo
+
+    def _remover(self, pendentes):
+        """
+        DELETE no Route53 para cada (identificador, item), em ChangeBatches
+        agrupados; devolve os identificadores com falha transitória.
+        """
+        alteracoes, por_nome = [], {}
+        for identificador, item in pendentes:
+            endereco_ip = _ip_no_route53(item)
+            if not endereco_ip:
+                continue
+            alteracao = alteracao_registro_a('DELETE', f"{item['alias']}.{self.dominio}", endereco_ip, self.ttl)
+            alteracoes.append(alteracao)
+            por_nome[alteracao['ResourceRecordSet']['Name']] = (identificador, item)
+
+        falhas = []
+        for lote in dividir_change_batches(alteracoes):
+            do_lote = [por_nome[a['ResourceRecordSet']['Name']] for a in lote]
+            try:
+                self.escritor.aplicar(lote)
+            except Exception as e:
+                if codigo_erro(e) not in ERROS_REJEICAO:
+                    log.aviso("Falha transitória ao remover registros expirados", excecao=e, alteracoes=len(lote))
+                    falhas.extend(identificador for identificador, _ in do_lote)
+                    continue
+                # Uma alteração que não bate derruba o lote inteiro; remove uma a uma
+                for (identificador, item), alteracao in zip(do_lote, lote):
+                    if not self._remover_um(item, alteracao):
+                        falhas.append(identificador)
+        return falhas
+
+    def _remover_um(self, item, alteracao):
+        """Remove um registro isolado; False se o erro for transitório."""
+        try:
+            self.escritor.aplicar([alteracao])
+            return True
+        except Exception as e:
+            if codigo_erro(e) not in ERROS_REJEICAO:
+                return False
+        conjunto = conjunto_no_route53(self.escritor.cliente, self.escritor.zona_id, alteracao['ResourceRecordSet']['Name'])
+        esperado = alteracao['ResourceRecordSet']['ResourceRecords'][0]['Value']
+        if conjunto is None or esperado not in [r['Value'] for r in conjunto.get('ResourceRecords', [])]:
+            # Já removido, ou aponta para outro IP (não é mais deste item)
+            return True
+        try:
+            self.escritor.aplicar([{'Action': 'DELETE', 'ResourceRecordSet': conjunto}])
+        except Exception as e:
+            if codigo_erro(e) not in ERROS_REJEICAO:
+                return False
+            log.erro("Route53 rejeitou a remoção do registro expirado", excecao=e, alias=item['alias'])
+        return True
+
+
+_varredor = None
+
+
+def _varredor_padrao():
+    global _varredor
+    if _varredor is None:
+        _varredor = VarredorExpirados(
+            RepositorioRegistros(os.environ['DYNAMODB_TABLE']),
+            EscritorRoute53(os.environ['ZONA_ID'], taxa=float(os.environ.get('ROUTE53_TAXA', '5'))),
+            os.environ['NAMESERVERS'].split(',')[0],
+            int(os.environ['TTL_DNS']),
+            versao_cache=os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim'),
+            diario=eventos_registros.diario_do_ambiente()
+        )
+    return _varredor
+
+
+@metricas.medir_handler('varredor_expirados', rota=lambda evento: 'stream' if 'Records' in evento else 'varredura')
+def lambda_handler(evento, contexto):
+    """Entrada do DynamoDB Streams (remoções do TTL) e da varredura agendada (EventBridge)."""
+    evento = evento if isinstance(evento, dict) else {}
+    with log.requisicao(getattr(contexto, 'aws_request_id', None)) as resultado:
+        if 'Records' in evento:
+            return _varredor_padrao().processar_stream(evento['Records'])
+        resumo = _varredor_padrao().varrer()
+        resultado.update(resumo)
+        return resumo
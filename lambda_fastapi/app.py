@@ -1,13 +1,32 @@
 # app.py
-from fastapi import FastAPI, Depends, Header, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List, Optional, Union
 import os
-import boto3
-import hmac
+import json
+import asyncio
+import ipaddress
+import math
 from datetime import datetime
 
+# Módulo compartilhado com o Lambda em lambda/; copiado para o pacote pelo
+# scripts/create_backend_fastapi_docker.sh (localmente: PYTHONPATH=../lambda)
+from alteracoes_route53 import dividir_change_batches
+import chaves_api
+from escritor_route53 import ErroLimiteRoute53, EscritorRoute53
+import etag_http
+import eventos_registros
+from eventos_registros import ALTERADO, CRIADO, REINICIO, REMOVIDO
+import expiracao
+from foto_registros import FotoRegistros, montar_pagina, ordenar
+from log_estruturado import LogEstruturado
+import metricas
+import outbox
+from repositorio_registros import ALIAS_VERSAO, CAMPOS_LISTAGEM, CondicaoFalhou, RepositorioRegistros
+
 # --- Inicialização da aplicação e clientes AWS ---
 app = FastAPI(
     title="API de Gerenciamento de DNS",
@@ -24,32 +43,128 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Range"]
+    expose_headers=["Content-Range", "X-Proximo-Cursor", "ETag", "Retry-After"]
 )
 
-try:
-    dynamodb = boto3.resource('dynamodb')
-    route53 = boto3.client('route53')
-    table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+log = LogEstruturado("dns_fastapi")
+
+# Um log JSON por requisição, com status, duracao_ms e os tempos medidos nas rotas
+@app.middleware("http")
+async def _log_requisicao(request, call_next):
+    contexto_aws = request.scope.get("aws.context")  # preenchido pelo Mangum
+    with log.requisicao(getattr(contexto_aws, "aws_request_id", None), metodo=request.method, caminho=request.url.path) as resultado:
+        resposta = await call_next(request)
+        resultado["status"] = resposta.status_code
+        return resposta
 
+# Métricas EMF por rota (o molde da rota, ex.: /registros/{subdominio}, só é
+# conhecido depois do roteamento) e por dependência (hooks em clientes_aws)
+@app.middleware("http")
+async def _medir_requisicao(request, call_next):
+    tamanho = request.headers.get("content-length")
+    with metricas.medir("dns_fastapi", f"{request.method} {request.url.path}", int(tamanho) if tamanho else None) as unidade:
+        resposta = await call_next(request)
+        rota = request.scope.get("route")
+        if rota is not None:
+            unidade.rota = f"{request.method} {rota.path}"
+        if resposta.headers.get("content-length"):
+            unidade.adicionar("TamanhoResposta", int(resposta.headers["content-length"]), "Bytes")
+        unidade.propriedades["status"] = resposta.status_code
+        return resposta
+
+try:
+    # Os clientes AWS são criados sob demanda (clientes_aws); aqui só lemos a configuração
+    DYNAMODB_TABLE = os.environ['DYNAMODB_TABLE']
     SENHA_API = os.environ['SENHA_API']
     TTL_DNS = int(os.environ['TTL_DNS'])
     NAMESERVERS = os.environ['NAMESERVERS'].split(',')
     ZONA_ID = os.environ['ZONA_ID']
+    # Segmentos do scan paralelo da listagem; aumente para tabelas grandes
+    SEGMENTOS_SCAN = int(os.environ.get('SEGMENTOS_SCAN', '1'))
+    # Foto da tabela para a listagem (ver foto_registros.py), como no gerenciador_dns
+    CACHE_TTL = float(os.environ.get('CACHE_TTL', '30'))
+    CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', '1024'))
+    CACHE_VERSAO_DYNAMODB = os.environ.get('CACHE_VERSAO_DYNAMODB', '').lower() in ('1', 'true', 'sim')
+    CACHE_VERSAO_INTERVALO = float(os.environ.get('CACHE_VERSAO_INTERVALO', '5'))
+    # Limite de chamadas ao Route53 por segundo e janela para agrupar alterações
+    ROUTE53_TAXA = float(os.environ.get('ROUTE53_TAXA', '5'))
+    ROUTE53_JANELA_MS = float(os.environ.get('ROUTE53_JANELA_MS', '0'))
+    # 'direto': DynamoDB e Route53 na requisição; 'outbox': só DynamoDB, e o
+    # consumidor_stream aplica no Route53 (ver outbox.py)
+    MODO_ESCRITA = os.environ.get('MODO_ESCRITA', 'direto')
+    # Stream SSE de alterações (ver eventos_registros.py): intervalo entre as
+    # consultas ao diário, duração máxima de cada conexão e intervalo do ping
+    EVENTOS_INTERVALO = float(os.environ.get('EVENTOS_INTERVALO', '1'))
+    EVENTOS_DURACAO_MAXIMA = float(os.environ.get('EVENTOS_DURACAO_MAXIMA', '300'))
+    EVENTOS_INTERVALO_PING = float(os.environ.get('EVENTOS_INTERVALO_PING', '15'))
 except KeyError as e:
     raise RuntimeError(f"Variável de ambiente {e} não configurada.")
 except Exception as e:
-    raise RuntimeError(f"Erro ao inicializar clientes AWS: {e}")
+    raise RuntimeError(f"Erro ao inicializar configurações: {e}")
+
+repositorio = RepositorioRegistros(DYNAMODB_TABLE)
+
+# A listagem do React-Admin é servida desta foto, sem um scan por página
+fotos = FotoRegistros(
+    repositorio, CACHE_TTL, CACHE_MAX_ITENS, versao_dynamodb=CACHE_VERSAO_DYNAMODB,
+    intervalo_versao=CACHE_VERSAO_INTERVALO, segmentos=SEGMENTOS_SCAN
+)
+
+# Todas as alterações no Route53 passam pelo escritor (limite de taxa e retentativas)
+escritor = EscritorRoute53(ZONA_ID, taxa=ROUTE53_TAXA, janela=ROUTE53_JANELA_MS / 1000)
+
+# Chaves de API por inquilino, com limite de requisições e de escritas (SENHA_API continua aceita)
+verificador = chaves_api.verificador_do_ambiente(SENHA_API)
+
+# Diário dos deltas para o stream SSE (None sem EVENTOS_TABLE: sem stream)
+diario = eventos_registros.diario_do_ambiente()
+
+def _publicar(deltas):
+    # Toda escrita concluída passa por aqui: descarta a foto da listagem e
+    # publica os deltas no diário
+    if not deltas:
+        return
+    fotos.invalidar(*(alias for _, alias, _ in deltas))
+    if diario is not None:
+        diario.publicar(deltas)
+
+@app.exception_handler(ErroLimiteRoute53)
+async def _erro_limite_route53(request, erro: ErroLimiteRoute53):
+    log.aviso("Route53 recusou a alteração", excecao=erro, status=erro.status)
+    # 429/503 com Retry-After em vez de 500: o cliente pode simplesmente repetir
+    return Response(
+        content=json.dumps({"detail": f"Route53 ocupado, tente novamente: {str(erro)}"}, ensure_ascii=False),
+        status_code=erro.status, media_type="application/json",
+        headers={"Retry-After": str(erro.espera_sugerida)}
+    )
 
 # --- Modelos Pydantic para validação ---
 class Registro(BaseModel):
     subdominio: str
     endereco_ip: str
+    # Epoch em segundos ou data ISO-8601; sem ele, o registro não expira (ver expiracao.py)
+    expira_em: Optional[Union[int, str]] = None
+
+class LoteRegistros(BaseModel):
+    registros: List[Registro]
+
+class Reapontamento(BaseModel):
+    ip_origem: str
+    ip_destino: str
 
 # --- Lógica de Validação da API Key ---
-def verificar_senha(x_api_key: str = Header(...)):
-    if not hmac.compare_digest(x_api_key, SENHA_API):
+def verificar_senha(request: Request, x_api_key: str = Header(...)):
+    inquilino = verificador.verificar(x_api_key)
+    if inquilino is None:
         raise HTTPException(status_code=401, detail="Senha inválida")
+    espera = inquilino.consumir(escrita=request.method in chaves_api.METODOS_ESCRITA)
+    if espera:
+        log.aviso("Limite da chave excedido", inquilino=inquilino.nome, metodo=request.method)
+        metricas.registrar("RequisicoesLimitadas", 1, "Count")
+        raise HTTPException(
+            status_code=429, detail="Limite de requisições da chave excedido, tente novamente",
+            headers={"Retry-After": str(math.ceil(espera))}
+        )
     return True
 
 # --- Rotas da API ---
@@ -62,55 +177,540 @@ def obter_info(api_key_valida: bool = Depends(verificar_senha)):
         "ttl": TTL_DNS
     }
 
+# --- ETag / If-None-Match (ver etag_http.py) ---
+def _resposta_com_etag(conteudo, if_none_match, headers=None):
+    corpo = json.dumps(conteudo, ensure_ascii=False)
+    etag = etag_http.etag(corpo, (headers or {}).get("Content-Range", ""))
+    return _resposta_validada(corpo, etag, if_none_match, headers)
+
+def _resposta_validada(corpo, etag, if_none_match, headers=None):
+    # Corpo e ETag já prontos (as páginas da foto trazem os dois, calculados antes do pedido)
+    if etag_http.confere(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=corpo, media_type="application/json", headers={**(headers or {}), "ETag": etag})
+
+# --- Paginação, ordenação e filtro no formato do React-Admin (ra-data-simple-rest) ---
+LIMITE_PADRAO = 25
+LIMITE_MAXIMO = 1000
+
+def _ler_json(valor, nome, padrao):
+    if not valor:
+        return padrao
+    try:
+        return json.loads(valor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parâmetro '{nome}' não é um JSON válido")
+
+def _ler_intervalo(intervalo_param, header_range):
+    intervalo = _ler_json(intervalo_param, 'range', None)
+    if intervalo is None and header_range and '=' in header_range:
+        # Header "Range: registros=0-24" enviado pelo simpleRestProvider
+        intervalo = header_range.split('=', 1)[1].split('-', 1)
+    if intervalo is None:
+        return None
+    try:
+        inicio, fim = int(intervalo[0]), int(intervalo[1])
+    except (TypeError, ValueError, IndexError):
+        raise HTTPException(status_code=400, detail="Parâmetro 'range' deve ser [inicio, fim]")
+    if inicio < 0 or fim < inicio:
+        raise HTTPException(status_code=400, detail="Parâmetro 'range' fora dos limites")
+    return inicio, fim
+
+def _content_range(inicio, qtd_pagina, total):
+    if qtd_pagina == 0:
+        return f"registros */{total}"
+    return f"registros {inicio}-{inicio + qtd_pagina - 1}/{total}"
+
+def _ler_ids(ids_param, filtros):
+    # getMany do React-Admin: ?ids=a,b,c ou filter={"id": ["a", "b", "c"]}
+    if ids_param:
+        ids = [alias.strip() for alias in ids_param.split(',')]
+    elif list(filtros) == ['id'] and isinstance(filtros['id'], list):
+        ids = [str(alias) for alias in filtros['id']]
+    else:
+        return None
+    # O item ALIAS_VERSAO (carimbo do cache do gerenciador_dns) não é um registro
+    ids = [alias for alias in dict.fromkeys(ids) if alias and alias != ALIAS_VERSAO]
+    if len(ids) > LIMITE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Informe no máximo {LIMITE_MAXIMO} ids")
+    return ids
+
+def _listar_por_ids(ids, if_none_match):
+    # batch_get_item em blocos de 100: custa O(ids) leituras em vez de um scan
+    with log.cronometrar("dynamodb"):
+        encontrados = repositorio.obter_varios(ids)
+    # Na ordem pedida; ids inexistentes (ou vencidos) são omitidos
+    registros = [
+        {**encontrados[alias], 'id': alias}
+        for alias in ids
+        if alias in encontrados and not expiracao.expirado(encontrados[alias])
+    ]
+    return _resposta_com_etag(
+        registros, if_none_match,
+        headers={"Content-Range": _content_range(0, len(registros), len(registros))}
+    )
+
+# --- Listagem em streaming ---
+# Com ?stream=true o array JSON é escrito página a página, conforme o scan
+# avança, em vez de montar a lista inteira em memória (no contêiner com
+# uvicorn; atrás do Mangum a resposta é acumulada antes de sair). Sem range,
+# a tabela é lida uma única vez e o total vai como '*', como no modo cursor;
+# com range, o total vem antes de um scan com Select=COUNT. Não há ETag nem
+# ordenação neste modo: ambos exigiriam ler a tabela inteira antes de responder.
+def _gerar_json_em_fluxo(paginas, inicio, quantidade):
+    yield b'['
+    posicao, enviados = 0, 0
+    try:
+        for pagina in paginas:
+            partes = []
+            for registro in pagina:
+                if posicao >= inicio and enviados < quantidade:
+                    registro['id'] = registro['alias']
+                    partes.append(json.dumps(registro, ensure_ascii=False))
+                    enviados += 1
+                posicao += 1
+            if partes:
+                yield (',' if enviados > len(partes) else '').encode() + ','.join(partes).encode()
+            if enviados >= quantidade:
+                break
+    except Exception as e:
+        # O status 200 já foi enviado; propaga o erro em vez de fechar o array como se estivesse completo
+        log.erro("Erro ao transmitir registros", excecao=e)
+        raise
+    yield b']'
+
+def _listar_em_fluxo(filtros, intervalo_lido):
+    if intervalo_lido:
+        total = repositorio.contar(filtros=filtros, segmentos=SEGMENTOS_SCAN, vigentes=True)
+        inicio, fim = intervalo_lido
+        quantidade = max(min(fim, total - 1) - inicio + 1, 0)
+        content_range = _content_range(inicio, quantidade, total)
+        # Com intervalo, um único segmento mantém a ordem do scan estável entre páginas
+        segmentos = 1
+    else:
+        # Um COUNT antes dobraria as leituras (e poderia divergir do scan com escritas concorrentes)
+        inicio, quantidade = 0, math.inf
+        content_range = _content_range(0, 0, '*')
+        segmentos = SEGMENTOS_SCAN
+    paginas = repositorio.varrer_paginas(campos=CAMPOS_LISTAGEM, filtros=filtros, segmentos=segmentos, vigentes=True)
+    return StreamingResponse(
+        _gerar_json_em_fluxo(paginas, inicio, quantidade),
+        media_type="application/json",
+        headers={"Content-Range": content_range}
+    )
+
 @app.get("/registros")
-def listar_registros(api_key_valida: bool = Depends(verificar_senha)):
+def listar_registros(
+    intervalo: Optional[str] = Query(None, alias="range"),
+    ordenacao: Optional[str] = Query(None, alias="sort"),
+    filtro: Optional[str] = Query(None, alias="filter"),
+    ids: Optional[str] = None,
+    endereco_ip: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    stream: bool = False,
+    header_range: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    api_key_valida: bool = Depends(verificar_senha)
+):
+    filtros = _ler_json(filtro, 'filter', {})
+    if not isinstance(filtros, dict):
+        raise HTTPException(status_code=400, detail="Parâmetro 'filter' deve ser um objeto")
+    if endereco_ip:
+        filtros = {**filtros, 'endereco_ip': endereco_ip}
+    ids_lidos = _ler_ids(ids, filtros)
     try:
-        response = table.scan()
-        registros = response.get('Items', [])
-        qtd = len(registros)
-        
-        # Constrói o header Content-Range no formato esperado pelo React-Admin
-        content_range = f"registros 0-{qtd-1}/{qtd}" if qtd > 0 else "registros 0-0/0"
-        
-        # Retorna uma JSONResponse customizada com o header Content-Range
-        return JSONResponse(
-            content=registros,
-            headers={"Content-Range": content_range}
-        )
+        if ids_lidos is not None:
+            return _listar_por_ids(ids_lidos, if_none_match)
+
+        if cursor is not None or limite is not None:
+            # Modo cursor: lê somente a página pedida do DynamoDB
+            try:
+                registros, proximo_cursor = repositorio.pagina(
+                    limite or LIMITE_PADRAO, cursor, campos=CAMPOS_LISTAGEM, filtros=filtros, vigentes=True
+                )
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Parâmetro 'cursor' inválido")
+            for registro in registros:
+                registro['id'] = registro['alias']
+            headers = {"Content-Range": _content_range(0, len(registros), '*')}
+            if proximo_cursor:
+                headers["X-Proximo-Cursor"] = proximo_cursor
+            return _resposta_com_etag(registros, if_none_match, headers)
+
+        ordem = _ler_json(ordenacao, 'sort', None)
+        if ordem and (not isinstance(ordem, list) or len(ordem) < 2):
+            raise HTTPException(status_code=400, detail="Parâmetro 'sort' deve ser [campo, ordem]")
+        intervalo_lido = _ler_intervalo(intervalo, header_range)
+
+        if stream:
+            if ordem:
+                raise HTTPException(status_code=400, detail="O modo stream não suporta o parâmetro 'sort'")
+            return _listar_em_fluxo(filtros, intervalo_lido)
+
+        campo = ('alias' if ordem[0] == 'id' else ordem[0]) if ordem else None
+        direcao = str(ordem[1]).upper() if ordem else 'ASC'
+        ip_consulta = filtros.get('endereco_ip')
+        if isinstance(ip_consulta, str) and ip_consulta and not fotos.em_cache():
+            # Sem a foto em memória, o índice por IP evita ler a tabela inteira
+            restantes = {k: v for k, v in filtros.items() if k != 'endereco_ip'}
+            with log.cronometrar("dynamodb"):
+                registros = list(repositorio.consultar_por_ip(ip_consulta, campos=CAMPOS_LISTAGEM, filtros=restantes, vigentes=True))
+            corpo, content_range, etag = montar_pagina(ordenar(registros, campo, direcao), intervalo_lido)
+        else:
+            # Da foto da tabela: o DynamoDB só é lido quando ela expira ou é
+            # invalidada por uma escrita, e cada página é montada uma vez por foto
+            corpo, content_range, etag = fotos.pagina(filtros, campo, direcao, intervalo_lido)
+
+        # Content-Range no formato esperado pelo React-Admin
+        return _resposta_validada(corpo, etag, if_none_match, {"Content-Range": content_range})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar registros: {str(e)}")
 
+def _marcar_aplicado(subdominio, endereco_ip, id_alteracao):
+    # Sem a marca, o próximo envio do mesmo IP repete o UPSERT; nada se perde
+    try:
+        return outbox.marcar_aplicado(repositorio, subdominio, endereco_ip, id_alteracao)
+    except Exception as e:
+        log.aviso("Registro não marcado como APLICADO", excecao=e, alias=subdominio)
+        return None
+
+def _resposta_inalterado(item):
+    return {"mensagem": "Registro já aponta para este IP; nada foi alterado", "subdominio": item["alias"], "endereco_ip": item.get("endereco_ip"), "alterado": False, "nameservers": NAMESERVERS, "zona_id": ZONA_ID}
+
 @app.post("/registros", status_code=201)
-def criar_registro(registro: Registro, api_key_valida: bool = Depends(verificar_senha)):
+def criar_registro(registro: Registro, response: Response, api_key_valida: bool = Depends(verificar_senha)):
+    try:
+        expira_em = expiracao.ler_expira_em(registro.expira_em)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if MODO_ESCRITA == 'outbox':
+        try:
+            ipaddress.IPv4Address(registro.endereco_ip)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Endereço IP inválido: {registro.endereco_ip}")
+        try:
+            item, alterado, anterior = outbox.registrar_criacao(repositorio, registro.subdominio, registro.endereco_ip, expira_em)
+        except CondicaoFalhou:
+            raise HTTPException(status_code=409, detail="Exclusão do registro em andamento")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao criar registro: {str(e)}")
+        if not alterado:
+            response.status_code = 200
+            return _resposta_inalterado(item)
+        _publicar([(CRIADO if anterior is None else ALTERADO, registro.subdominio, item)])
+        response.status_code = 202
+        return {"mensagem": "Registro aceito; será aplicado no Route53", "subdominio": registro.subdominio, "status": item["status"], "nameservers": NAMESERVERS, "zona_id": ZONA_ID}
     try:
+        item = {'alias': registro.subdominio, 'endereco_ip': registro.endereco_ip, 'data_criacao': datetime.now().isoformat()}
+        if expira_em is not None:
+            item[expiracao.CAMPO] = expira_em
+        # Grava primeiro, só se o IP (ou a expiração) mudou. O mesmo IP só dispensa
+        # o UPSERT se o Route53 já o recebeu (APLICADO/PROPAGADO); senão o UPSERT,
+        # idempotente, vai de novo e corrige uma divergência no Route53
+        gravou, anterior = repositorio.gravar_se_alterado(item, campos=('endereco_ip', expiracao.CAMPO))
+        if not gravou and anterior.get('status') in outbox.CONFIRMADOS:
+            response.status_code = 200
+            return _resposta_inalterado(anterior)
+
         nome_registro = f'{registro.subdominio}.{NAMESERVERS[0]}'
 
         change_batch = {
             'Changes': [{'Action': 'UPSERT', 'ResourceRecordSet': {'Name': nome_registro, 'Type': 'A', 'TTL': TTL_DNS, 'ResourceRecords': [{'Value': registro.endereco_ip}]}}]
         }
-        route53.change_resource_record_sets(HostedZoneId=ZONA_ID, ChangeBatch=change_batch)
-        table.put_item(Item={'alias': registro.subdominio, 'endereco_ip': registro.endereco_ip, 'data_criacao': datetime.now().isoformat()})
+        try:
+            with log.cronometrar("route53"):
+                resposta = escritor.aplicar(change_batch['Changes'])
+        except Exception:
+            if gravou:
+                try:
+                    repositorio.desfazer_gravacao(item, anterior)
+                except Exception:
+                    # Outra escrita venceu, ou a reconciliação corrige a divergência
+                    pass
+            raise
 
+        marcado = _marcar_aplicado(registro.subdominio, registro.endereco_ip, resposta['ChangeInfo']['Id'])
+        if not gravou:
+            if marcado is not None:
+                _publicar([(ALTERADO, registro.subdominio, marcado)])
+            response.status_code = 200
+            return _resposta_inalterado(marcado or anterior)
+        _publicar([(CRIADO if anterior is None else ALTERADO, registro.subdominio, marcado or item)])
         return {"mensagem": "Registro criado com sucesso", "subdominio": registro.subdominio, "nameservers": NAMESERVERS, "zona_id": ZONA_ID}
+    except ErroLimiteRoute53:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar registro: {str(e)}")
 
+# --- Stream de alterações (Server-Sent Events) ---
+# O painel assina em vez de refazer a listagem: só os deltas, lidos do diário
+# (ver eventos_registros.py). Declarada antes de /registros/{subdominio}, que
+# senão trataria "eventos" como subdomínio. O EventSource do navegador não envia
+# o X-API-Key, então o frontend lê o stream com fetch (dataProvider.js).
+def _evento_sse(evento_id, tipo, dados):
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+def _seq(evento_id):
+    try:
+        return int(evento_id)
+    except (TypeError, ValueError):
+        return None
+
+async def _gerar_eventos(request, ultimo_id):
+    loop = asyncio.get_running_loop()
+    yield "retry: 2000\n\n"
+    atual = await run_in_threadpool(diario.ultimo)
+    seq = _seq(ultimo_id)
+    if ultimo_id is None:
+        # Conexão nova: o cliente acabou de listar; os deltas começam daqui
+        seq = atual
+        yield _evento_sse(seq, "conectado", {})
+    elif seq is None or not 0 <= seq <= atual:
+        # Id que este diário não emitiu (ou de antes de ele ser recriado)
+        seq = atual
+        yield _evento_sse(seq, REINICIO, {})
+    limite = loop.time() + EVENTOS_DURACAO_MAXIMA
+    proximo_ping = loop.time() + EVENTOS_INTERVALO_PING
+    while True:
+        eventos, reiniciar = await run_in_threadpool(diario.proximos, seq)
+        if reiniciar:
+            # O que o cliente perdeu não está mais no diário: refaz a listagem
+            seq = await run_in_threadpool(diario.ultimo)
+            yield _evento_sse(seq, REINICIO, {})
+        for seq, dados in eventos:
+            yield _evento_sse(seq, "registro", dados)
+        if loop.time() >= limite or await request.is_disconnected():
+            # O cliente reconecta com Last-Event-ID e não perde nada
+            return
+        if eventos or reiniciar:
+            proximo_ping = loop.time() + EVENTOS_INTERVALO_PING
+        elif loop.time() >= proximo_ping:
+            # Mantém a conexão viva em proxies que cortam streams ociosos
+            yield ": ping\n\n"
+            proximo_ping = loop.time() + EVENTOS_INTERVALO_PING
+        await asyncio.sleep(EVENTOS_INTERVALO)
+
+@app.get("/registros/eventos")
+def eventos_registros_sse(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    ultimo_id: Optional[str] = Query(None, description="Alternativa ao header Last-Event-ID"),
+    api_key_valida: bool = Depends(verificar_senha)
+):
+    # Atrás do Mangum cada conexão prenderia uma invocação da Lambda até o
+    # timeout, e o API Gateway entregaria o stream só no fim; o painel volta ao
+    # refresh manual quando recebe 404
+    if diario is None or "aws.event" in request.scope:
+        raise HTTPException(status_code=404, detail="Stream de eventos não disponível neste ambiente")
+    return StreamingResponse(
+        _gerar_eventos(request, last_event_id or ultimo_id),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: proxies nginx entregam cada evento sem acumular
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/registros/{subdominio}")
+def obter_registro(subdominio: str, if_none_match: Optional[str] = Header(None), api_key_valida: bool = Depends(verificar_senha)):
+    try:
+        item = repositorio.obter(subdominio)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter registro: {str(e)}")
+    # Um item vencido continua na tabela até o TTL do DynamoDB removê-lo
+    if item is None or expiracao.expirado(item):
+        raise HTTPException(status_code=404, detail="Registro não encontrado")
+    return _resposta_com_etag({**item, 'id': subdominio}, if_none_match)
+
+# --- Criação em lote ---
+# Os UPSERTs são agrupados em ChangeBatches de até 1000 elementos (ver alteracoes_route53)
+@app.post("/registros/lote")
+def criar_registros_lote(lote: LoteRegistros, api_key_valida: bool = Depends(verificar_senha)):
+    if not lote.registros:
+        raise HTTPException(status_code=400, detail="Informe uma lista não vazia em 'registros'")
+
+    resultados = [None] * len(lote.registros)
+    # subdominio -> índice do item; se o subdomínio se repete no lote, vale o último
+    por_subdominio = {}
+    # índice -> expira_em (epoch), só para os registros que informaram
+    expiracoes = {}
+    for indice, registro in enumerate(lote.registros):
+        try:
+            ipaddress.IPv4Address(registro.endereco_ip)
+        except ValueError:
+            resultados[indice] = {"subdominio": registro.subdominio, "status": 400, "erro": f"Endereço IP inválido: {registro.endereco_ip}"}
+            continue
+        try:
+            expira_em = expiracao.ler_expira_em(registro.expira_em)
+        except ValueError as e:
+            resultados[indice] = {"subdominio": registro.subdominio, "status": 400, "erro": str(e)}
+            continue
+        if expira_em is not None:
+            expiracoes[indice] = expira_em
+        if registro.subdominio in por_subdominio:
+            resultados[por_subdominio[registro.subdominio]] = {"subdominio": registro.subdominio, "status": 409, "erro": "Subdomínio repetido no lote; prevalece a última ocorrência"}
+        por_subdominio[registro.subdominio] = indice
+
+    if MODO_ESCRITA == 'outbox':
+        gravados = outbox.registrar_lote(repositorio, [(subdominio, lote.registros[indice].endereco_ip, expiracoes.get(indice)) for subdominio, indice in por_subdominio.items()])
+        deltas = []
+        for subdominio, gravado in zip(por_subdominio, gravados):
+            indice = por_subdominio[subdominio]
+            if isinstance(gravado, CondicaoFalhou):
+                resultados[indice] = {"subdominio": subdominio, "status": 409, "erro": "Exclusão do registro em andamento"}
+            elif isinstance(gravado, Exception):
+                resultados[indice] = {"subdominio": subdominio, "status": 500, "erro": f"Erro ao salvar registro: {str(gravado)}"}
+            else:
+                item, alterado, anterior = gravado
+                resultados[indice] = {"subdominio": subdominio, "status": 202 if alterado else 200, "status_registro": item.get('status'), "alterado": alterado}
+                if alterado:
+                    deltas.append((CRIADO if anterior is None else ALTERADO, subdominio, item))
+        _publicar(deltas)
+        # Nada a enviar ao Route53 nesta requisição; o consumidor_stream aplica depois
+        por_subdominio = {}
+
+    alteracoes = [
+        {'Action': 'UPSERT', 'ResourceRecordSet': {'Name': f'{subdominio}.{NAMESERVERS[0]}', 'Type': 'A', 'TTL': TTL_DNS, 'ResourceRecords': [{'Value': lote.registros[indice].endereco_ip}]}}
+        for subdominio, indice in por_subdominio.items()
+    ]
+    nome_para_subdominio = {f'{subdominio}.{NAMESERVERS[0]}': subdominio for subdominio in por_subdominio}
+
+    for change_batch in dividir_change_batches(alteracoes):
+        subdominios = [nome_para_subdominio[a['ResourceRecordSet']['Name']] for a in change_batch]
+        try:
+            with log.cronometrar("route53"):
+                resposta = escritor.aplicar(change_batch)
+        except Exception as e:
+            # O ChangeBatch é atômico: ou todas as alterações entram, ou nenhuma
+            for subdominio in subdominios:
+                resultados[por_subdominio[subdominio]] = {"subdominio": subdominio, "status": getattr(e, "status", 500), "erro": f"Erro ao criar registro: {str(e)}"}
+            continue
+
+        data_criacao = datetime.now().isoformat()
+        itens = [
+            {'alias': subdominio, 'endereco_ip': lote.registros[por_subdominio[subdominio]].endereco_ip, 'data_criacao': data_criacao,
+             # Gravado depois do Route53 aceitar o ChangeBatch
+             'status': outbox.APLICADO, 'id_alteracao': resposta['ChangeInfo']['Id'],
+             **({expiracao.CAMPO: expiracoes[por_subdominio[subdominio]]} if por_subdominio[subdominio] in expiracoes else {})}
+            for subdominio in subdominios
+        ]
+        try:
+            repositorio.gravar_lote(itens)
+        except Exception as e:
+            for subdominio in subdominios:
+                resultados[por_subdominio[subdominio]] = {"subdominio": subdominio, "status": 500, "erro": f"Registro criado no Route53, mas não salvo no DynamoDB: {str(e)}"}
+            continue
+
+        for item in itens:
+            resultados[por_subdominio[item['alias']]] = {"subdominio": item['alias'], "status": 201, "id_alteracao": resposta['ChangeInfo']['Id']}
+        _publicar([(ALTERADO, item['alias'], item) for item in itens])
+
+    criados = sum(1 for r in resultados if r["status"] in (201, 202))
+    # 200: o subdomínio já apontava para o mesmo IP (modo outbox)
+    inalterados = sum(1 for r in resultados if r["status"] == 200)
+    return {"criados": criados, "inalterados": inalterados, "falhas": len(resultados) - criados - inalterados, "resultados": resultados, "nameservers": NAMESERVERS, "zona_id": ZONA_ID}
+
+# --- Reapontamento em massa ---
+# Troca o IP de todos os subdomínios que apontam para ip_origem (ex.: a instância
+# EC2 do aluno foi recriada). Os subdomínios vêm do índice por IP; cada um muda
+# no DynamoDB só se ainda apontar para ip_origem, e os UPSERTs vão ao Route53 em
+# ChangeBatches agrupados.
+def _trocar_ip(subdominio, de, para):
+    # Sem status até o Route53 aceitar o UPSERT: um APLICADO antigo não pode
+    # dispensar o UPSERT de um novo envio do mesmo IP
+    return repositorio.atualizar(subdominio, {'endereco_ip': para, 'status': None}, condicao='#ip = :de', nomes={'#ip': 'endereco_ip'}, valores={':de': de})
+
+@app.post("/registros/reapontar")
+def reapontar_registros(pedido: Reapontamento, api_key_valida: bool = Depends(verificar_senha)):
+    try:
+        ipaddress.IPv4Address(pedido.ip_origem)
+        ipaddress.IPv4Address(pedido.ip_destino)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Informe endereços IP válidos em 'ip_origem' e 'ip_destino'")
+    if pedido.ip_origem == pedido.ip_destino:
+        raise HTTPException(status_code=400, detail="'ip_origem' e 'ip_destino' são iguais")
+    try:
+        with log.cronometrar("dynamodb"):
+            subdominios = [r['alias'] for r in repositorio.consultar_por_ip(pedido.ip_origem, campos=('alias',), vigentes=True)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar registros: {str(e)}")
+
+    resultados = {}
+    # subdominio -> item já com ip_destino, publicado depois do Route53
+    trocados = {}
+    for subdominio in subdominios:
+        try:
+            if MODO_ESCRITA == 'outbox':
+                item = outbox.registrar_reapontamento(repositorio, subdominio, pedido.ip_origem, pedido.ip_destino)
+                resultados[subdominio] = {"subdominio": subdominio, "status": 202, "status_registro": item['status']}
+                _publicar([(ALTERADO, subdominio, item)])
+            else:
+                trocados[subdominio] = _trocar_ip(subdominio, pedido.ip_origem, pedido.ip_destino)
+        except CondicaoFalhou:
+            # Outra escrita mudou o IP (ou pediu a exclusão) depois da consulta ao índice
+            resultados[subdominio] = {"subdominio": subdominio, "status": 409, "erro": "O registro não aponta mais para ip_origem"}
+        except Exception as e:
+            resultados[subdominio] = {"subdominio": subdominio, "status": 500, "erro": f"Erro ao reapontar registro: {str(e)}"}
+
+    alteracoes = [
+        {'Action': 'UPSERT', 'ResourceRecordSet': {'Name': f'{subdominio}.{NAMESERVERS[0]}', 'Type': 'A', 'TTL': TTL_DNS, 'ResourceRecords': [{'Value': pedido.ip_destino}]}}
+        for subdominio in trocados
+    ]
+    nome_para_subdominio = {f'{subdominio}.{NAMESERVERS[0]}': subdominio for subdominio in trocados}
+    for change_batch in dividir_change_batches(alteracoes):
+        do_lote = [nome_para_subdominio[a['ResourceRecordSet']['Name']] for a in change_batch]
+        try:
+            with log.cronometrar("route53"):
+                resposta = escritor.aplicar(change_batch)
+        except Exception as e:
+            for subdominio in do_lote:
+                try:
+                    _trocar_ip(subdominio, pedido.ip_destino, pedido.ip_origem)
+                except Exception:
+                    # Outra escrita venceu, ou a reconciliação corrige a divergência
+                    pass
+                resultados[subdominio] = {"subdominio": subdominio, "status": getattr(e, "status", 500), "erro": f"Erro ao reapontar registro: {str(e)}"}
+            continue
+        for subdominio in do_lote:
+            trocados[subdominio] = _marcar_aplicado(subdominio, pedido.ip_destino, resposta['ChangeInfo']['Id']) or trocados[subdominio]
+            resultados[subdominio] = {"subdominio": subdominio, "status": 200, "id_alteracao": resposta['ChangeInfo']['Id']}
+        _publicar([(ALTERADO, subdominio, trocados[subdominio]) for subdominio in do_lote])
+
+    lista = [resultados[subdominio] for subdominio in subdominios]
+    reapontados = sum(1 for r in lista if r["status"] in (200, 202))
+    return {"ip_origem": pedido.ip_origem, "ip_destino": pedido.ip_destino, "reapontados": reapontados, "falhas": len(lista) - reapontados, "resultados": lista}
+
 @app.delete("/registros/{subdominio}")
-def deletar_registro(subdominio: str, api_key_valida: bool = Depends(verificar_senha)):
+def deletar_registro(subdominio: str, response: Response, api_key_valida: bool = Depends(verificar_senha)):
+    if MODO_ESCRITA == 'outbox':
+        try:
+            item = outbox.registrar_exclusao(repositorio, subdominio)
+        except CondicaoFalhou:
+            raise HTTPException(status_code=404, detail="Registro não encontrado")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao deletar registro: {str(e)}")
+        _publicar([(ALTERADO, subdominio, item)])
+        response.status_code = 202
+        return {"mensagem": "Exclusão aceita; será aplicada no Route53", "subdominio": subdominio, "status": outbox.EXCLUINDO}
     try:
-        response = table.get_item(Key={'alias': subdominio})
-        if 'Item' not in response:
+        item = repositorio.obter(subdominio)
+        if item is None:
             raise HTTPException(status_code=404, detail="Registro não encontrado")
 
-        endereco_ip = response['Item']['endereco_ip']
+        endereco_ip = item['endereco_ip']
         nome_registro = f'{subdominio}.{NAMESERVERS[0]}'
 
         change_batch = {
             'Changes': [{'Action': 'DELETE', 'ResourceRecordSet': {'Name': nome_registro, 'Type': 'A', 'TTL': TTL_DNS, 'ResourceRecords': [{'Value': endereco_ip}]}}]
         }
-        route53.change_resource_record_sets(HostedZoneId=ZONA_ID, ChangeBatch=change_batch)
-        table.delete_item(Key={'alias': subdominio})
+        with log.cronometrar("route53"):
+            escritor.aplicar(change_batch['Changes'])
+        repositorio.excluir(subdominio)
+        _publicar([(REMOVIDO, subdominio, None)])
 
         return {"mensagem": "Registro deletado com sucesso", "subdominio": subdominio, "nameservers": NAMESERVERS, "zona_id": ZONA_ID}
+    except (HTTPException, ErroLimiteRoute53):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao deletar registro: {str(e)}")
\ No newline at end of file
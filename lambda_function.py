@@ -1,59 +1,197 @@
 import json
-import boto3
-import hashlib
+import hmac
 import os
 import time
-import dns.resolver
 from datetime import datetime
+from functools import lru_cache
 from botocore.exceptions import ClientError
 
-# Inicialização dos clientes AWS
-dynamodb = boto3.resource('dynamodb')
-route53 = boto3.client('route53')
-tabela = dynamodb.Table(os.environ['TABELA_DYNAMODB'])
+# Configuração; os clientes AWS são criados sob demanda em _route53()/_tabela()
+TABELA_DYNAMODB = os.environ['TABELA_DYNAMODB']
 ID_ZONA_HOSPEDADA = os.environ['ID_ZONA_HOSPEDADA']
 SENHA_COMPARTILHADA = os.environ['SENHA_COMPARTILHADA']
+_SENHA_COMPARTILHADA_BYTES = SENHA_COMPARTILHADA.encode()
 NOME_DOMINIO = os.environ['NOME_DOMINIO']
+# Opcional: nameservers a consultar no lugar do conjunto NS da zona (ex.: servidor local)
+NAMESERVERS_AUTORITATIVOS = [ns for ns in os.environ.get('NAMESERVERS_AUTORITATIVOS', '').split(',') if ns]
+PORTA_DNS = int(os.environ.get('PORTA_DNS', '53'))
 
-def verificar_propagacao_dns(subdominio, endereco_ip, max_tentativas=30, intervalo=10):
+@lru_cache(maxsize=None)
+def _sessao():
+    """Sessão boto3 compartilhada, criada na primeira chamada à AWS."""
+    import boto3
+    return boto3.session.Session()
+
+@lru_cache(maxsize=None)
+def _configuracao():
+    """Keep-alive, pool de conexões e retentativas adaptativas."""
+    from botocore.config import Config
+    return Config(
+        connect_timeout=2,
+        read_timeout=10,
+        tcp_keepalive=True,
+        max_pool_connections=16,
+        retries={'mode': 'adaptive', 'max_attempts': 5}
+    )
+
+@lru_cache(maxsize=None)
+def _route53():
+    return _sessao().client('route53', config=_configuracao())
+
+@lru_cache(maxsize=None)
+def _tabela():
+    return _sessao().resource('dynamodb', config=_configuracao()).Table(TABELA_DYNAMODB)
+
+def _nameservers_autoritativos():
+    """Nameservers da zona, consultados uma única vez por contêiner."""
+    global NAMESERVERS_AUTORITATIVOS
+    if not NAMESERVERS_AUTORITATIVOS:
+        from propagacao_dns import nameservers_da_zona
+        NAMESERVERS_AUTORITATIVOS = nameservers_da_zona(_route53(), ID_ZONA_HOSPEDADA)
+    return NAMESERVERS_AUTORITATIVOS
+
+def verificar_propagacao_dns(subdominio, endereco_ip):
     """
     Verifica se o registro DNS já foi propagado.
     
+    Consulta diretamente todos os nameservers autoritativos da zona, sem passar
+    pelo resolver do sistema (cujo cache pode devolver um IP antigo).
+    
     Args:
         subdominio: Nome do subdomínio
         endereco_ip: IP esperado
-        max_tentativas: Número máximo de tentativas
-        intervalo: Intervalo entre tentativas em segundos
     
     Returns:
-        bool: True se propagado, False se não propagado após todas as tentativas
+        bool: True se todos os nameservers já respondem com o IP esperado
     """
+    from propagacao_dns import verificar_propagacao
     nome_completo = f"{subdominio}.{NOME_DOMINIO}"
-    tentativas = 0
+    resultado = verificar_propagacao(
+        [(nome_completo, endereco_ip)], _nameservers_autoritativos(), porta=PORTA_DNS
+    )
+    return resultado['registros'][nome_completo]['propagado']
+
+def _status_alteracao(cliente_route53, id_alteracao):
+    """Consulta o status (PENDING ou INSYNC) de uma alteração no Route 53."""
+    resposta = cliente_route53.get_change(Id=id_alteracao)
+    return resposta['ChangeInfo']['Status']
+
+def _listar_pendentes(tabela_registros):
+    """Lista os registros que ainda aguardam propagação."""
+    kwargs = {
+        'FilterExpression': '#status IN (:pendente, :aguardando)',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {
+            ':pendente': 'PENDENTE',
+            ':aguardando': 'AGUARDANDO_PROPAGACAO'
+        }
+    }
+    while True:
+        resposta = tabela_registros.scan(**kwargs)
+        yield from resposta.get('Items', [])
+        if 'LastEvaluatedKey' not in resposta:
+            break
+        kwargs['ExclusiveStartKey'] = resposta['LastEvaluatedKey']
+
+def _marcar_propagado(tabela_registros, item):
+    """Promove o registro para PROPAGADO, se ele não mudou desde a leitura."""
+    if item.get('id_alteracao'):
+        condicao = 'id_alteracao = :cid'
+        valores = {':cid': item['id_alteracao']}
+    else:
+        condicao = 'endereco_ip = :ip'
+        valores = {':ip': item['endereco_ip']}
+    try:
+        tabela_registros.update_item(
+            Key={'subdominio': item['subdominio']},
+            UpdateExpression='SET #status = :status, data_propagacao = :agora',
+            ConditionExpression=condicao,
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': 'PROPAGADO',
+                ':agora': datetime.utcnow().isoformat(),
+                **valores
+            }
+        )
+        return True
+    except ClientError as e:
+        # Outra atualização trocou o id_alteracao: o próximo ciclo cuida dela
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def promover_registros_pendentes(cliente_route53=None, tabela_registros=None,
+                                 prazo_segundos=240, intervalo_inicial=1,
+                                 intervalo_maximo=30, dormir=time.sleep,
+                                 relogio=time.monotonic):
+    """
+    Promove para PROPAGADO os registros cujas alterações o Route 53 já concluiu.
     
-    while tentativas < max_tentativas:
-        try:
-            resposta = dns.resolver.resolve(nome_completo, 'A')
-            for registro in resposta:
-                if str(registro) == endereco_ip:
-                    return True
-        except dns.resolver.NXDOMAIN:
-            pass
-        except dns.resolver.NoAnswer:
-            pass
-        except Exception:
-            pass
-        
-        tentativas += 1
-        time.sleep(intervalo)
+    Agrupa os registros pendentes por id_alteracao, de modo que cada alteração é
+    consultada uma única vez por rodada com get_change. Entre as rodadas aguarda
+    com backoff exponencial até intervalo_maximo, respeitando prazo_segundos.
+    Registros sem id_alteracao são verificados em uma única passada concorrente
+    nos nameservers autoritativos (propagacao_dns).
     
-    return False
+    Returns:
+        dict: quantidades de registros promovidos e ainda pendentes
+    """
+    cliente_route53 = cliente_route53 or _route53()
+    tabela_registros = tabela_registros or _tabela()
+    limite = relogio() + prazo_segundos
+
+    por_alteracao = {}
+    sem_alteracao = []
+    for item in _listar_pendentes(tabela_registros):
+        if item.get('id_alteracao'):
+            por_alteracao.setdefault(item['id_alteracao'], []).append(item)
+        else:
+            sem_alteracao.append(item)
+
+    promovidos = 0
+    if sem_alteracao:
+        from propagacao_dns import verificar_propagacao
+        nomes = {f"{item['subdominio']}.{NOME_DOMINIO}": item for item in sem_alteracao}
+        resultado = verificar_propagacao(
+            [(nome, item['endereco_ip']) for nome, item in nomes.items()],
+            _nameservers_autoritativos(),
+            porta=PORTA_DNS
+        )
+        for nome, item in nomes.items():
+            if resultado['registros'][nome]['propagado'] and _marcar_propagado(tabela_registros, item):
+                promovidos += 1
+        sem_alteracao = [item for nome, item in nomes.items() if not resultado['registros'][nome]['propagado']]
+
+    intervalo = intervalo_inicial
+    while por_alteracao:
+        for id_alteracao in list(por_alteracao):
+            if _status_alteracao(cliente_route53, id_alteracao) == 'INSYNC':
+                for item in por_alteracao.pop(id_alteracao):
+                    if _marcar_propagado(tabela_registros, item):
+                        promovidos += 1
+        if not por_alteracao or relogio() + intervalo > limite:
+            break
+        dormir(intervalo)
+        intervalo = min(intervalo * 2, intervalo_maximo)
+
+    pendentes = len(sem_alteracao) + sum(len(itens) for itens in por_alteracao.values())
+    return {'promovidos': promovidos, 'pendentes': pendentes}
+
+def verificador_handler(evento, contexto):
+    """
+    Ponto de entrada agendado (EventBridge) do verificador de propagação. No
+    stack do terraform (lambda/), a mesma promoção roda no reconciliador.
+    """
+    prazo = 240
+    if contexto is not None:
+        # Deixa uma folga para gravar os últimos status antes do timeout
+        prazo = max(contexto.get_remaining_time_in_millis() / 1000 - 10, 0)
+    return promover_registros_pendentes(prazo_segundos=prazo)
 
 def verificar_senha(senha):
     """Verifica se a senha fornecida corresponde à senha compartilhada."""
-    hash_entrada = hashlib.sha256(senha.encode()).hexdigest()
-    hash_armazenado = hashlib.sha256(SENHA_COMPARTILHADA.encode()).hexdigest()
-    return hash_entrada == hash_armazenado
+    # Comparação em tempo constante, sem recalcular hashes a cada chamada
+    return hmac.compare_digest(str(senha).encode(), _SENHA_COMPARTILHADA_BYTES)
 
 def criar_registro_dns(subdominio, endereco_ip):
     """Cria um registro A no Route 53."""
@@ -76,7 +214,7 @@ def criar_registro_dns(subdominio, endereco_ip):
             ]
         }
         
-        resposta = route53.change_resource_record_sets(
+        resposta = _route53().change_resource_record_sets(
             HostedZoneId=ID_ZONA_HOSPEDADA,
             ChangeBatch=lote_alteracoes
         )
@@ -84,51 +222,91 @@ def criar_registro_dns(subdominio, endereco_ip):
     except ClientError as e:
         raise Exception(f"Falha ao criar registro DNS: {str(e)}")
 
+# Só grava se o IP mudou: um UPSERT repetido não chega ao Route 53
+_CONDICAO_IP_ALTERADO = 'attribute_not_exists(endereco_ip) OR endereco_ip <> :ip'
+
+def _gravar_se_alterado(chamada, **kwargs):
+    """
+    Executa put_item/update_item com a condição de IP alterado.
+
+    Returns:
+        tuple: (True, item anterior ou None) se gravou; (False, item atual) se
+        o IP já era o mesmo, sem uma nova leitura
+    """
+    try:
+        resposta = chamada(
+            ConditionExpression=_CONDICAO_IP_ALTERADO,
+            ReturnValues='ALL_OLD',
+            ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            **kwargs
+        )
+        return True, resposta.get('Attributes')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # O item da falha vem no formato do cliente de baixo nível
+        from boto3.dynamodb.types import TypeDeserializer
+        desserializador = TypeDeserializer()
+        atual = e.response.get('Item') or {}
+        return False, {chave: desserializador.deserialize(valor) for chave, valor in atual.items()}
+
+def _aplicar_alteracao(item, anterior, campo_data):
+    """Aplica o UPSERT no Route 53 e guarda o id_alteracao; desfaz a gravação se falhar."""
+    condicao = {
+        'ConditionExpression': f'{campo_data} = :data',
+        'ExpressionAttributeValues': {':data': item[campo_data]}
+    }
+    try:
+        id_alteracao = criar_registro_dns(item['subdominio'], item['endereco_ip'])
+    except Exception:
+        try:
+            if anterior:
+                _tabela().put_item(Item=anterior, **condicao)
+            else:
+                _tabela().delete_item(Key={'subdominio': item['subdominio']}, **condicao)
+        except ClientError:
+            # Outra escrita alterou o registro nesse meio tempo: ela prevalece
+            pass
+        raise
+    try:
+        _tabela().update_item(
+            Key={'subdominio': item['subdominio']},
+            UpdateExpression='SET id_alteracao = :cid',
+            ConditionExpression=condicao['ConditionExpression'],
+            ExpressionAttributeValues={**condicao['ExpressionAttributeValues'], ':cid': id_alteracao}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    item['id_alteracao'] = id_alteracao
+    return item
+
 def criar_registro(subdominio, endereco_ip, senha):
     """Cria um novo registro DNS e armazena no DynamoDB."""
     if not verificar_senha(senha):
         raise Exception("Senha inválida")
     
-    # Criar registro DNS
-    id_alteracao = criar_registro_dns(subdominio, endereco_ip)
-    
-    # Armazenar no DynamoDB
+    # Armazenar no DynamoDB (só se o IP mudou)
     item = {
         'subdominio': subdominio,
         'endereco_ip': endereco_ip,
-        'id_alteracao': id_alteracao,
         'data_criacao': datetime.utcnow().isoformat(),
         'status': 'PENDENTE'
     }
+    gravou, anterior = _gravar_se_alterado(
+        _tabela().put_item, Item=item, ExpressionAttributeValues={':ip': endereco_ip}
+    )
+    if not gravou:
+        return {**anterior, 'alterado': False}
     
-    tabela.put_item(Item=item)
-    
-    # Iniciar verificação de propagação
-    propagado = verificar_propagacao_dns(subdominio, endereco_ip)
-    
-    # Atualizar status no DynamoDB
-    if propagado:
-        tabela.update_item(
-            Key={'subdominio': subdominio},
-            UpdateExpression='SET status = :status',
-            ExpressionAttributeValues={
-                ':status': 'PROPAGADO'
-            }
-        )
-    else:
-        tabela.update_item(
-            Key={'subdominio': subdominio},
-            UpdateExpression='SET status = :status',
-            ExpressionAttributeValues={
-                ':status': 'AGUARDANDO_PROPAGACAO'
-            }
-        )
-    
-    return item
+    # Criar registro DNS
+    # A propagação é verificada de forma assíncrona por verificador_handler,
+    # que promove o registro para PROPAGADO quando o Route53 conclui a alteração.
+    return _aplicar_alteracao(item, anterior, 'data_criacao')
 
 def obter_registro(subdominio):
     """Recupera um registro do DynamoDB."""
-    resposta = tabela.get_item(Key={'subdominio': subdominio})
+    resposta = _tabela().get_item(Key={'subdominio': subdominio})
     return resposta.get('Item')
 
 def atualizar_registro(subdominio, endereco_ip, senha):
@@ -136,21 +314,27 @@ def atualizar_registro(subdominio, endereco_ip, senha):
     if not verificar_senha(senha):
         raise Exception("Senha inválida")
     
-    # Atualizar registro DNS
-    id_alteracao = criar_registro_dns(subdominio, endereco_ip)
-    
-    # Atualizar DynamoDB
-    tabela.update_item(
+    # Atualizar DynamoDB (só se o IP mudou); ALL_OLD evita a leitura final
+    data_atualizacao = datetime.utcnow().isoformat()
+    gravou, anterior = _gravar_se_alterado(
+        _tabela().update_item,
         Key={'subdominio': subdominio},
-        UpdateExpression='SET endereco_ip = :ip, id_alteracao = :cid, data_atualizacao = :upd',
+        UpdateExpression='SET endereco_ip = :ip, data_atualizacao = :upd, #status = :status REMOVE id_alteracao',
+        ExpressionAttributeNames={'#status': 'status'},
         ExpressionAttributeValues={
             ':ip': endereco_ip,
-            ':cid': id_alteracao,
-            ':upd': datetime.utcnow().isoformat()
+            ':upd': data_atualizacao,
+            ':status': 'PENDENTE'
         }
     )
+    if not gravou:
+        return {**anterior, 'alterado': False}
     
-    return obter_registro(subdominio)
+    # Atualizar registro DNS
+    item = {**(anterior or {}), 'subdominio': subdominio, 'endereco_ip': endereco_ip,
+            'data_atualizacao': data_atualizacao, 'status': 'PENDENTE'}
+    item.pop('id_alteracao', None)
+    return _aplicar_alteracao(item, anterior, 'data_atualizacao')
 
 def excluir_registro(subdominio, senha):
     """Exclui um registro DNS."""
@@ -177,20 +361,20 @@ def excluir_registro(subdominio, senha):
             ]
         }
         
-        route53.change_resource_record_sets(
+        _route53().change_resource_record_sets(
             HostedZoneId=ID_ZONA_HOSPEDADA,
             ChangeBatch=lote_alteracoes
         )
         
         # Excluir do DynamoDB
-        tabela.delete_item(Key={'subdominio': subdominio})
+        _tabela().delete_item(Key={'subdominio': subdominio})
         return {'mensagem': 'Registro excluído com sucesso'}
     except ClientError as e:
         raise Exception(f"Falha ao excluir registro: {str(e)}")
 
 def listar_registros():
     """Lista todos os registros do DynamoDB."""
-    resposta = tabela.scan()
+    resposta = _tabela().scan()
     return resposta.get('Items', [])
 
 def lambda_handler(evento, contexto):
@@ -207,13 +391,16 @@ def lambda_handler(evento, contexto):
         parametros = {**parametros_query, **corpo}
         
         if metodo_http == 'POST' and caminho == '/registros':
+            registro = criar_registro(
+                parametros['subdominio'],
+                parametros['endereco_ip'],
+                parametros['senha']
+            )
+            # 202: o registro foi aceito com status PENDENTE e será promovido
+            # a PROPAGADO pelo verificador_handler; 200: o IP já era o mesmo
             return {
-                'statusCode': 200,
-                'body': json.dumps(criar_registro(
-                    parametros['subdominio'],
-                    parametros['endereco_ip'],
-                    parametros['senha']
-                ))
+                'statusCode': 200 if registro.get('alterado') is False else 202,
+                'body': json.dumps(registro)
             }
             
         elif metodo_http == 'GET' and caminho == '/registros':
@@ -0,0 +1,123 @@
+import asyncio
+import ipaddress
+import time
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+
+def _eh_ip(valor):
+    try:
+        ipaddress.ip_address(valor)
+        return True
+    except ValueError:
+        return False
+
+
+def _novo_resolver(endereco_ns, porta, timeout):
+    """Resolver sem cache que consulta apenas o nameserver informado."""
+    resolver = dns.asyncresolver.Resolver(configure=False)
+    resolver.nameservers = [endereco_ns]
+    resolver.port = porta
+    resolver.timeout = timeout
+    resolver.lifetime = timeout
+    return resolver
+
+
+async def _enderecos_dos_nameservers(nameservers, timeout):
+    """Converte os nomes dos nameservers (ex.: ns-1.awsdns-00.com) em IPs."""
+    nameservers = [ns.rstrip('.') for ns in nameservers]
+    resolver = None
+    if not all(_eh_ip(ns) for ns in nameservers):
+        resolver = dns.asyncresolver.Resolver()
+        resolver.lifetime = timeout
+
+    async def _resolver(ns):
+        if _eh_ip(ns):
+            return ns, ns
+        resposta = await resolver.resolve(ns, 'A')
+        return ns, str(resposta[0])
+
+    return dict(await asyncio.gather(*(_resolver(ns) for ns in nameservers)))
+
+
+async def _consultar(resolver, nome, ip_esperado, semaforo):
+    async with semaforo:
+        inicio = time.perf_counter()
+        try:
+            resposta = await resolver.resolve(nome, 'A', raise_on_no_answer=False)
+            ips = sorted(str(r) for r in resposta) if resposta.rrset else []
+            erro = None
+        except dns.resolver.NXDOMAIN:
+            ips, erro = [], 'NXDOMAIN'
+        except dns.exception.Timeout:
+            ips, erro = [], 'TIMEOUT'
+        except dns.exception.DNSException as e:
+            ips, erro = [], e.__class__.__name__
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+    return {
+        'ips': ips,
+        'convergiu': ip_esperado in ips,
+        'latencia_ms': round(latencia_ms, 2),
+        'erro': erro
+    }
+
+
+async def sondar_propagacao(registros, nameservers, porta=53, timeout=2.0, concorrencia=256):
+    """
+    Consulta cada nome diretamente em todos os nameservers, de forma concorrente.
+
+    Args:
+        registros: lista de (nome_completo, ip_esperado)
+        nameservers: nomes ou IPs dos nameservers autoritativos da zona
+        porta: porta DNS dos nameservers (53, ou outra para servidores locais)
+        timeout: tempo máximo de cada consulta, em segundos
+        concorrencia: número máximo de consultas em andamento
+
+    Returns:
+        dict: 'registros' com o resultado de cada nome por nameserver e
+              'nameservers' com a convergência e a latência de cada um
+    """
+    enderecos = await _enderecos_dos_nameservers(nameservers, timeout)
+    resolvers = {ns: _novo_resolver(ip, porta, timeout) for ns, ip in enderecos.items()}
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    chaves = [(nome, ns) for nome, _ in registros for ns in resolvers]
+    esperado = dict(registros)
+    respostas = await asyncio.gather(*(
+        _consultar(resolvers[ns], nome, esperado[nome], semaforo) for nome, ns in chaves
+    ))
+
+    por_registro = {nome: {'propagado': True, 'nameservers': {}} for nome, _ in registros}
+    por_ns = {ns: {'convergidos': 0, 'total': 0, 'latencias': []} for ns in resolvers}
+    for (nome, ns), resposta in zip(chaves, respostas):
+        por_registro[nome]['nameservers'][ns] = resposta
+        por_registro[nome]['propagado'] &= resposta['convergiu']
+        por_ns[ns]['total'] += 1
+        por_ns[ns]['convergidos'] += resposta['convergiu']
+        por_ns[ns]['latencias'].append(resposta['latencia_ms'])
+
+    resumo_ns = {}
+    for ns, dados in por_ns.items():
+        latencias = sorted(dados['latencias'])
+        resumo_ns[ns] = {
+            'endereco': enderecos[ns],
+            'convergidos': dados['convergidos'],
+            'total': dados['total'],
+            'latencia_media_ms': round(sum(latencias) / len(latencias), 2) if latencias else None,
+            'latencia_max_ms': latencias[-1] if latencias else None
+        }
+
+    return {'registros': por_registro, 'nameservers': resumo_ns}
+
+
+def verificar_propagacao(registros, nameservers, **kwargs):
+    """Versão síncrona de sondar_propagacao, para uso dentro do Lambda."""
+    return asyncio.run(sondar_propagacao(registros, nameservers, **kwargs))
+
+
+def nameservers_da_zona(cliente_route53, id_zona):
+    """Lista os nameservers autoritativos (conjunto NS) de uma zona do Route 53."""
+    resposta = cliente_route53.get_hosted_zone(Id=id_zona)
+    return resposta['DelegationSet']['NameServers']
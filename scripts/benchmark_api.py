@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga dos handlers da API (Lambda puro e FastAPI via Mangum) com
+eventos sintéticos do API Gateway, contra DynamoDB e Route53 do moto.
+
+Para cada backend e tamanho de tabela, roda uma fase por rota (OPTIONS,
+listar, obter, criar, deletar) e uma fase com a mistura de rotas, com N
+requisições em paralelo. Cada backend roda em um processo próprio (os dois
+módulos se chamam gerenciador_dns e o pico de RSS fica isolado). Por rota:
+ops/s, latência p50/p99, erros (status >= 500), pico de RSS e, com
+--tracemalloc, o pico de memória Python da fase; as latências de DynamoDB e
+Route53 vêm das métricas locais (lambda/metricas.py).
+
+Uso:
+  python3 scripts/benchmark_api.py --itens 100,10000 --concorrencia 8
+  python3 scripts/benchmark_api.py --salvar-baseline baseline.json
+  python3 scripts/benchmark_api.py --baseline baseline.json --tolerancia 0.2
+
+Com --baseline, termina com código 1 se alguma rota ficar mais lenta (ops/s ou
+p99) ou usar mais memória do que a baseline além da tolerância. A baseline
+depende da máquina: gere-a no mesmo ambiente em que as comparações rodam.
+
+Requer: pip install "moto[dynamodb,route53]" (e fastapi/mangum para o backend fastapi)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+
+SENHA = 'benchmark'
+DOMINIO = 'benchmark.lab.tonanuvem.com'
+NOME_TABELA = 'registros-dns-benchmark'
+
+AMBIENTE = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'DYNAMODB_TABLE': NOME_TABELA,
+    'SENHA_API': SENHA,
+    'TTL_DNS': '60',
+    'NAMESERVERS': DOMINIO,
+    'ZONA_ID': 'ZBENCHMARK',
+    # O moto não limita o Route53; o limite real de 5/s mediria só o balde de tokens
+    'ROUTE53_TAXA': '100000',
+    # Todas as requisições usam a SENHA_API; sem isso, o balde do inquilino
+    # 'compartilhado' (chaves_api) limitaria a carga
+    'LIMITE_REQUISICOES': '100000',
+    'LIMITE_ESCRITAS': '100000',
+    'METRICAS_MODO': 'local',
+    'LOG_NIVEL': 'ERRO',
+}
+
+# backend -> (diretórios no sys.path, prefixo do caminho, campo do alias no corpo)
+BACKENDS = {
+    'lambda': ([PROJECT_ROOT / 'lambda'], '/prod', 'alias'),
+    'fastapi': ([PROJECT_ROOT / 'lambda_fastapi', PROJECT_ROOT / 'lambda'], '', 'subdominio'),
+}
+
+ROTAS = ('options', 'listar', 'obter', 'criar', 'deletar')
+MIX_PADRAO = 'listar=50,obter=25,criar=10,deletar=5,options=10'
+
+# Métricas comparadas com a baseline: True se maior é melhor
+METRICAS_COMPARADAS = {'ops_s': True, 'p99_ms': False, 'rss_pico_mb': False, 'tracemalloc_pico_mb': False}
+
+
+def _ler_mix(texto):
+    pesos = {}
+    for parte in texto.split(','):
+        rota, _, peso = parte.partition('=')
+        if rota.strip() not in ROTAS:
+            raise argparse.ArgumentTypeError(f"Rota desconhecida no mix: {rota}")
+        pesos[rota.strip()] = float(peso)
+    return pesos
+
+
+def _percentil(ordenados, p):
+    indice = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+    return ordenados[int(indice)]
+
+
+# --- Trabalhador: roda em um processo por backend e tamanho de tabela ---
+
+def _evento(backend, metodo, caminho, query=None, corpo=None):
+    _, prefixo, _ = BACKENDS[backend]
+    headers = {'x-api-key': SENHA, 'host': 'localhost', 'content-type': 'application/json'}
+    if metodo == 'OPTIONS':
+        headers = {'origin': 'http://localhost:3000', 'access-control-request-method': 'GET', 'host': 'localhost'}
+    return {
+        'resource': caminho, 'path': prefixo + caminho, 'httpMethod': metodo,
+        'headers': headers, 'queryStringParameters': query, 'body': json.dumps(corpo) if corpo is not None else None,
+        'isBase64Encoded': False,
+        'requestContext': {
+            'httpMethod': metodo, 'path': prefixo + caminho, 'stage': 'prod',
+            'identity': {'sourceIp': '127.0.0.1'}, 'requestId': 'benchmark'
+        }
+    }
+
+
+class Contexto:
+    function_name = 'benchmark'
+    aws_request_id = 'benchmark'
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+class Gerador:
+    """Eventos de cada rota; as exclusões consomem aliases semeados antes da fase."""
+
+    def __init__(self, backend, itens):
+        self.backend = backend
+        self.itens = itens
+        self.campo_alias = BACKENDS[backend][2]
+        self.a_excluir = deque()
+        self.trava = threading.Lock()
+        self.sequencia = 0
+
+    def _novo_alias(self, prefixo):
+        with self.trava:
+            self.sequencia += 1
+            return f'{prefixo}{os.getpid()}x{self.sequencia}'
+
+    def evento(self, rota):
+        if rota == 'options':
+            return _evento(self.backend, 'OPTIONS', '/registros')
+        if rota == 'listar':
+            inicio = random.randrange(0, max(self.itens - 25, 1))
+            return _evento(self.backend, 'GET', '/registros', {'range': f'[{inicio},{inicio + 24}]', 'sort': '["alias","ASC"]'})
+        if rota == 'obter':
+            return _evento(self.backend, 'GET', f'/registros/aluno{random.randrange(self.itens):06d}')
+        if rota == 'criar':
+            ip = f'10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(1, 255)}'
+            return _evento(self.backend, 'POST', '/registros', corpo={self.campo_alias: self._novo_alias('criado'), 'endereco_ip': ip})
+        with self.trava:
+            alias = self.a_excluir.popleft()
+        return _evento(self.backend, 'DELETE', f'/registros/{alias}')
+
+
+def _semear(repositorio, cliente_route53, zona_id, aliases, prefixo_ip='10.200'):
+    from alteracoes_route53 import alteracao_registro_a, dividir_change_batches
+    itens = [
+        {'alias': alias, 'endereco_ip': f'{prefixo_ip}.{i // 250 % 256}.{i % 250 + 1}', 'data_criacao': '2026-01-01T00:00:00'}
+        for i, alias in enumerate(aliases)
+    ]
+    repositorio.gravar_lote(itens)
+    if cliente_route53 is not None:
+        alteracoes = [alteracao_registro_a('UPSERT', f"{i['alias']}.{DOMINIO}", i['endereco_ip'], 60) for i in itens]
+        for lote in dividir_change_batches(alteracoes):
+            cliente_route53.change_resource_record_sets(HostedZoneId=zona_id, ChangeBatch={'Changes': lote})
+
+
+def _rodar_fase(handler, gerador, rotas, concorrencia, medir_memoria):
+    import metricas
+    metricas.local.limpar()
+    if medir_memoria:
+        tracemalloc.reset_peak()
+    latencias = {rota: [] for rota in set(rotas)}
+    erros = {rota: 0 for rota in set(rotas)}
+    eventos = [(rota, gerador.evento(rota)) for rota in rotas]
+
+    def executar(rota_evento):
+        rota, evento = rota_evento
+        inicio = time.perf_counter()
+        try:
+            status = handler(evento, Contexto()).get('statusCode', 500)
+        except Exception:
+            status = 500
+        return rota, (time.perf_counter() - inicio) * 1000, status
+
+    inicio = time.perf_counter()
+    # O Mangum usa o event loop da thread atual; as threads do pool não têm um
+    with ThreadPoolExecutor(max_workers=concorrencia, initializer=lambda: asyncio.set_event_loop(asyncio.new_event_loop())) as executor:
+        for rota, duracao, status in executor.map(executar, eventos):
+            latencias[rota].append(duracao)
+            if status >= 500:
+                erros[rota] += 1
+    tempo_total = time.perf_counter() - inicio
+
+    dependencias = {}
+    for (nome, _), resumo in metricas.resumo_local().items():
+        if nome.endswith('Latencia') and nome != 'Latencia':
+            dependencias.setdefault(nome, []).append(resumo['p50'])
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    resultado = {}
+    for rota, valores in latencias.items():
+        ordenados = sorted(valores)
+        resultado[rota] = {
+            'n': len(ordenados),
+            'erros': erros[rota],
+            'ops_s': len(ordenados) / tempo_total,
+            'p50_ms': _percentil(ordenados, 50),
+            'p99_ms': _percentil(ordenados, 99),
+            'rss_pico_mb': rss_mb,
+            'dependencias_p50_ms': {nome: max(v) for nome, v in dependencias.items()},
+        }
+        if medir_memoria:
+            resultado[rota]['tracemalloc_pico_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    return resultado
+
+
+def trabalhador(config):
+    from moto import mock_aws
+
+    backend = config['backend']
+    diretorios, _, _ = BACKENDS[backend]
+    for diretorio in reversed(diretorios):
+        sys.path.insert(0, str(diretorio))
+    os.environ.update(AMBIENTE)
+    random.seed(config['semente'])
+
+    with mock_aws():
+        import boto3
+        boto3.client('dynamodb').create_table(
+            TableName=NOME_TABELA,
+            KeySchema=[{'AttributeName': 'alias', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'alias', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        route53 = boto3.client('route53')
+        zona_id = route53.create_hosted_zone(Name=DOMINIO, CallerReference='benchmark')['HostedZone']['Id'].split('/')[-1]
+        os.environ['ZONA_ID'] = zona_id
+
+        from repositorio_registros import RepositorioRegistros
+        repositorio = RepositorioRegistros(NOME_TABELA)
+        # Só o DynamoDB: listar e obter não consultam o Route53
+        _semear(repositorio, None, zona_id, [f'aluno{i:06d}' for i in range(config['itens'])])
+
+        inicio = time.perf_counter()
+        modulo = __import__('gerenciador_dns')
+        handler = modulo.lambda_handler
+        importacao_ms = (time.perf_counter() - inicio) * 1000
+        if config['tracemalloc']:
+            tracemalloc.start()
+
+        gerador = Gerador(backend, config['itens'])
+        requisicoes = config['requisicoes']
+        fases = {rota: [rota] * requisicoes for rota in ROTAS}
+        pesos = config['mix']
+        fases['mix'] = random.choices(list(pesos), weights=list(pesos.values()), k=requisicoes)
+
+        resultados = {'importacao_ms': importacao_ms, 'rotas': {}}
+        for fase, rotas in fases.items():
+            exclusoes = rotas.count('deletar')
+            if exclusoes:
+                aliases = [gerador._novo_alias('apagar') for _ in range(exclusoes)]
+                _semear(repositorio, route53, zona_id, aliases, prefixo_ip='10.201')
+                gerador.a_excluir.extend(aliases)
+            medidas = _rodar_fase(handler, gerador, rotas, config['concorrencia'], config['tracemalloc'])
+            for rota, medida in medidas.items():
+                resultados['rotas'][rota if fase != 'mix' else f'mix:{rota}'] = medida
+    return resultados
+
+
+# --- Coordenação, relatório e comparação com a baseline ---
+
+def _executar_trabalhador(config):
+    resultado = subprocess.run(
+        [sys.executable, __file__, '--trabalhador', json.dumps(config)],
+        capture_output=True, text=True, cwd=PROJECT_ROOT
+    )
+    linhas = resultado.stdout.strip().splitlines()
+    if resultado.returncode != 0 or not linhas:
+        erro = (resultado.stderr.strip().splitlines() or ['sem saída'])[-1]
+        raise RuntimeError(f"{config['backend']} com {config['itens']} itens: {erro}")
+    return json.loads(linhas[-1])
+
+
+def comparar_com_baseline(atual, baseline, tolerancia, folga_ms):
+    """Lista de regressões: (chave, métrica, valor da baseline, valor atual)."""
+    regressoes = []
+    for chave, medidas in atual.items():
+        base = baseline.get(chave)
+        if base is None:
+            continue
+        for metrica, maior_melhor in METRICAS_COMPARADAS.items():
+            if metrica not in medidas or metrica not in base:
+                continue
+            antes, agora = base[metrica], medidas[metrica]
+            if maior_melhor:
+                piorou = agora < antes * (1 - tolerancia)
+            else:
+                # A folga absoluta evita falsos alarmes em latências de fração de ms
+                piorou = agora > antes * (1 + tolerancia) + (folga_ms if metrica.endswith('_ms') else 0)
+            if piorou:
+                regressoes.append((chave, metrica, antes, agora))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos handlers da API")
+    parser.add_argument('--trabalhador', help=argparse.SUPPRESS)
+    parser.add_argument('--backends', default='lambda,fastapi', help="lambda, fastapi ou ambos (separados por vírgula)")
+    parser.add_argument('--itens', default='100,10000', help="Tamanhos de tabela, ex.: 100,1000,100000")
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=200, help="Requisições por fase")
+    parser.add_argument('--mix', type=_ler_mix, default=_ler_mix(MIX_PADRAO), help=f"Pesos da fase mista (padrão {MIX_PADRAO})")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--tracemalloc', action='store_true', help="Mede o pico de memória Python por fase (mais lento)")
+    parser.add_argument('--json', help="Grava o resultado completo neste arquivo")
+    parser.add_argument('--salvar-baseline', help="Grava o resultado como baseline")
+    parser.add_argument('--baseline', help="Compara com esta baseline e falha se houver regressão")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Piora relativa aceita (0.2 = 20%%)")
+    parser.add_argument('--folga-ms', type=float, default=1.0, help="Piora absoluta aceita nas latências")
+    args = parser.parse_args()
+
+    if args.trabalhador:
+        print(json.dumps(trabalhador(json.loads(args.trabalhador))))
+        return 0
+
+    try:
+        import moto  # noqa: F401
+    except ImportError:
+        print('Este benchmark requer o moto: pip install "moto[dynamodb,route53]"', file=sys.stderr)
+        return 1
+
+    atual = {}
+    print(f"{'backend/itens/rota':<34}{'n':>6}{'erros':>6}{'ops/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}")
+    for backend in args.backends.split(','):
+        if backend not in BACKENDS:
+            parser.error(f"Backend desconhecido: {backend}")
+        for itens in (int(n) for n in args.itens.split(',')):
+            config = {
+                'backend': backend, 'itens': itens, 'concorrencia': args.concorrencia,
+                'requisicoes': args.requisicoes, 'mix': args.mix, 'semente': args.semente,
+                'tracemalloc': args.tracemalloc
+            }
+            try:
+                resultado = _executar_trabalhador(config)
+            except RuntimeError as e:
+                print(f"erro: {e}", file=sys.stderr)
+                return 1
+            for rota, medida in resultado['rotas'].items():
+                chave = f'{backend}/{itens}/{rota}'
+                atual[chave] = medida
+                print(f"{chave:<34}{medida['n']:>6}{medida['erros']:>6}{medida['ops_s']:>10.0f}"
+                      f"{medida['p50_ms']:>9.2f}{medida['p99_ms']:>9.2f}{medida['rss_pico_mb']:>9.0f}")
+
+    for destino in (args.json, args.salvar_baseline):
+        if destino:
+            with open(destino, 'w') as arquivo:
+                json.dump(atual, arquivo, indent=2, sort_keys=True)
+
+    falhas = sum(medida['erros'] for medida in atual.values())
+    if falhas:
+        print(f"{falhas} requisições com status >= 500", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar_com_baseline(atual, baseline, args.tolerancia, args.folga_ms)
+        for chave, metrica, antes, agora in regressoes:
+            print(f"REGRESSÃO {chave} {metrica}: {antes:.2f} -> {agora:.2f}", file=sys.stderr)
+        if regressoes:
+            return 1
+        print(f"Sem regressões em relação a {args.baseline} (tolerância {args.tolerancia:.0%})")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
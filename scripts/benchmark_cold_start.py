@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Mede o cold start de cada handler: tempo de importação do módulo e tempo até a
+primeira resposta a um preflight OPTIONS, sempre em um interpretador novo.
+
+Uso: python3 scripts/benchmark_cold_start.py [--repeticoes N] [--limite-ms MS]
+
+Com --limite-ms, termina com código 1 se a mediana de importação de algum
+handler passar do limite (para detectar regressões no grafo de imports).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+
+# Variáveis fictícias: nenhum handler deve falar com a AWS para responder OPTIONS
+AMBIENTE = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'DYNAMODB_TABLE': 'registros-dns-benchmark',
+    'TABELA_DYNAMODB': 'registros-dns-benchmark',
+    'SENHA_API': 'benchmark',
+    'SENHA_COMPARTILHADA': 'benchmark',
+    'TTL_DNS': '60',
+    'NAMESERVERS': 'benchmark.lab.tonanuvem.com',
+    'NOME_DOMINIO': 'benchmark.lab.tonanuvem.com',
+    'ZONA_ID': 'ZBENCHMARK',
+    'ID_ZONA_HOSPEDADA': 'ZBENCHMARK',
+}
+
+# nome -> (diretórios no sys.path, módulo, evento OPTIONS)
+HANDLERS = {
+    'lambda': (
+        [PROJECT_ROOT / 'lambda'],
+        'gerenciador_dns',
+        {'httpMethod': 'OPTIONS', 'path': '/prod/registros', 'headers': {}}
+    ),
+    'lambda_fastapi': (
+        [PROJECT_ROOT / 'lambda_fastapi', PROJECT_ROOT / 'lambda'],
+        'gerenciador_dns',
+        {
+            'version': '1.0', 'resource': '/registros', 'path': '/registros',
+            'httpMethod': 'OPTIONS', 'queryStringParameters': None, 'body': None,
+            'isBase64Encoded': False,
+            'headers': {
+                'origin': 'http://localhost:3000',
+                'access-control-request-method': 'GET',
+                'host': 'localhost'
+            },
+            'requestContext': {
+                'httpMethod': 'OPTIONS', 'path': '/registros', 'stage': 'prod',
+                'identity': {'sourceIp': '127.0.0.1'}, 'requestId': 'benchmark'
+            }
+        }
+    ),
+    'raiz': (
+        [PROJECT_ROOT],
+        'lambda_function',
+        None
+    ),
+}
+
+CODIGO_MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+modulo = __import__(sys.argv[1])
+importado = time.perf_counter()
+evento = json.loads(sys.argv[2])
+primeira_resposta = None
+if evento is not None:
+    class Contexto:
+        function_name = 'benchmark'
+        aws_request_id = 'benchmark'
+        def get_remaining_time_in_millis(self):
+            return 30000
+    modulo.lambda_handler(evento, Contexto())
+    primeira_resposta = (time.perf_counter() - inicio) * 1000
+print(json.dumps({
+    'importacao_ms': (importado - inicio) * 1000,
+    'primeira_resposta_ms': primeira_resposta,
+    'boto3_importado': 'boto3' in sys.modules,
+    'dns_importado': 'dns.resolver' in sys.modules
+}))
+"""
+
+
+def medir(diretorios, modulo, evento):
+    ambiente = {**os.environ, **AMBIENTE, 'PYTHONPATH': os.pathsep.join(str(d) for d in diretorios)}
+    resultado = subprocess.run(
+        [sys.executable, '-c', CODIGO_MEDICAO, modulo, json.dumps(evento)],
+        capture_output=True, text=True, env=ambiente, cwd=diretorios[0]
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cold start dos handlers")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--limite-ms', type=float, default=None,
+                        help="Falha se a mediana de importação de um handler passar deste valor")
+    args = parser.parse_args()
+
+    regressao = False
+    print(f"{'handler':<16}{'import (ms)':>14}{'1a resposta (ms)':>19}  boto3  dns")
+    for nome, (diretorios, modulo, evento) in HANDLERS.items():
+        try:
+            medidas = [medir(diretorios, modulo, evento) for _ in range(args.repeticoes)]
+        except RuntimeError as e:
+            print(f"{nome:<16}erro: {e}")
+            regressao = True
+            continue
+
+        importacao = statistics.median(m['importacao_ms'] for m in medidas)
+        respostas = [m['primeira_resposta_ms'] for m in medidas if m['primeira_resposta_ms'] is not None]
+        resposta = f"{statistics.median(respostas):.1f}" if respostas else '-'
+        print(f"{nome:<16}{importacao:>14.1f}{resposta:>19}  "
+              f"{'sim' if medidas[0]['boto3_importado'] else 'não':<5}  "
+              f"{'sim' if medidas[0]['dns_importado'] else 'não'}")
+
+        if args.limite_ms is not None and importacao > args.limite_ms:
+            regressao = True
+
+    return 1 if regressao else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da camada de acesso ao DynamoDB, contra uma tabela local do moto.
+
+Compara a listagem pelo recurso do boto3 (Decimal + json.dumps com default)
+com o repositorio_registros (cliente de baixo nível, ProjectionExpression e
+conversão direta para dicts), com 1 e mais segmentos de scan.
+
+Uso: python3 scripts/benchmark_dynamodb.py [--itens 20000] [--segmentos 4] [--repeticoes 3]
+Requer: pip install "moto[dynamodb]"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+NOME_TABELA = 'registros-dns-benchmark'
+
+
+def _criar_tabela(qtd):
+    import boto3
+    recurso = boto3.resource('dynamodb')
+    tabela = recurso.create_table(
+        TableName=NOME_TABELA,
+        KeySchema=[{'AttributeName': 'alias', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'alias', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    with tabela.batch_writer() as lote:
+        for i in range(qtd):
+            lote.put_item(Item={
+                'alias': f'aluno{i:06d}',
+                'endereco_ip': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+                'data_criacao': '2026-01-01T00:00:00',
+                # Atributos que a listagem não precisa, como em itens reais
+                'id_alteracao': f'/change/C{i:012d}',
+                'ttl': 60,
+                'tentativas': 3
+            })
+    return tabela
+
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        qtd = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), qtd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do acesso ao DynamoDB")
+    parser.add_argument('--itens', type=int, default=20000)
+    parser.add_argument('--segmentos', type=int, default=4)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        from moto import mock_aws
+    except ImportError:
+        print('Este benchmark requer o moto: pip install "moto[dynamodb]"', file=sys.stderr)
+        return 1
+
+    from repositorio_registros import CAMPOS_LISTAGEM, RepositorioRegistros
+
+    with mock_aws():
+        tabela = _criar_tabela(args.itens)
+        repositorio = RepositorioRegistros(NOME_TABELA)
+
+        def recurso_boto3():
+            itens, kwargs = [], {}
+            while True:
+                resposta = tabela.scan(**kwargs)
+                itens.extend(resposta['Items'])
+                if 'LastEvaluatedKey' not in resposta:
+                    break
+                kwargs['ExclusiveStartKey'] = resposta['LastEvaluatedKey']
+            json.dumps(itens, ensure_ascii=False, default=str)
+            return len(itens)
+
+        def repositorio_com(segmentos):
+            def _executar():
+                itens = list(repositorio.varrer(campos=CAMPOS_LISTAGEM, segmentos=segmentos))
+                json.dumps(itens, ensure_ascii=False)
+                return len(itens)
+            return _executar
+
+        casos = [
+            ('boto3.resource (todos os atributos)', recurso_boto3),
+            ('repositorio, 1 segmento', repositorio_com(1)),
+            (f'repositorio, {args.segmentos} segmentos', repositorio_com(args.segmentos)),
+        ]
+        print(f"{args.itens} itens, mediana de {args.repeticoes} execuções (scan + json.dumps)")
+        for nome, funcao in casos:
+            tempo_ms, qtd = _cronometrar(funcao, args.repeticoes)
+            print(f"  {nome:<40}{tempo_ms:>10.1f} ms  ({qtd} itens)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
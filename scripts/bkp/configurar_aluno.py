@@ -1,155 +1,239 @@
 #!/usr/bin/env python3
+"""
+Gera os arquivos de configuração (terraform.tfvars e .env) de um aluno ou de
+uma turma inteira.
+
+Uso:
+  configurar_aluno.py <nome_aluno> <senha>
+      configura este diretório do projeto para um aluno
+
+  configurar_aluno.py --lote turma.csv [--saida alunos] [--trabalhadores 16]
+      uma linha "nome_aluno,senha" por aluno; cada aluno recebe o seu
+      diretório em <saida>/<nome_aluno>/ e as falhas são listadas no final
+      (e em <saida>/relatorio.json)
+
+Os IDs das zonas são resolvidos no próprio processo (scripts/dns_list_zonas.py),
+com uma única listagem do Route 53 para a turma toda.
+"""
 
 import os
 import sys
 import json
-import shutil
-import subprocess
+import argparse
+import string
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Obter o diretório raiz do projeto (um nível acima do diretório scripts)
-PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+# Obter o diretório raiz do projeto (dois níveis acima de scripts/bkp)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
-def validar_entrada(nome_aluno, senha):
-    """Valida os parâmetros de entrada"""
+sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+import dns_list_zonas
+
+DOMINIO_BASE = 'lab.tonanuvem.com'
+
+def erro_entrada(nome_aluno, senha):
+    """Devolve a mensagem de erro dos parâmetros de entrada, ou None"""
     if not nome_aluno or not senha:
-        print("Erro: nome_aluno e senha são obrigatórios")
-        sys.exit(1)
-    
+        return "nome_aluno e senha são obrigatórios"
     if not nome_aluno.isalnum():
-        print("Erro: nome_aluno deve conter apenas letras e números")
-        sys.exit(1)
-    
+        return "nome_aluno deve conter apenas letras e números"
     if len(senha) < 8:
-        print("Erro: senha deve ter pelo menos 8 caracteres")
+        return "senha deve ter pelo menos 8 caracteres"
+    return None
+
+def validar_entrada(nome_aluno, senha):
+    """Valida os parâmetros de entrada"""
+    erro = erro_entrada(nome_aluno, senha)
+    if erro:
+        print(f"Erro: {erro}")
         sys.exit(1)
 
+def nome_zona(nome_aluno):
+    return f'{nome_aluno}.{DOMINIO_BASE}'
+
 def obter_zone_id(nome_aluno):
     """Obtém o ID da zona DNS do aluno"""
-    try:
-        # Executar script para obter zone_id
-        resultado = subprocess.run(
-            ['python3', str(PROJECT_ROOT / 'scripts' / 'dns_list_zonas.py'), f'{nome_aluno}.lab.tonanuvem.com'],
-            capture_output=True,
-            text=True,
-            cwd=PROJECT_ROOT
-        )
-        
-        if resultado.returncode == 0:
-            return resultado.stdout.strip()
-        else:
-            print(f"Erro ao obter zone_id: {resultado.stderr}")
-            return None
-    except Exception as e:
-        print(f"Erro ao executar script de DNS: {str(e)}")
-        return None
+    return dns_list_zonas.obter_zone_id(nome_zona(nome_aluno))
 
-def configurar_terraform(nome_aluno, senha):
-    """Configura as variáveis do Terraform"""
+def ler_modelo_tfvars():
     # Caminho para o arquivo de exemplo
     tf_vars_example = PROJECT_ROOT / "terraform" / "terraform.tfvars.example"
-    tf_vars = PROJECT_ROOT / "terraform" / "terraform.tfvars"
-    
     if not tf_vars_example.exists():
-        print(f"Erro: Arquivo {tf_vars_example} não encontrado")
-        sys.exit(1)
-    
-    # Obter zone_id
-    zone_id = obter_zone_id(nome_aluno)
-    if not zone_id:
-        print("Erro: Não foi possível obter o ID da zona DNS")
-        sys.exit(1)
-    
-    # Ler o arquivo de exemplo
-    with open(tf_vars_example, 'r') as f:
-        conteudo = f.read()
-    
-    # Substituir as variáveis
-    conteudo = conteudo.replace('nome_aluno = "joao"', f'nome_aluno = "{nome_aluno}"')
-    conteudo = conteudo.replace('senha_compartilhada = "sua_senha_segura_aqui"', f'senha_compartilhada = "{senha}"')
-    conteudo = conteudo.replace('Aluno       = "joao"', f'Aluno       = "{nome_aluno}"')
+        raise FileNotFoundError(f"Arquivo {tf_vars_example} não encontrado")
+    return tf_vars_example.read_text()
+
+def _gravar(arquivo, conteudo):
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    arquivo.write_text(conteudo)
+    return arquivo
+
+def configurar_terraform(nome_aluno, senha, zone_id, modelo, destino=PROJECT_ROOT):
+    """Configura as variáveis do Terraform"""
+    # Substituir as variáveis do modelo (${NOME_ALUNO}, ${SENHA_COMPARTILHADA})
+    conteudo = string.Template(modelo).safe_substitute(NOME_ALUNO=nome_aluno, SENHA_COMPARTILHADA=senha)
     conteudo = conteudo.replace('id_zona_hospedada = ""', f'id_zona_hospedada = "{zone_id}"')
-    
-    # Salvar o novo arquivo
-    with open(tf_vars, 'w') as f:
-        f.write(conteudo)
-    
-    print(f"✓ Arquivo {tf_vars} configurado com sucesso")
-    print(f"✓ Zone ID: {zone_id}")
+    return _gravar(destino / "terraform" / "terraform.tfvars", conteudo)
 
-def configurar_frontend(nome_aluno):
+def configurar_frontend(nome_aluno, destino=PROJECT_ROOT):
     """Configura as variáveis do frontend"""
-    # Criar arquivo .env para o frontend
-    env_file = PROJECT_ROOT / "frontend" / ".env"
-    
-    conteudo = f"""REACT_APP_API_URL=https://api.{nome_aluno}.lab.tonanuvem.com
+    conteudo = f"""REACT_APP_API_URL=https://api.{nome_aluno}.{DOMINIO_BASE}
 REACT_APP_TITLE=Gerenciador DNS - {nome_aluno}
 """
-    
-    with open(env_file, 'w') as f:
-        f.write(conteudo)
-    
-    print(f"✓ Arquivo {env_file} configurado com sucesso")
+    return _gravar(destino / "frontend" / ".env", conteudo)
 
-def configurar_lambda(nome_aluno, senha):
+def configurar_lambda(nome_aluno, senha, destino=PROJECT_ROOT):
     """Configura as variáveis da Lambda"""
-    # Criar arquivo .env para a Lambda
-    env_file = PROJECT_ROOT / "lambda" / ".env"
-    
     conteudo = f"""DYNAMODB_TABLE=registros-dns-{nome_aluno}
 SENHA_API={senha}
 TTL_DNS=60
 """
-    
-    with open(env_file, 'w') as f:
-        f.write(conteudo)
-    
-    print(f"✓ Arquivo {env_file} configurado com sucesso")
+    return _gravar(destino / "lambda" / ".env", conteudo)
 
-def criar_arquivo_env(nome_aluno, senha):
+def criar_arquivo_env(nome_aluno, senha, destino=PROJECT_ROOT):
     """Cria arquivo .env na raiz do projeto"""
-    env_file = PROJECT_ROOT / ".env"
-    
     conteudo = f"""NOME_ALUNO={nome_aluno}
 SENHA_API={senha}
-DOMINIO_BASE=lab.tonanuvem.com
+DOMINIO_BASE={DOMINIO_BASE}
 TTL_DNS=60
 """
-    
-    with open(env_file, 'w') as f:
-        f.write(conteudo)
-    
-    print(f"✓ Arquivo {env_file} configurado com sucesso")
+    return _gravar(destino / ".env", conteudo)
+
+def configurar_todos(nome_aluno, senha, zone_id, modelo, destino=PROJECT_ROOT):
+    """Gera todos os arquivos do aluno; devolve os caminhos gravados"""
+    return [
+        configurar_terraform(nome_aluno, senha, zone_id, modelo, destino),
+        configurar_frontend(nome_aluno, destino),
+        configurar_lambda(nome_aluno, senha, destino),
+        criar_arquivo_env(nome_aluno, senha, destino),
+    ]
+
+# --- Modo em lote ---
+
+def ler_turma(caminho):
+    """[(linha, nome_aluno, senha)] de um arquivo "nome_aluno,senha" (# inicia comentário)"""
+    alunos = []
+    with open(caminho) as arquivo:
+        for numero, linha in enumerate(arquivo, 1):
+            linha = linha.strip()
+            if not linha or linha.startswith('#'):
+                continue
+            nome_aluno, _, senha = linha.partition(',')
+            alunos.append((numero, nome_aluno.strip(), senha.strip()))
+    return alunos
+
+def configurar_turma(alunos, saida, trabalhadores):
+    """
+    Valida a turma, resolve as zonas de uma vez e grava os arquivos de cada
+    aluno em paralelo. Devolve {nome_aluno: {'status': 'ok'|'erro', ...}}.
+    """
+    resultados = {}
+    validos = []
+    for numero, nome_aluno, senha in alunos:
+        erro = erro_entrada(nome_aluno, senha)
+        if not erro and nome_aluno in resultados:
+            erro = "aluno repetido na turma"
+        if erro:
+            chave = nome_aluno if nome_aluno and nome_aluno not in resultados else f"{nome_aluno or '?'} (linha {numero})"
+            resultados[chave] = {'status': 'erro', 'linha': numero, 'erro': erro}
+        else:
+            resultados[nome_aluno] = None
+            validos.append((nome_aluno, senha))
+
+    if not validos:
+        return resultados
+
+    # Uma listagem do Route 53 (ou o cache local) para a turma toda
+    zonas = dns_list_zonas.resolver_zonas([nome_zona(nome_aluno) for nome_aluno, _ in validos])
+    if zonas is None:
+        raise RuntimeError("Não foi possível listar as zonas do Route 53")
+    modelo = ler_modelo_tfvars()
+
+    def _configurar(aluno):
+        nome_aluno, senha = aluno
+        zone_id = zonas.get(nome_zona(nome_aluno))
+        if not zone_id:
+            return nome_aluno, {'status': 'erro', 'erro': f"Zona {nome_zona(nome_aluno)} não encontrada"}
+        try:
+            arquivos = configurar_todos(nome_aluno, senha, zone_id, modelo, saida / nome_aluno)
+        except Exception as e:
+            return nome_aluno, {'status': 'erro', 'zone_id': zone_id, 'erro': str(e)}
+        return nome_aluno, {'status': 'ok', 'zone_id': zone_id, 'arquivos': [str(a) for a in arquivos]}
+
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        for nome_aluno, resultado in executor.map(_configurar, validos):
+            resultados[nome_aluno] = resultado
+    return resultados
+
+def main_lote(args):
+    saida = Path(args.saida).resolve()
+    alunos = ler_turma(args.lote)
+    print(f"\nConfigurando {len(alunos)} alunos em {saida}")
+    print("=" * 50)
+
+    resultados = configurar_turma(alunos, saida, args.trabalhadores)
+
+    falhas = {nome: r for nome, r in resultados.items() if r['status'] != 'ok'}
+    _gravar(saida / "relatorio.json", json.dumps(resultados, indent=2, ensure_ascii=False))
+    print(f"✓ {len(resultados) - len(falhas)} alunos configurados")
+    if falhas:
+        print(f"✗ {len(falhas)} falhas:")
+        for nome, resultado in falhas.items():
+            print(f"  - {nome}: {resultado['erro']}")
+    print(f"\nRelatório: {saida / 'relatorio.json'}")
+    return 1 if falhas else 0
 
 def main():
+    parser = argparse.ArgumentParser(description="Gera a configuração de um aluno ou de uma turma")
+    parser.add_argument('nome_aluno', nargs='?')
+    parser.add_argument('senha', nargs='?')
+    parser.add_argument('--lote', help="Arquivo da turma, uma linha 'nome_aluno,senha' por aluno")
+    parser.add_argument('--saida', default=str(PROJECT_ROOT / 'alunos'), help="Diretório com um subdiretório por aluno (modo em lote)")
+    parser.add_argument('--trabalhadores', type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    args = parser.parse_args()
+
+    if args.lote:
+        sys.exit(main_lote(args))
+
     # Verificar argumentos
-    if len(sys.argv) != 3:
+    if not args.nome_aluno or not args.senha:
         print("Uso: python configurar_aluno.py <nome_aluno> <senha>")
+        print("     python configurar_aluno.py --lote turma.csv [--saida DIR]")
         sys.exit(1)
-    
-    nome_aluno = sys.argv[1]
-    senha = sys.argv[2]
-    
+
+    nome_aluno = args.nome_aluno
+    senha = args.senha
+
     # Validar entrada
     validar_entrada(nome_aluno, senha)
-    
+
     print(f"\nConfigurando ambiente para o aluno: {nome_aluno}")
     print("=" * 50)
-    
+
+    # Obter zone_id
+    zone_id = obter_zone_id(nome_aluno)
+    if not zone_id:
+        print("Erro: Não foi possível obter o ID da zona DNS")
+        sys.exit(1)
+
     # Configurar cada componente
-    configurar_terraform(nome_aluno, senha)
-    configurar_frontend(nome_aluno)
-    configurar_lambda(nome_aluno, senha)
-    criar_arquivo_env(nome_aluno, senha)
-    
+    try:
+        arquivos = configurar_todos(nome_aluno, senha, zone_id, ler_modelo_tfvars())
+    except FileNotFoundError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    for arquivo in arquivos:
+        print(f"✓ Arquivo {arquivo} configurado com sucesso")
+    print(f"✓ Zone ID: {zone_id}")
+
     print("\nConfiguração concluída com sucesso!")
     print("\nPróximos passos:")
     print("1. Execute 'cd terraform && terraform init'")
     print("2. Execute 'cd terraform && terraform plan'")
     print("3. Execute 'cd terraform && ../scripts/deploy.sh'")
     print("\nApós o deploy, você poderá acessar:")
-    print(f"- Frontend: https://{nome_aluno}.lab.tonanuvem.com")
-    print(f"- API: https://api.{nome_aluno}.lab.tonanuvem.com")
+    print(f"- Frontend: https://{nome_aluno}.{DOMINIO_BASE}")
+    print(f"- API: https://api.{nome_aluno}.{DOMINIO_BASE}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Cria, lista e revoga as chaves de API por inquilino (ver lambda/chaves_api.py).
+
+Uso:
+  python3 scripts/chaves_api.py criar aluno1                  # imprime a chave nova
+  python3 scripts/chaves_api.py criar aluno1 --escritas 5     # com limite próprio
+  python3 scripts/chaves_api.py listar
+  python3 scripts/chaves_api.py revogar aluno1                # todas as chaves do aluno
+
+A chave só aparece na criação: a tabela guarda apenas o SHA-256. A revogação
+vale em até CHAVES_CACHE_TTL segundos (60 por padrão) nos contêineres quentes.
+A tabela padrão vem de $CHAVES_TABLE (saída chaves_api_table_name do Terraform).
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+
+import chaves_api
+from repositorio_registros import RepositorioRegistros
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administra as chaves de API por inquilino")
+    parser.add_argument('--tabela', default=os.environ.get('CHAVES_TABLE'))
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    criar = comandos.add_parser('criar', help="Cria uma chave para o inquilino")
+    criar.add_argument('inquilino')
+    criar.add_argument('--requisicoes', type=float, help="Requisições por segundo (padrão: LIMITE_REQUISICOES do Lambda)")
+    criar.add_argument('--escritas', type=float, help="Escritas por segundo (padrão: LIMITE_ESCRITAS do Lambda)")
+    comandos.add_parser('listar', help="Lista as chaves (sem o valor, que não é guardado)")
+    revogar = comandos.add_parser('revogar', help="Revoga todas as chaves do inquilino")
+    revogar.add_argument('inquilino')
+    args = parser.parse_args()
+
+    if not args.tabela:
+        parser.error("informe --tabela (ou a variável de ambiente CHAVES_TABLE)")
+    for nome in ('requisicoes', 'escritas'):
+        valor = getattr(args, nome, None)
+        if valor is not None and valor <= 0:
+            parser.error(f"--{nome} deve ser maior que zero")
+    repositorio = RepositorioRegistros(args.tabela, chave='hash_chave')
+
+    if args.comando == 'criar':
+        chave = chaves_api.criar(repositorio, args.inquilino, args.requisicoes, args.escritas)
+        print(chave)
+        print("Guarde a chave agora: ela não pode ser recuperada depois.", file=sys.stderr)
+        return 0
+
+    if args.comando == 'listar':
+        for item in sorted(repositorio.varrer(), key=lambda i: (i.get('inquilino', ''), i.get('criada_em', ''))):
+            situacao = 'ativa' if item.get('ativa') is not False else 'revogada'
+            limites = f"{item.get('requisicoes_por_segundo', 'padrão')} req/s, {item.get('escritas_por_segundo', 'padrão')} escritas/s"
+            print(f"{item.get('inquilino')}\t{item['hash_chave'][:12]}…\t{situacao}\t{limites}\t{item.get('criada_em', '')}")
+        return 0
+
+    revogadas = chaves_api.revogar(repositorio, args.inquilino)
+    print(f"{revogadas} chaves revogadas para {args.inquilino}")
+    return 0 if revogadas else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
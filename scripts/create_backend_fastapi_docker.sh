@@ -65,6 +65,19 @@ mkdir -p "$BASE_DIR/$ZIP_OUTPUT_MODULE_DIR"
 print_message "Copiando o código da aplicação para o diretório de build..." "$YELLOW"
 cp "$FULL_LAMBDA_APP_PATH/gerenciador_dns.py" "$FULL_BUILD_PATH/"
 cp "$FULL_LAMBDA_APP_PATH/app.py" "$FULL_BUILD_PATH/"
+# Módulos compartilhados com o Lambda em lambda/
+cp "$BASE_DIR/lambda/clientes_aws.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/repositorio_registros.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/alteracoes_route53.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/escritor_route53.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/etag_http.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/outbox.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/log_estruturado.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/metricas.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/expiracao.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/foto_registros.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/chaves_api.py" "$FULL_BUILD_PATH/"
+cp "$BASE_DIR/lambda/eventos_registros.py" "$FULL_BUILD_PATH/"
 cp "$FULL_LAMBDA_APP_PATH/requirements.txt" "$FULL_BUILD_PATH/"
 check_status "Código da aplicação copiado." "Erro ao copiar código da aplicação."
 
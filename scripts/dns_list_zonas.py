@@ -1,60 +1,218 @@
 #!/usr/bin/env python3
+"""
+Zonas hospedadas do Route 53, com índice nome -> id em cache local.
 
-import boto3
+Uso:
+  dns_list_zonas.py                      lista todas as zonas (JSON)
+  dns_list_zonas.py aluno1.lab.tonanuvem.com
+                                         imprime só o ID da zona
+  dns_list_zonas.py nome1 nome2 ...      modo em lote: uma linha "nome<TAB>id"
+  dns_list_zonas.py --arquivo nomes.txt  modo em lote com um nome por linha
+                                         ('-' lê da entrada padrão)
+
+A listagem usa list_hosted_zones_by_name seguindo todas as páginas (o Route 53
+devolve no máximo 100 zonas por chamada) e grava o índice em
+DNS_ZONAS_CACHE (padrão ~/.cache/dns_zonas.json) por DNS_ZONAS_CACHE_TTL
+segundos (padrão 300). Um nome fora do índice é conferido com uma única
+chamada, a partir dele, antes de ser dado como inexistente.
+"""
+
+import argparse
 import json
+import os
 import sys
+import tempfile
+import time
 from pathlib import Path
 
-def listar_zonas():
+import boto3
+from botocore.config import Config
+
+ARQUIVO_CACHE = Path(os.environ.get('DNS_ZONAS_CACHE', Path.home() / '.cache' / 'dns_zonas.json'))
+TTL_CACHE = float(os.environ.get('DNS_ZONAS_CACHE_TTL', '300'))
+
+# O Route 53 limita as chamadas de leitura a 5 por segundo por conta; o modo
+# standard do botocore espera e repete quando a conta está no limite
+_CONFIG = Config(retries={'mode': 'standard', 'max_attempts': 10})
+
+_cliente = None
+
+
+def _route53():
+    global _cliente
+    if _cliente is None:
+        _cliente = boto3.client('route53', config=_CONFIG)
+    return _cliente
+
+
+def normalizar(nome):
+    return nome.strip().rstrip('.').lower()
+
+
+def _zona(zona):
+    return {
+        'id': zona['Id'].split('/')[-1],
+        'nome': zona['Name'],
+        'comentario': zona.get('Config', {}).get('Comment', ''),
+        'privada': zona.get('Config', {}).get('PrivateZone', False)
+    }
+
+
+def _listar_do_route53():
+    """Todas as zonas, em ordem de nome, seguindo NextDNSName/NextHostedZoneId."""
+    zonas, kwargs = [], {}
+    while True:
+        resposta = _route53().list_hosted_zones_by_name(**kwargs)
+        zonas.extend(_zona(zona) for zona in resposta['HostedZones'])
+        if not resposta.get('IsTruncated'):
+            return zonas
+        kwargs = {'DNSName': resposta['NextDNSName'], 'HostedZoneId': resposta['NextHostedZoneId']}
+
+
+def _buscar_no_route53(nome):
+    """Uma chamada só: a listagem por nome começa na própria zona, se ela existir."""
+    resposta = _route53().list_hosted_zones_by_name(DNSName=nome, MaxItems='10')
+    return [_zona(zona) for zona in resposta['HostedZones'] if normalizar(zona['Name']) == normalizar(nome)]
+
+
+def _indexar(zonas):
+    # Com zonas pública e privada de mesmo nome, vale a pública
+    indice = {}
+    for zona in sorted(zonas, key=lambda z: not z['privada']):
+        indice[normalizar(zona['nome'])] = zona['id']
+    return indice
+
+
+def _ler_cache():
+    try:
+        cache = json.loads(ARQUIVO_CACHE.read_text())
+    except (OSError, ValueError):
+        return None
+    if time.time() - cache.get('gerado_em', 0) > TTL_CACHE:
+        return None
+    return cache
+
+
+def _gravar_cache(zonas):
+    # Arquivo temporário + rename: execuções em paralelo nunca leem um JSON pela metade
+    try:
+        ARQUIVO_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=ARQUIVO_CACHE.parent, delete=False, suffix='.tmp') as arquivo:
+            json.dump({'gerado_em': time.time(), 'zonas': zonas}, arquivo)
+        os.replace(arquivo.name, ARQUIVO_CACHE)
+    except OSError as e:
+        print(f"Aviso: cache de zonas não gravado em {ARQUIVO_CACHE}: {e}", file=sys.stderr)
+
+
+def listar_zonas(usar_cache=True):
     """Lista todas as zonas hospedadas no Route 53"""
+    cache = _ler_cache() if usar_cache else None
+    if cache is not None:
+        return cache['zonas']
     try:
-        route53 = boto3.client('route53')
-        response = route53.list_hosted_zones()
-        
-        zonas = []
-        for zona in response['HostedZones']:
-            zonas.append({
-                'id': zona['Id'].split('/')[-1],
-                'nome': zona['Name'],
-                'comentario': zona.get('Config', {}).get('Comment', ''),
-                'privada': zona.get('Config', {}).get('PrivateZone', False)
-            })
-        
-        return zonas
+        zonas = _listar_do_route53()
     except Exception as e:
-        print(f"Erro ao listar zonas: {str(e)}")
+        print(f"Erro ao listar zonas: {str(e)}", file=sys.stderr)
         return None
+    _gravar_cache(zonas)
+    return zonas
 
-def obter_zone_id(nome_zona):
+
+def resolver_zonas(nomes, usar_cache=True):
+    """
+    {nome: id ou None} para vários nomes, com uma listagem completa (ou o cache)
+    em vez de uma busca por nome. Nomes fora do índice são conferidos um a um.
+    """
+    zonas = listar_zonas(usar_cache)
+    if zonas is None:
+        return None
+    indice = _indexar(zonas)
+    resultado = {nome: indice.get(normalizar(nome)) for nome in nomes}
+    faltando = [nome for nome, zona_id in resultado.items() if zona_id is None]
+    novas = []
+    for nome in faltando:
+        try:
+            encontradas = _buscar_no_route53(nome)
+        except Exception as e:
+            print(f"Erro ao buscar a zona {nome}: {str(e)}", file=sys.stderr)
+            continue
+        if encontradas:
+            resultado[nome] = _indexar(encontradas)[normalizar(nome)]
+            novas.extend(encontradas)
+    if novas:
+        # Zona criada depois do cache: inclui no índice sem listar tudo de novo
+        _gravar_cache(zonas + novas)
+    return resultado
+
+
+def obter_zone_id(nome_zona, usar_cache=True):
     """Obtém o ID de uma zona específica pelo nome"""
-    zonas = listar_zonas()
-    if not zonas:
+    cache = _ler_cache() if usar_cache else None
+    if cache is not None:
+        zona_id = _indexar(cache['zonas']).get(normalizar(nome_zona))
+        if zona_id:
+            return zona_id
+    # Sem cache válido não vale listar tudo por um nome: uma chamada basta
+    try:
+        encontradas = _buscar_no_route53(nome_zona)
+    except Exception as e:
+        print(f"Erro ao buscar a zona: {str(e)}", file=sys.stderr)
+        return None
+    if not encontradas:
         return None
-    
-    # Remover ponto final se existir
-    nome_zona = nome_zona.rstrip('.')
-    
-    # Procurar pela zona
-    for zona in zonas:
-        if zona['nome'].rstrip('.') == nome_zona:
-            return zona['id']
-    
-    return None
+    if cache is not None:
+        _gravar_cache(cache['zonas'] + encontradas)
+    return _indexar(encontradas)[normalizar(nome_zona)]
+
+
+def _ler_nomes(caminho):
+    arquivo = sys.stdin if caminho == '-' else open(caminho)
+    with arquivo:
+        return [linha.strip() for linha in arquivo if linha.strip() and not linha.startswith('#')]
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Lista zonas do Route 53 ou resolve nomes de zona em IDs")
+    parser.add_argument('nomes', nargs='*', help="Nomes das zonas (um nome: imprime só o ID)")
+    parser.add_argument('--arquivo', help="Arquivo com um nome de zona por linha ('-' para a entrada padrão)")
+    parser.add_argument('--json', action='store_true', help="No modo em lote, imprime {nome: id} em JSON")
+    parser.add_argument('--sem-cache', action='store_true', help="Ignora o cache local e consulta o Route 53")
+    args = parser.parse_args()
+    usar_cache = not args.sem_cache
+
+    nomes = list(args.nomes)
+    if args.arquivo:
+        nomes.extend(_ler_nomes(args.arquivo))
+
     # Se um nome de zona for fornecido, retorna apenas o ID
-    if len(sys.argv) > 1:
-        nome_zona = sys.argv[1]
-        zone_id = obter_zone_id(nome_zona)
+    if len(nomes) == 1 and not args.arquivo:
+        nome_zona = nomes[0]
+        zone_id = obter_zone_id(nome_zona, usar_cache)
         if zone_id:
             print(zone_id)
             return 0
         else:
             print(f"Zona '{nome_zona}' não encontrada", file=sys.stderr)
             return 1
-    
+
+    # Modo em lote: todos os nomes com uma listagem só
+    if nomes:
+        resultado = resolver_zonas(nomes, usar_cache)
+        if resultado is None:
+            return 1
+        if args.json:
+            print(json.dumps(resultado, indent=2))
+        else:
+            for nome, zona_id in resultado.items():
+                if zona_id:
+                    print(f"{nome}\t{zona_id}")
+        faltando = [nome for nome, zona_id in resultado.items() if zona_id is None]
+        for nome in faltando:
+            print(f"Zona '{nome}' não encontrada", file=sys.stderr)
+        return 1 if faltando else 0
+
     # Caso contrário, lista todas as zonas
-    zonas = listar_zonas()
+    zonas = listar_zonas(usar_cache)
     if zonas:
         print(json.dumps(zonas, indent=2))
         return 0
@@ -63,4 +221,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
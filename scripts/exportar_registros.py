@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Exporta todos os aliases da tabela de registros DNS em NDJSON ou CSV.
+
+Faz um scan paralelo (um segmento por thread) e escreve cada página assim que
+ela chega, sem carregar a tabela inteira na memória. A vazão cresce com o
+número de segmentos até o limite de capacidade da tabela.
+
+Uso:
+  python3 scripts/exportar_registros.py --tabela registros-dns-joao > registros.ndjson
+  python3 scripts/exportar_registros.py --formato csv --segmentos 8 --saida registros.csv
+  python3 scripts/exportar_registros.py --todos-os-campos   # apenas NDJSON
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+
+
+def _escritor_ndjson(saida, campos):
+    def escrever(item):
+        saida.write(json.dumps(item, ensure_ascii=False))
+        saida.write('\n')
+    return escrever
+
+
+def _escritor_csv(saida, campos):
+    escritor = csv.DictWriter(saida, fieldnames=campos, extrasaction='ignore')
+    escritor.writeheader()
+    return escritor.writerow
+
+
+ESCRITORES = {'ndjson': _escritor_ndjson, 'csv': _escritor_csv}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a tabela de registros DNS")
+    parser.add_argument('--tabela', default=os.environ.get('DYNAMODB_TABLE'),
+                        help="Nome da tabela (padrão: $DYNAMODB_TABLE)")
+    parser.add_argument('--formato', choices=sorted(ESCRITORES), default='ndjson')
+    parser.add_argument('--segmentos', type=int, default=4,
+                        help="Segmentos do scan paralelo (threads)")
+    parser.add_argument('--saida', help="Arquivo de saída (padrão: stdout)")
+    parser.add_argument('--todos-os-campos', action='store_true',
+                        help="Exporta todos os atributos, não só os da listagem (apenas NDJSON)")
+    args = parser.parse_args()
+
+    if not args.tabela:
+        parser.error("informe --tabela ou defina DYNAMODB_TABLE")
+    if args.todos_os_campos and args.formato == 'csv':
+        parser.error("--todos-os-campos só é suportado com --formato ndjson")
+    if args.segmentos < 1:
+        parser.error("--segmentos deve ser pelo menos 1")
+
+    # Uma conexão HTTP por segmento; precisa ser definido antes de importar clientes_aws
+    os.environ['AWS_MAX_CONEXOES'] = str(max(args.segmentos, int(os.environ.get('AWS_MAX_CONEXOES', '16'))))
+    from repositorio_registros import CAMPOS_LISTAGEM, RepositorioRegistros
+
+    campos = None if args.todos_os_campos else list(CAMPOS_LISTAGEM)
+    repositorio = RepositorioRegistros(args.tabela)
+
+    saida = open(args.saida, 'w', newline='', encoding='utf-8') if args.saida else sys.stdout
+    inicio = time.perf_counter()
+    total = 0
+    try:
+        escrever = ESCRITORES[args.formato](saida, campos)
+        for pagina in repositorio.varrer_paginas(campos=campos, segmentos=args.segmentos):
+            for item in pagina:
+                # O carimbo de versão do cache não é um registro
+                if item.get('alias', '').startswith('#'):
+                    continue
+                escrever(item)
+                total += 1
+    except Exception as e:
+        print(f"Erro ao exportar registros: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+
+    duracao = time.perf_counter() - inicio
+    vazao = total / duracao if duracao > 0 else 0
+    print(f"{total} registros exportados em {duracao:.2f} s ({vazao:.0f} registros/s, "
+          f"{args.segmentos} segmentos)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compara os registros A do Route53 com a tabela de registros DNS e corrige as
+divergências (ver lambda/reconciliador.py).
+
+Uso:
+  python3 scripts/reconciliar_dns.py --simular            # só mostra as diferenças
+  python3 scripts/reconciliar_dns.py                      # corrige ausentes e divergentes
+  python3 scripts/reconciliar_dns.py --orfaos importar    # e grava os órfãos na tabela
+
+A configuração padrão vem das mesmas variáveis de ambiente do Lambda
+(DYNAMODB_TABLE, ZONA_ID, NAMESERVERS, TTL_DNS).
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+
+import clientes_aws
+from reconciliador import POLITICAS_ORFAOS, reconciliar
+from repositorio_registros import RepositorioRegistros
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcilia Route53 e DynamoDB")
+    parser.add_argument('--tabela', default=os.environ.get('DYNAMODB_TABLE'))
+    parser.add_argument('--zona-id', default=os.environ.get('ZONA_ID'))
+    parser.add_argument('--dominio', default=(os.environ.get('NAMESERVERS') or '').split(',')[0] or None,
+                        help="Domínio dos registros (padrão: primeiro item de $NAMESERVERS)")
+    parser.add_argument('--ttl', type=int, default=int(os.environ.get('TTL_DNS', '60')))
+    parser.add_argument('--orfaos', choices=POLITICAS_ORFAOS, default='ignorar',
+                        help="O que fazer com registros que só existem no Route53")
+    parser.add_argument('--segmentos', type=int, default=4, help="Segmentos do scan da tabela")
+    parser.add_argument('--simular', action='store_true', help="Não altera nada, só reporta")
+    parser.add_argument('--json', action='store_true', help="Imprime o resultado completo em JSON")
+    args = parser.parse_args()
+
+    for nome in ('tabela', 'zona_id', 'dominio'):
+        if not getattr(args, nome):
+            parser.error(f"informe --{nome.replace('_', '-')} (ou a variável de ambiente correspondente)")
+
+    resumo = reconciliar(
+        clientes_aws.cliente('route53'),
+        RepositorioRegistros(args.tabela),
+        args.zona_id, args.dominio, args.ttl,
+        orfaos=args.orfaos, simular=args.simular, segmentos=args.segmentos
+    )
+
+    if args.json:
+        print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    else:
+        diferencas = resumo['diferencas']
+        for d in diferencas['ausentes']:
+            print(f"ausente no Route53: {d['alias']} -> {d['endereco_ip']}")
+        for d in diferencas['divergentes']:
+            print(f"IP divergente:      {d['alias']} tabela={d['endereco_ip']} route53={','.join(d['enderecos_route53'])}")
+        for d in diferencas['orfaos']:
+            print(f"órfão no Route53:   {d['alias']} -> {','.join(d['enderecos_ip'])}")
+        if args.simular:
+            print(f"Simulação: {resumo['corrigiria']} correções seriam aplicadas")
+        else:
+            print(f"{resumo['corrigidos']} correções aplicadas, {len(resumo['falhas'])} falhas")
+    return 1 if resumo['falhas'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
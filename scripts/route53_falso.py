@@ -0,0 +1,79 @@
+"""
+Route53 em memória para testes e simulações do escritor (lambda/escritor_route53.py).
+
+Valida os ChangeBatches como o serviço real (atomicidade, CREATE duplicado,
+DELETE que não confere) e responde Throttling quando recebe mais chamadas por
+segundo do que o limite. Erros específicos podem ser injetados em sequência.
+"""
+
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+
+def _erro(codigo, mensagem=''):
+    return ClientError({'Error': {'Code': codigo, 'Message': mensagem or codigo}}, 'ChangeResourceRecordSets')
+
+
+class Route53Falso:
+    def __init__(self, limite_por_segundo=5, erros=None, relogio=time.monotonic):
+        self.limite_por_segundo = limite_por_segundo
+        # Códigos de erro devolvidos pelas próximas chamadas (None = chamada normal)
+        self.erros = list(erros or [])
+        self.relogio = relogio
+        self.conjuntos = {}
+        self.chamadas = []
+        self.lotes_aplicados = []
+        self.trava = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _validar(self, alteracoes):
+        simulado = dict(self.conjuntos)
+        for alteracao in alteracoes:
+            conjunto = alteracao['ResourceRecordSet']
+            chave = (conjunto['Name'].rstrip('.').lower(), conjunto['Type'])
+            if alteracao['Action'] == 'CREATE' and chave in simulado:
+                raise _erro('InvalidChangeBatch', f"Tried to create resource record set {chave[0]} but it already exists")
+            if alteracao['Action'] == 'DELETE':
+                atual = simulado.get(chave)
+                if atual is None or atual['ResourceRecords'] != conjunto['ResourceRecords'] or atual.get('TTL') != conjunto.get('TTL'):
+                    raise _erro('InvalidChangeBatch', f"Tried to delete resource record set {chave[0]} but the values provided do not match")
+                del simulado[chave]
+            else:
+                simulado[chave] = conjunto
+        return simulado
+
+    def change_resource_record_sets(self, HostedZoneId, ChangeBatch):
+        with self.trava:
+            agora = self.relogio()
+            self.chamadas.append(agora)
+            if self.erros:
+                codigo = self.erros.pop(0)
+                if codigo:
+                    raise _erro(codigo)
+            if sum(1 for t in self.chamadas if agora - t < 1) > self.limite_por_segundo:
+                raise _erro('Throttling', 'Rate exceeded')
+            # O lote é atômico: só aplica se todas as alterações forem válidas
+            self.conjuntos = self._validar(ChangeBatch['Changes'])
+            self.lotes_aplicados.append(ChangeBatch['Changes'])
+            return {'ChangeInfo': {
+                'Id': f'/change/CFALSO{next(self._ids):08d}',
+                'Status': 'PENDING',
+                'SubmittedAt': datetime.now(timezone.utc)
+            }}
+
+    def list_resource_record_sets(self, HostedZoneId, StartRecordName='', StartRecordType=None, MaxItems='300'):
+        # Ordem simplificada (por nome e tipo), suficiente para buscar um registro
+        inicio = (StartRecordName.rstrip('.').lower(), StartRecordType or '')
+        with self.trava:
+            chaves = sorted(chave for chave in self.conjuntos if chave >= inicio)
+            return {'ResourceRecordSets': [
+                {**self.conjuntos[chave], 'Name': chave[0] + '.'} for chave in chaves[:int(MaxItems)]
+            ]}
+
+    def valor(self, nome, tipo='A'):
+        conjunto = self.conjuntos.get((nome.rstrip('.').lower(), tipo))
+        return [r['Value'] for r in conjunto['ResourceRecords']] if conjunto else None
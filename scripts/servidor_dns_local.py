@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Servidor DNS autoritativo mínimo, em memória, para testar a verificação de
+propagação (propagacao_dns.py) sem depender do Route 53.
+
+Cada endereço de escuta simula um nameserver. No Linux todo o bloco 127.0.0.0/8
+responde localmente, então 127.0.0.1, 127.0.0.2, ... funcionam como nameservers
+distintos na mesma porta.
+
+Uso:
+  python3 scripts/servidor_dns_local.py registros.json [--enderecos 127.0.0.1,127.0.0.2] [--porta 5353]
+  python3 scripts/servidor_dns_local.py --demo [qtd_registros]
+
+O arquivo de registros é um objeto JSON {"nome.completo": "ip"}. Com --demo, o
+servidor é iniciado com registros sintéticos e a sondagem é executada contra ele;
+o segundo nameserver responde com um IP antigo para parte dos nomes.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class ProtocoloDNS(asyncio.DatagramProtocol):
+    def __init__(self, registros, ttl=60):
+        self.registros = {nome.rstrip('.').lower(): ip for nome, ip in registros.items()}
+        self.ttl = ttl
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, dados, origem):
+        try:
+            consulta = dns.message.from_wire(dados)
+        except Exception:
+            return
+        resposta = dns.message.make_response(consulta)
+        resposta.flags |= dns.flags.AA
+        pergunta = consulta.question[0]
+        nome = pergunta.name.to_text().rstrip('.').lower()
+        ip = self.registros.get(nome)
+        if ip is None:
+            resposta.set_rcode(dns.rcode.NXDOMAIN)
+        elif pergunta.rdtype == dns.rdatatype.A:
+            resposta.answer.append(dns.rrset.from_text(pergunta.name, self.ttl, 'IN', 'A', ip))
+        self.transport.sendto(resposta.to_wire(), origem)
+
+
+async def iniciar_servidores(registros_por_endereco, porta):
+    """Inicia um servidor UDP por endereço; devolve os transports abertos."""
+    laco = asyncio.get_running_loop()
+    transports = []
+    for endereco, registros in registros_por_endereco.items():
+        transport, _ = await laco.create_datagram_endpoint(
+            lambda r=registros: ProtocoloDNS(r), local_addr=(endereco, porta)
+        )
+        transports.append(transport)
+    return transports
+
+
+async def _demo(qtd, porta):
+    from propagacao_dns import sondar_propagacao
+
+    atuais = {f'aluno{i}.lab.local': f'10.0.{i // 250}.{i % 250}' for i in range(qtd)}
+    # O segundo nameserver ainda não recebeu a alteração de 1 em cada 10 nomes
+    atrasados = {nome: ('192.0.2.1' if i % 10 == 0 else ip) for i, (nome, ip) in enumerate(atuais.items())}
+    transports = await iniciar_servidores({'127.0.0.1': atuais, '127.0.0.2': atrasados}, porta)
+    try:
+        resultado = await sondar_propagacao(list(atuais.items()), ['127.0.0.1', '127.0.0.2'], porta=porta)
+    finally:
+        for transport in transports:
+            transport.close()
+
+    propagados = sum(1 for r in resultado['registros'].values() if r['propagado'])
+    print(f"Propagados: {propagados}/{qtd}")
+    print(json.dumps(resultado['nameservers'], indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor DNS local para testes de propagação")
+    parser.add_argument('arquivo', nargs='?', help="JSON {nome: ip} com os registros servidos")
+    parser.add_argument('--enderecos', default='127.0.0.1', help="Endereços de escuta, separados por vírgula")
+    parser.add_argument('--porta', type=int, default=5353)
+    parser.add_argument('--demo', type=int, nargs='?', const=500, metavar='QTD',
+                        help="Executa a sondagem contra registros sintéticos e termina")
+    args = parser.parse_args()
+
+    if args.demo:
+        asyncio.run(_demo(args.demo, args.porta))
+        return 0
+
+    if not args.arquivo:
+        parser.error("informe o arquivo de registros ou use --demo")
+    with open(args.arquivo) as f:
+        registros = json.load(f)
+
+    async def _servir():
+        enderecos = args.enderecos.split(',')
+        await iniciar_servidores({e: registros for e in enderecos}, args.porta)
+        print(f"Servindo {len(registros)} registros em {', '.join(enderecos)} porta {args.porta}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_servir())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
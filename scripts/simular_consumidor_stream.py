@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Executa o consumidor do DynamoDB Streams (lambda/consumidor_stream.py) com
+eventos sintéticos, contra o Route53 falso e uma tabela em memória.
+
+Primeiro lote: a criação de cada aluno (PENDENTE). Segundo lote: as
+atualizações do próprio consumidor (APLICADO, que devem ser ignoradas) e, para
+parte dos alunos, a exclusão (EXCLUINDO). No fim, confere o Route53 e a tabela.
+
+Uso: python3 scripts/simular_consumidor_stream.py [qtd_alunos] [a_cada_n_exclui]
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+
+from consumidor_stream import ConsumidorStream
+from escritor_route53 import EscritorRoute53
+from outbox import APLICADO, EXCLUINDO, PENDENTE
+from repositorio_registros import CondicaoFalhou, dict_para_item
+from route53_falso import Route53Falso
+
+DOMINIO = 'aluno.lab.tonanuvem.com'
+
+
+class RepositorioStub:
+    """Tabela em memória com as escritas condicionais usadas pelo consumidor."""
+
+    def __init__(self, itens):
+        self.itens = {item['alias']: dict(item) for item in itens}
+
+    def _conferir(self, alias, valores):
+        if self.itens.get(alias, {}).get('id_operacao') != valores[':op']:
+            raise CondicaoFalhou(alias)
+
+    def atualizar(self, alias, campos, condicao=None, nomes=None, valores=None):
+        self._conferir(alias, valores)
+        self.itens[alias].update(campos)
+        return dict(self.itens[alias])
+
+    def excluir(self, alias, condicao=None, nomes=None, valores=None):
+        self._conferir(alias, valores)
+        del self.itens[alias]
+
+    def incrementar(self, alias, atributo, quantidade=1):
+        return 0
+
+
+def _evento(nome_evento, item, sequencia):
+    dados = {'Keys': {'alias': {'S': item['alias']}}, 'SequenceNumber': str(sequencia)}
+    if nome_evento != 'REMOVE':
+        dados['NewImage'] = dict_para_item(item)
+    return {'eventName': nome_evento, 'dynamodb': dados}
+
+
+def main():
+    qtd = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    a_cada_n_exclui = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    route53 = Route53Falso()
+    repositorio = RepositorioStub([])
+    consumidor = ConsumidorStream(repositorio, EscritorRoute53('ZFALSO', cliente=route53), DOMINIO, 60)
+    sequencia = iter(range(10 ** 9))
+
+    # Lote 1: a API grava todos os alunos como PENDENTE
+    lote1 = []
+    for i in range(qtd):
+        item = {'alias': f'aluno{i}', 'endereco_ip': f'10.0.{i // 250}.{i % 250}',
+                'status': PENDENTE, 'id_operacao': f'op{i}-1'}
+        repositorio.itens[item['alias']] = dict(item)
+        lote1.append(_evento('INSERT', item, next(sequencia)))
+    resposta1 = consumidor.processar(lote1)
+
+    # Lote 2: as atualizações APLICADO do próprio consumidor (ignoradas) e as exclusões pedidas à API
+    lote2 = [_evento('MODIFY', item, next(sequencia)) for item in list(repositorio.itens.values())]
+    for i in range(0, qtd, a_cada_n_exclui):
+        item = repositorio.itens[f'aluno{i}']
+        item.update({'status': EXCLUINDO, 'id_operacao': f'op{i}-2'})
+        lote2.append(_evento('MODIFY', item, next(sequencia)))
+    resposta2 = consumidor.processar(lote2)
+
+    esperados = qtd - len(range(0, qtd, a_cada_n_exclui))
+    falhas = resposta1['batchItemFailures'] + resposta2['batchItemFailures']
+    aplicados = sum(1 for item in repositorio.itens.values() if item['status'] == APLICADO)
+    print(f"{len(lote1) + len(lote2)} registros do stream em 2 lotes, {len(route53.lotes_aplicados)} ChangeBatches "
+          f"({', '.join(str(len(lote)) for lote in route53.lotes_aplicados)} alterações)")
+    print(f"  Route53: {len(route53.conjuntos)} registros (esperado {esperados})")
+    print(f"  Tabela:  {len(repositorio.itens)} itens, {aplicados} APLICADO (esperado {esperados})")
+    print(f"  batchItemFailures: {len(falhas)}")
+    ok = len(route53.conjuntos) == aplicados == len(repositorio.itens) == esperados and not falhas
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
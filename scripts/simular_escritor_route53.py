@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Simula o pico de escritas do início de uma aula contra o Route53 falso
+(scripts/route53_falso.py, limite de 5 chamadas/s), comparando chamadas diretas
+com o escritor compartilhado (lambda/escritor_route53.py).
+
+Cada aluno cria o próprio registro e logo em seguida o atualiza algumas vezes.
+
+Uso: python3 scripts/simular_escritor_route53.py [--alunos 40] [--atualizacoes 2] [--janela-ms 50]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT / 'lambda'))
+sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+
+from alteracoes_route53 import alteracao_registro_a
+from escritor_route53 import EscritorRoute53, codigo_erro
+from route53_falso import Route53Falso
+
+DOMINIO = 'aluno.lab.tonanuvem.com'
+
+
+def _escritas(alunos, atualizacoes):
+    # Todas as versões de cada aluno; a última é a que deve valer
+    return [
+        (aluno, alteracao_registro_a('UPSERT', f'aluno{aluno}.{DOMINIO}', f'10.0.{versao}.{aluno % 250}', 60))
+        for versao in range(atualizacoes + 1)
+        for aluno in range(alunos)
+    ]
+
+
+def _executar(escritas, enviar, threads):
+    falhas = []
+
+    def _uma(escrita):
+        try:
+            enviar([escrita[1]])
+        except Exception as e:
+            falhas.append(codigo_erro(e) or type(e).__name__)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_uma, escritas))
+    return time.perf_counter() - inicio, falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação do escritor do Route53")
+    parser.add_argument('--alunos', type=int, default=40)
+    parser.add_argument('--atualizacoes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--janela-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    escritas = _escritas(args.alunos, args.atualizacoes)
+    print(f"{len(escritas)} escritas de {args.alunos} alunos, {args.threads} em paralelo")
+
+    direto = Route53Falso()
+    duracao, falhas = _executar(
+        escritas,
+        lambda alteracoes: direto.change_resource_record_sets(HostedZoneId='ZFALSO', ChangeBatch={'Changes': alteracoes}),
+        args.threads
+    )
+    print(f"  direto:   {duracao:6.2f} s, {len(direto.chamadas):4d} chamadas, {len(falhas):4d} falhas ({', '.join(sorted(set(falhas)))})")
+
+    falso = Route53Falso()
+    escritor = EscritorRoute53('ZFALSO', cliente=falso, janela=args.janela_ms / 1000)
+    duracao, falhas = _executar(escritas, escritor.aplicar, args.threads)
+    estatisticas = escritor.estatisticas()
+    print(f"  escritor: {duracao:6.2f} s, {len(falso.chamadas):4d} chamadas, {len(falhas):4d} falhas, "
+          f"{estatisticas['coalescidas']} coalescidas, {estatisticas['retentativas']} retentativas")
+
+    # Vale a última escrita: cada aluno deve ter o IP da última versão enviada
+    finais = {aluno: alteracao for aluno, alteracao in escritas}
+    divergentes = [
+        aluno for aluno, alteracao in finais.items()
+        if falso.valor(alteracao['ResourceRecordSet']['Name']) != [alteracao['ResourceRecordSet']['ResourceRecords'][0]['Value']]
+    ]
+    if divergentes:
+        print(f"  {len(divergentes)} alunos sem o IP da última escrita (ordem entre threads não é garantida)")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Executa o verificador de propagação (lambda_function.promover_registros_pendentes)
+localmente, contra stubs em memória do Route 53 e do DynamoDB.
+
+Uso: python3 scripts/simular_propagacao.py [qtd_registros] [consultas_ate_insync]
+"""
+
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Variáveis exigidas na importação do lambda_function; nenhum acesso à AWS é feito
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('TABELA_DYNAMODB', 'registros-dns-local')
+os.environ.setdefault('ID_ZONA_HOSPEDADA', 'ZLOCAL')
+os.environ.setdefault('SENHA_COMPARTILHADA', 'local')
+os.environ.setdefault('NOME_DOMINIO', 'aluno.lab.tonanuvem.com')
+
+import lambda_function
+from botocore.exceptions import ClientError
+
+
+class Route53Stub:
+    """Responde PENDING nas primeiras consultas de cada alteração e depois INSYNC."""
+
+    def __init__(self, consultas_ate_insync=3):
+        self.consultas_ate_insync = consultas_ate_insync
+        self.consultas = {}
+
+    def get_change(self, Id):
+        self.consultas[Id] = self.consultas.get(Id, 0) + 1
+        status = 'INSYNC' if self.consultas[Id] >= self.consultas_ate_insync else 'PENDING'
+        return {'ChangeInfo': {'Id': Id, 'Status': status}}
+
+
+class TabelaStub:
+    """Tabela em memória com o subconjunto de operações usado pelo verificador."""
+
+    def __init__(self, itens):
+        self.itens = {item['subdominio']: dict(item) for item in itens}
+
+    def scan(self, **kwargs):
+        pendentes = ('PENDENTE', 'AGUARDANDO_PROPAGACAO')
+        return {'Items': [dict(i) for i in self.itens.values() if i.get('status') in pendentes]}
+
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        item = self.itens[Key['subdominio']]
+        if ':cid' in ExpressionAttributeValues:
+            atual = item.get('id_alteracao') == ExpressionAttributeValues[':cid']
+        else:
+            atual = item.get('endereco_ip') == ExpressionAttributeValues[':ip']
+        if not atual:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        item['status'] = ExpressionAttributeValues[':status']
+        item['data_propagacao'] = ExpressionAttributeValues[':agora']
+
+
+def main():
+    qtd = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    consultas_ate_insync = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # Registros criados em grupos de 5 compartilham o mesmo id_alteracao
+    itens = [
+        {'subdominio': f'aluno{i}', 'endereco_ip': f'10.0.0.{i % 250}',
+         'id_alteracao': f'/change/C{i // 5}', 'status': 'PENDENTE'}
+        for i in range(qtd)
+    ]
+    route53 = Route53Stub(consultas_ate_insync)
+    tabela = TabelaStub(itens)
+    esperas = []
+
+    resultado = lambda_function.promover_registros_pendentes(
+        cliente_route53=route53,
+        tabela_registros=tabela,
+        dormir=esperas.append
+    )
+
+    print(f"Resultado: {resultado}")
+    print(f"Esperas (backoff): {esperas}")
+    print(f"Chamadas get_change: {sum(route53.consultas.values())}")
+    return 0 if resultado['pendentes'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,8 @@ resource "aws_apigatewayv2_api" "api" {
   cors_configuration {
     allow_origins  = ["*"]
     allow_methods  = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    allow_headers  = ["Content-Type", "Authorization", "Range", "X-Api-Key"]
-    expose_headers = ["Content-Range"]
+    allow_headers  = ["Content-Type", "Authorization", "Range", "X-Api-Key", "If-None-Match"]
+    expose_headers = ["Content-Range", "X-Proximo-Cursor", "ETag", "Retry-After"]
     max_age        = 300
   }
   tags = var.api_gateway_tags
@@ -11,16 +11,87 @@ resource "aws_dynamodb_table" "registros_dns" {
     type = "S"
   }
 
+  attribute {
+    name = "endereco_ip"
+    type = "S"
+  }
+
+  # Consulta reversa (quais aliases apontam para um IP) sem scan; o nome é o
+  # INDICE_IP de lambda/repositorio_registros.py
+  global_secondary_index {
+    name               = "endereco_ip-index"
+    hash_key           = "endereco_ip"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["data_criacao", "status", "expira_em"]
+  }
+
+  # Aliases com expira_em (epoch) são apagados pelo DynamoDB depois de vencidos;
+  # o varredor_expirados remove os registros do Route53 (lambda/expiracao.py)
+  ttl {
+    attribute_name = "expira_em"
+    enabled        = true
+  }
+
   tags = merge(var.lambda_tags, {
     Name = "registros-dns"
   })
 }
 
+# Chaves de API por inquilino, guardadas só como SHA-256 (lambda/chaves_api.py;
+# criação e revogação com scripts/chaves_api.py)
+resource "aws_dynamodb_table" "chaves_api" {
+  name         = "${var.lambda_dynamodb_table_name}-chaves"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "hash_chave"
+
+  attribute {
+    name = "hash_chave"
+    type = "S"
+  }
+
+  tags = merge(var.lambda_tags, {
+    Name = "chaves-api-dns"
+  })
+}
+
+# Diário das alterações lido pelo stream SSE da API FastAPI
+# (lambda/eventos_registros.py): o gerenciador_dns, o consumidor_stream e o
+# varredor_expirados publicam aqui, sem um terceiro leitor no stream da tabela
+# de registros. O stream só é servido pela API FastAPI em contêiner (uvicorn);
+# atrás do API Gateway (Lambda ou Mangum) a rota responde 404 e o painel não assina
+resource "aws_dynamodb_table" "eventos" {
+  name         = "${var.lambda_dynamodb_table_name}-eventos"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "canal"
+  range_key    = "seq"
+
+  attribute {
+    name = "canal"
+    type = "S"
+  }
+
+  attribute {
+    name = "seq"
+    type = "N"
+  }
+
+  ttl {
+    attribute_name = "expira_em"
+    enabled        = true
+  }
+
+  tags = merge(var.lambda_tags, {
+    Name = "eventos-dns"
+  })
+}
+
 # Arquivo ZIP da função Lambda
 data "archive_file" "lambda_zip" {
   type        = "zip"
   #source_file = "${path.root}/../lambda_zip/gerenciador_dns.zip"
-  source_file = "${path.root}/../lambda/gerenciador_dns.py"
+  # Handler e módulos compartilhados (clientes_aws.py, ...) do diretório lambda/
+  source_dir  = "${path.root}/../lambda"
+  excludes    = [".env", "__pycache__"]
   output_path = "${path.module}/lambda_function.zip"
 }
 
@@ -39,9 +110,16 @@ resource "aws_lambda_function" "gerenciador_dns" {
     variables = {
       DYNAMODB_TABLE = aws_dynamodb_table.registros_dns.name
       SENHA_API = var.senha_compartilhada
+      CHAVES_TABLE = aws_dynamodb_table.chaves_api.name
+      LIMITE_REQUISICOES = var.limite_requisicoes
+      LIMITE_ESCRITAS = var.limite_escritas
       TTL_DNS = var.ttl_dns
       NAMESERVERS = var.nome_dominio
       ZONA_ID = var.zona_id
+      MODO_ESCRITA = var.modo_escrita
+      LOG_NIVEL = var.log_nivel
+      LOG_AMOSTRA_DEBUG = var.log_amostra_debug
+      EVENTOS_TABLE = aws_dynamodb_table.eventos.name
     }
   }
 
@@ -50,6 +128,195 @@ resource "aws_lambda_function" "gerenciador_dns" {
   })
 }
 
+# Modo outbox: aplica no Route53 as alterações gravadas pela API (lambda/consumidor_stream.py)
+resource "aws_lambda_function" "consumidor_stream" {
+  filename         = data.archive_file.lambda_zip.output_path
+  function_name    = "consumidor-stream-dns-${var.lambda_nome_aluno}"
+  role            = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  handler         = "consumidor_stream.lambda_handler"
+  runtime         = "python3.9"
+  timeout         = 60
+  memory_size     = 128
+
+  environment {
+    variables = {
+      DYNAMODB_TABLE = aws_dynamodb_table.registros_dns.name
+      TTL_DNS = var.ttl_dns
+      NAMESERVERS = var.nome_dominio
+      ZONA_ID = var.zona_id
+      LOG_NIVEL = var.log_nivel
+      EVENTOS_TABLE = aws_dynamodb_table.eventos.name
+    }
+  }
+
+  tags = merge(var.lambda_tags, {
+    Name = "consumidor-stream-dns"
+  })
+}
+
+resource "aws_lambda_event_source_mapping" "consumidor_stream" {
+  count             = var.modo_escrita == "outbox" ? 1 : 0
+  event_source_arn  = aws_dynamodb_table.registros_dns.stream_arn
+  function_name     = aws_lambda_function.consumidor_stream.arn
+  starting_position = "LATEST"
+  batch_size        = 500
+  maximum_batching_window_in_seconds = 1
+  # Reprocessa só a partir do registro que falhou (batchItemFailures)
+  function_response_types = ["ReportBatchItemFailures"]
+  maximum_retry_attempts  = 10
+
+  # Só os itens que precisam ir para o Route53; as atualizações do próprio consumidor ficam de fora
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        dynamodb = { NewImage = { status = { S = ["PENDENTE", "EXCLUINDO"] } } }
+      })
+    }
+  }
+}
+
+# Reconciliação periódica entre Route53 e DynamoDB e promoção dos registros
+# APLICADO a PROPAGADO (lambda/reconciliador.py)
+resource "aws_lambda_function" "reconciliador" {
+  filename         = data.archive_file.lambda_zip.output_path
+  function_name    = "reconciliador-dns-${var.lambda_nome_aluno}"
+  role            = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  handler         = "reconciliador.lambda_handler"
+  runtime         = "python3.9"
+  timeout         = 300
+  memory_size     = 256
+
+  environment {
+    variables = {
+      DYNAMODB_TABLE = aws_dynamodb_table.registros_dns.name
+      TTL_DNS = var.ttl_dns
+      NAMESERVERS = var.nome_dominio
+      ZONA_ID = var.zona_id
+      RECONCILIAR_ORFAOS = var.reconciliacao_orfaos
+      LOG_NIVEL = var.log_nivel
+    }
+  }
+
+  tags = merge(var.lambda_tags, {
+    Name = "reconciliador-dns"
+  })
+}
+
+resource "aws_cloudwatch_event_rule" "reconciliacao" {
+  name                = "reconciliacao-dns-${var.lambda_nome_aluno}"
+  description         = "Reconcilia os registros do Route53 com a tabela DynamoDB"
+  schedule_expression = var.reconciliacao_agendamento
+
+  tags = var.lambda_tags
+}
+
+resource "aws_cloudwatch_event_target" "reconciliacao" {
+  rule = aws_cloudwatch_event_rule.reconciliacao.name
+  arn  = aws_lambda_function.reconciliador.arn
+}
+
+resource "aws_lambda_permission" "reconciliacao" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.reconciliador.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.reconciliacao.arn
+}
+
+# Promoção APLICADO -> PROPAGADO (get_change INSYNC), mais frequente que a
+# reconciliação completa e sem ler a zona do Route53
+resource "aws_cloudwatch_event_rule" "propagacao" {
+  name                = "propagacao-dns-${var.lambda_nome_aluno}"
+  description         = "Marca como PROPAGADO os registros cujas alterações o Route53 concluiu"
+  schedule_expression = var.propagacao_agendamento
+
+  tags = var.lambda_tags
+}
+
+resource "aws_cloudwatch_event_target" "propagacao" {
+  rule  = aws_cloudwatch_event_rule.propagacao.name
+  arn   = aws_lambda_function.reconciliador.arn
+  input = jsonencode({ somente_propagacao = true })
+}
+
+resource "aws_lambda_permission" "propagacao" {
+  statement_id  = "AllowExecutionFromEventBridgePropagacao"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.reconciliador.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.propagacao.arn
+}
+
+# Remoção dos registros do Route53 de aliases vencidos (lambda/varredor_expirados.py)
+resource "aws_lambda_function" "varredor_expirados" {
+  filename         = data.archive_file.lambda_zip.output_path
+  function_name    = "varredor-expirados-dns-${var.lambda_nome_aluno}"
+  role            = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  handler         = "varredor_expirados.lambda_handler"
+  runtime         = "python3.9"
+  timeout         = 300
+  memory_size     = 128
+
+  environment {
+    variables = {
+      DYNAMODB_TABLE = aws_dynamodb_table.registros_dns.name
+      TTL_DNS = var.ttl_dns
+      NAMESERVERS = var.nome_dominio
+      ZONA_ID = var.zona_id
+      LOG_NIVEL = var.log_nivel
+      EVENTOS_TABLE = aws_dynamodb_table.eventos.name
+    }
+  }
+
+  tags = merge(var.lambda_tags, {
+    Name = "varredor-expirados-dns"
+  })
+}
+
+# Segundo leitor do stream, ao lado do consumidor_stream (o DynamoDB Streams
+# recomenda no máximo dois por shard)
+resource "aws_lambda_event_source_mapping" "varredor_expirados" {
+  event_source_arn  = aws_dynamodb_table.registros_dns.stream_arn
+  function_name     = aws_lambda_function.varredor_expirados.arn
+  starting_position = "LATEST"
+  batch_size        = 500
+  maximum_batching_window_in_seconds = 5
+  function_response_types = ["ReportBatchItemFailures"]
+  maximum_retry_attempts  = 10
+
+  # Só as remoções feitas pelo TTL; as exclusões pela API já tratam o Route53
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName    = ["REMOVE"]
+        userIdentity = { type = ["Service"], principalId = ["dynamodb.amazonaws.com"] }
+      })
+    }
+  }
+}
+
+# Varredura dos vencidos que o TTL ainda não apagou (ele não tem prazo garantido)
+resource "aws_cloudwatch_event_rule" "varredura_expirados" {
+  name                = "varredura-expirados-dns-${var.lambda_nome_aluno}"
+  description         = "Remove do Route53 e do DynamoDB os aliases com expira_em vencido"
+  schedule_expression = var.varredura_agendamento
+
+  tags = var.lambda_tags
+}
+
+resource "aws_cloudwatch_event_target" "varredura_expirados" {
+  rule = aws_cloudwatch_event_rule.varredura_expirados.name
+  arn  = aws_lambda_function.varredor_expirados.arn
+}
+
+resource "aws_lambda_permission" "varredura_expirados" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.varredor_expirados.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.varredura_expirados.arn
+}
+
 # Obter o ID da conta atual
 data "aws_caller_identity" "current" {}
 
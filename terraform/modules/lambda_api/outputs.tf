@@ -21,4 +21,13 @@ output "lambda_dynamodb_table_name" {
 output "lambda_dynamodb_table_arn" {
   description = "ARN da tabela DynamoDB"
   value       = aws_dynamodb_table.registros_dns.arn
-} 
\ No newline at end of file
+} 
+output "chaves_api_table_name" {
+  description = "Nome da tabela DynamoDB das chaves de API"
+  value       = aws_dynamodb_table.chaves_api.name
+}
+
+output "eventos_table_name" {
+  description = "Nome da tabela DynamoDB do diário de eventos do stream SSE"
+  value       = aws_dynamodb_table.eventos.name
+}
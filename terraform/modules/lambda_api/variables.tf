@@ -34,3 +34,57 @@ variable "zona_id" {
   description = "ID da zona DNS"
   type        = string
 }
+
+variable "reconciliacao_agendamento" {
+  description = "Expressão de agendamento da reconciliação Route53 x DynamoDB"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+variable "propagacao_agendamento" {
+  description = "Expressão de agendamento da promoção dos registros APLICADO a PROPAGADO"
+  type        = string
+  default     = "rate(2 minutes)"
+}
+
+variable "reconciliacao_orfaos" {
+  description = "Política para registros que só existem no Route53: ignorar, importar ou remover"
+  type        = string
+  default     = "ignorar"
+}
+
+variable "limite_requisicoes" {
+  description = "Requisições por segundo de cada chave de API sem limite próprio na tabela de chaves"
+  type        = string
+  default     = "20"
+}
+
+variable "limite_escritas" {
+  description = "Escritas (POST/DELETE) por segundo de cada chave de API sem limite próprio na tabela de chaves"
+  type        = string
+  default     = "2"
+}
+
+variable "varredura_agendamento" {
+  description = "Expressão de agendamento da varredura de aliases vencidos (expira_em)"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+variable "modo_escrita" {
+  description = "direto (Route53 na requisição) ou outbox (API grava PENDENTE e o consumidor do stream aplica)"
+  type        = string
+  default     = "direto"
+}
+
+variable "log_nivel" {
+  description = "Nível do log estruturado das funções: DEBUG, INFO, AVISO ou ERRO"
+  type        = string
+  default     = "INFO"
+}
+
+variable "log_amostra_debug" {
+  description = "Fração das requisições da API (0 a 1) registradas em nível DEBUG"
+  type        = string
+  default     = "0.01"
+}